@@ -0,0 +1,70 @@
+"""
+Run the benchmarks and optionally compare them against a baseline:
+
+    $ python -m benchmarks --output results.json
+    $ python -m benchmarks --sizes 1000,10000,100000,1000000 --baseline baseline.json --fail-on-regression
+    $ python -m benchmarks --output baseline.json   # store a new baseline
+"""
+
+import argparse
+import json
+import sys
+import warnings
+
+from benchmarks.suite import DEFAULT_NUM_DATASETS, DEFAULT_REPEAT, DEFAULT_SIZES, DEFAULT_TOLERANCE, \
+    compare_results, new_benchmarks, run_benchmarks
+
+
+def main(args=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Benchmarks for the OCDB parser, validator, models and queries.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated numbers of rows of the synthetic SeaBASS files")
+    parser.add_argument("--datasets", type=int, default=DEFAULT_NUM_DATASETS,
+                        help="number of datasets in the database for the find_datasets benchmarks")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="number of times each benchmark is run")
+    parser.add_argument("--filter", dest="name_filter", default=None,
+                        help="only run benchmarks whose name contains this text")
+    parser.add_argument("--mongodb-url", default=None,
+                        help="run the find_datasets benchmarks against this MongoDB instead of mongomock, "
+                             "its 'eocdb' database will be cleared")
+    parser.add_argument("--output", default=None,
+                        help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=None,
+                        help="compare the results against the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="relative slow-down that is reported as regression")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="exit with code 1 if any benchmark regressed")
+    args = parser.parse_args(args)
+
+    warnings.simplefilter("ignore")
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    benchmarks = new_benchmarks(sizes=sizes,
+                                num_datasets=args.datasets,
+                                name_filter=args.name_filter,
+                                mongodb_url=args.mongodb_url)
+    results = run_benchmarks(benchmarks, repeat=args.repeat, monitor=print)
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as fp:
+        baseline = json.load(fp)
+    comparisons = compare_results(results, baseline, tolerance=args.tolerance)
+    for comparison in comparisons:
+        flag = "REGRESSED" if comparison["regressed"] else "ok"
+        print(f"{comparison['name']}: {comparison['ratio']:.2f}x baseline ({flag})")
+
+    if args.fail_on_regression and any(comparison["regressed"] for comparison in comparisons):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
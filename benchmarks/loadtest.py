@@ -0,0 +1,357 @@
+"""
+HTTP load test for the web service. Starts the application from ``new_application()`` in a separate process
+against a test database filled with synthetic datasets, or targets a running server given by ``--url``,
+and replays a weighted mix of search, fetch, validate, upload and download requests:
+
+    $ python -m benchmarks.loadtest --concurrency 20 --duration 30
+    $ python -m benchmarks.loadtest --mix search=80,fetch=20 --concurrency 50 --output load.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import urllib.parse
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import tornado.escape
+import tornado.httpclient
+import tornado.httpserver
+import tornado.ioloop
+
+from benchmarks.synthetic import SPECTRAL_MODES, new_seabass_text
+from eocdb.core.seabass.sb_file_reader import SbFileReader
+from eocdb.version import VERSION
+
+API_URL_PREFIX = f"/ocdb/api/v{VERSION}"
+
+DEFAULT_MIX = "search=50,fetch=30,validate=10,upload=5,download=5"
+DEFAULT_CONCURRENCY = 10
+DEFAULT_DURATION = 10.
+DEFAULT_NUM_DATASETS = 200
+DEFAULT_NUM_ROWS = 100
+DEFAULT_USER = "chef"
+DEFAULT_PASSWORD = "eocdb_chef"
+STARTUP_TIMEOUT = 60.
+
+REQUEST_KINDS = ("search", "fetch", "validate", "upload", "download")
+PERCENTILES = (50, 90, 95, 99)
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse a request mix of the form "search=50,fetch=30" into a mapping from request kinds to weights."""
+    weights = {}
+    for item in mix.split(","):
+        if not item.strip():
+            continue
+        kind, weight = item.split("=", 1)
+        kind = kind.strip()
+        if kind not in REQUEST_KINDS:
+            raise ValueError(f"request kind must be one of {REQUEST_KINDS}, but was {kind!r}")
+        weights[kind] = float(weight)
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError("request mix must contain at least one positive weight")
+    return weights
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile *p* of *sorted_values*."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100. * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples: List[Tuple[str, float, int, int]], elapsed: float) -> Dict[str, Any]:
+    """
+    Summarize *samples* of the form (kind, latency in seconds, HTTP status, response bytes)
+    collected during *elapsed* seconds into throughput and latency percentiles, in total and per kind.
+    """
+
+    def summary(kind_samples):
+        latencies = sorted(sample[1] for sample in kind_samples)
+        errors = sum(1 for sample in kind_samples if sample[2] >= 400 or sample[2] == 599)
+        result = dict(requests=len(kind_samples),
+                      errors=errors,
+                      throughput_per_s=len(kind_samples) / elapsed if elapsed > 0 else None,
+                      bytes=sum(sample[3] for sample in kind_samples),
+                      mean_ms=1000. * sum(latencies) / len(latencies) if latencies else None,
+                      max_ms=1000. * latencies[-1] if latencies else None)
+        for p in PERCENTILES:
+            value = percentile(latencies, p)
+            result[f"p{p}_ms"] = 1000. * value if value is not None else None
+        return result
+
+    kinds = sorted({sample[0] for sample in samples})
+    return dict(elapsed_s=elapsed,
+                total=summary(samples),
+                kinds={kind: summary([sample for sample in samples if sample[0] == kind]) for kind in kinds})
+
+
+class LoadGenerator:
+    """Issues a weighted mix of requests against the web service at *base_url* from *concurrency* workers."""
+
+    def __init__(self, base_url: str, weights: Dict[str, float], concurrency: int,
+                 user: str = DEFAULT_USER, password: str = DEFAULT_PASSWORD,
+                 num_rows: int = DEFAULT_NUM_ROWS, seed: int = 0):
+        self._base_url = base_url.rstrip("/")
+        self._kinds = list(weights.keys())
+        self._weights = list(weights.values())
+        self._concurrency = concurrency
+        self._user = user
+        self._password = password
+        self._random = random.Random(seed)
+        self._validate_body = tornado.escape.json_encode(dict(data=new_seabass_text(num_rows)))
+        self._upload_text = new_seabass_text(num_rows, seed=seed)
+        self._client = None
+        self._cookie = None
+        self._dataset_ids = []
+        self._submission_ids = []
+        self._samples = []
+
+    async def run(self, duration: float = None, num_requests: int = None) -> Dict[str, Any]:
+        self._client = tornado.httpclient.AsyncHTTPClient(force_instance=True, max_clients=self._concurrency)
+        try:
+            await self._login()
+            await self._find_dataset_ids()
+            start_time = time.perf_counter()
+            deadline = start_time + duration if duration else None
+            remaining = [num_requests] if num_requests else None
+            await asyncio.gather(*[self._work(deadline, remaining) for _ in range(self._concurrency)])
+            elapsed = time.perf_counter() - start_time
+            await self._delete_submissions()
+        finally:
+            self._client.close()
+        return summarize(self._samples, elapsed)
+
+    async def _work(self, deadline: Optional[float], remaining: Optional[List[int]]):
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if remaining is not None:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            kind = self._random.choices(self._kinds, weights=self._weights)[0]
+            path, kwargs = getattr(self, f"_new_{kind}_request")()
+            await self._request(kind, path, **kwargs)
+
+    async def _request(self, kind: Optional[str], path: str, **kwargs) -> tornado.httpclient.HTTPResponse:
+        headers = dict(kwargs.pop("headers", {}))
+        if self._cookie:
+            headers["Cookie"] = self._cookie
+        start_time = time.perf_counter()
+        response = await self._client.fetch(self._base_url + path, headers=headers, raise_error=False,
+                                            request_timeout=300, **kwargs)
+        if kind is not None:
+            self._samples.append((kind, time.perf_counter() - start_time, response.code,
+                                  len(response.body) if response.body else 0))
+        return response
+
+    async def _login(self):
+        body = tornado.escape.json_encode(dict(username=self._user, password=self._password))
+        response = await self._request(None, API_URL_PREFIX + "/users/login", method="POST", body=body)
+        if response.code != 200:
+            raise RuntimeError(f"login failed: {response.code} {response.reason}")
+        self._cookie = response.headers.get("Set-Cookie")
+
+    async def _find_dataset_ids(self):
+        response = await self._request(None, API_URL_PREFIX + "/datasets?count=1000")
+        if response.code != 200:
+            raise RuntimeError(f"search for datasets failed: {response.code} {response.reason}")
+        result = tornado.escape.json_decode(response.body)
+        self._dataset_ids = [dataset["id"] for dataset in result["datasets"]]
+        if not self._dataset_ids:
+            raise RuntimeError("no datasets found, the database must contain datasets")
+
+    async def _delete_submissions(self):
+        for submission_id in self._submission_ids:
+            await self._request(None, API_URL_PREFIX + f"/store/upload/submission/{submission_id}", method="DELETE")
+
+    def _new_search_request(self):
+        params = dict(count=self._random.choice([10, 50, 100]))
+        choice = self._random.random()
+        if choice < 0.3:
+            lon = self._random.uniform(100., 115.)
+            lat = self._random.uniform(5., 15.)
+            params["region"] = f"{lon},{lat},{lon + 5.},{lat + 5.}"
+        elif choice < 0.6:
+            params["expr"] = f"cruise:bench_{self._random.choice(SPECTRAL_MODES)}"
+        elif choice < 0.8:
+            params["offset"] = self._random.randint(1, max(1, len(self._dataset_ids) - 10))
+        return API_URL_PREFIX + "/datasets?" + urllib.parse.urlencode(params), dict()
+
+    def _new_fetch_request(self):
+        return API_URL_PREFIX + f"/datasets/{self._random.choice(self._dataset_ids)}", dict()
+
+    def _new_validate_request(self):
+        return API_URL_PREFIX + "/store/upload/submission/validate", dict(method="POST", body=self._validate_body)
+
+    def _new_upload_request(self):
+        submission_id = "load-" + uuid.uuid4().hex[:12]
+        self._submission_ids.append(submission_id)
+        content_type, body = encode_multipart(dict(submissionid=submission_id,
+                                                   path="BENCH/loadtest/upload",
+                                                   publicationdate="none",
+                                                   allowpublication="false"),
+                                              dict(datasetfiles=(f"{submission_id}.txt", self._upload_text)))
+        return API_URL_PREFIX + "/store/upload/submission", dict(method="POST", body=body,
+                                                                 headers={"Content-Type": content_type})
+
+    def _new_download_request(self):
+        submission_id = f"bench-{self._random.randint(0, max(0, len(self._dataset_ids) // 10 - 1))}"
+        query = urllib.parse.urlencode(dict(expr=f"submission_id:{submission_id}"))
+        return API_URL_PREFIX + "/store/download?" + query, dict()
+
+
+def encode_multipart(fields: Dict[str, str], files: Dict[str, Tuple[str, str]]) -> Tuple[str, bytes]:
+    """Encode *fields* and *files* (field name -> (file name, text)) as multipart/form-data."""
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (file_name, text) in files.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{file_name}"\r\n'
+                   f'Content-Type: text/plain\r\n\r\n'.encode())
+        body.write(text.encode())
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return f"multipart/form-data; boundary={boundary}", body.getvalue()
+
+
+def serve(port: int, store_path: str, num_datasets: int, num_rows: int, mongodb_url: Optional[str]):
+    """Fill the test database and serve the application on *port*, runs in a separate process."""
+    from eocdb.db.mongo_db_driver import MongoDbDriver
+    from eocdb.ws.app import new_application
+    from eocdb.ws.context import WsContext
+
+    db_parameters = dict(url=mongodb_url) if mongodb_url else dict(mock=True)
+    ctx = WsContext(base_dir=store_path)
+    ctx.configure(dict(admin_user=dict(name=DEFAULT_USER, id="eocdb_administrator", password=DEFAULT_PASSWORD,
+                                       roles=["admin", "submit"]),
+                       databases=dict(default=dict(type="eocdb.db.mongo_db_driver.MongoDbDriver",
+                                                   parameters=db_parameters)),
+                       store_path=store_path))
+    db_driver = ctx.db_driver
+    if isinstance(db_driver, MongoDbDriver) and mongodb_url:
+        db_driver.clear()
+    for i in range(num_datasets):
+        spectral_mode = SPECTRAL_MODES[i % len(SPECTRAL_MODES)]
+        text = new_seabass_text(num_rows, spectral_mode, seed=i)
+        dataset = SbFileReader().read(io.StringIO(text))
+        dataset.path = f"BENCH/bench/{spectral_mode}/archive/dataset-{i:06d}.txt"
+        dataset.submission_id = f"bench-{i // 10}"
+        dataset.status = "PUBLISHED"
+        file_path = os.path.join(ctx.store_path, dataset.path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w") as fp:
+            fp.write(text)
+        db_driver.add_dataset(dataset)
+
+    application = new_application()
+    application.ws_context = ctx
+    application.time_of_last_activity = time.perf_counter()
+    server = tornado.httpserver.HTTPServer(application)
+    server.listen(port, address="127.0.0.1")
+    tornado.ioloop.IOLoop.current().start()
+
+
+def start_server(store_path: str, num_datasets: int, num_rows: int,
+                 mongodb_url: Optional[str] = None) -> Tuple[multiprocessing.Process, str]:
+    """Start the service in a separate process, so that it does not compete with the load generator for the GIL."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = multiprocessing.Process(target=serve, args=(port, store_path, num_datasets, num_rows, mongodb_url),
+                                      daemon=True)
+    process.start()
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if not process.is_alive():
+            raise RuntimeError("web service process terminated unexpectedly")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1.):
+                return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("web service did not start in time")
+
+
+def main(args=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest",
+                                     description="HTTP load test for the OCDB web service.")
+    parser.add_argument("--url", default=None,
+                        help="base URL of a running service, by default a service is started on a test database")
+    parser.add_argument("--mongodb-url", default=None,
+                        help="database of the started service instead of mongomock, its 'eocdb' database "
+                             "will be cleared")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"weighted request mix of {', '.join(REQUEST_KINDS)}")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="number of concurrent clients")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION,
+                        help="duration of the test in seconds")
+    parser.add_argument("--requests", type=int, default=None,
+                        help="stop after this number of requests instead of after the duration")
+    parser.add_argument("--datasets", type=int, default=DEFAULT_NUM_DATASETS,
+                        help="number of datasets in the test database of the started service")
+    parser.add_argument("--rows", type=int, default=DEFAULT_NUM_ROWS,
+                        help="number of rows of the datasets and uploaded files")
+    parser.add_argument("--user", default=DEFAULT_USER, help="user name of an administrator")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="password of the administrator")
+    parser.add_argument("--output", default=None, help="write the report as JSON to this file")
+    args = parser.parse_args(args)
+
+    weights = parse_mix(args.mix)
+    process = None
+    store_path = None
+    base_url = args.url
+    try:
+        if base_url is None:
+            store_path = tempfile.mkdtemp(prefix="ocdb_loadtest_")
+            process, base_url = start_server(store_path, args.datasets, args.rows, args.mongodb_url)
+
+        generator = LoadGenerator(base_url, weights, args.concurrency,
+                                  user=args.user, password=args.password, num_rows=args.rows)
+        report = asyncio.run(generator.run(duration=None if args.requests else args.duration,
+                                           num_requests=args.requests))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
+        if store_path is not None:
+            shutil.rmtree(store_path, ignore_errors=True)
+
+    report.update(concurrency=args.concurrency, mix=weights)
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2)
+    return 0
+
+
+def _print_report(report: Dict[str, Any]):
+    print(f"{'kind':<10} {'requests':>9} {'errors':>7} {'req/s':>9} "
+          + " ".join(f"{'p' + str(p) + ' ms':>10}" for p in PERCENTILES) + f" {'max ms':>10}")
+    rows = list(report["kinds"].items()) + [("total", report["total"])]
+    for kind, summary in rows:
+        print(f"{kind:<10} {summary['requests']:>9} {summary['errors']:>7} {summary['throughput_per_s'] or 0:>9.1f} "
+              + " ".join(f"{summary[f'p{p}_ms'] or 0:>10.1f}" for p in PERCENTILES)
+              + f" {summary['max_ms'] or 0:>10.1f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
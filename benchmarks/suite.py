@@ -0,0 +1,175 @@
+"""
+The benchmarks, a runner that times them and the comparison of results against a baseline.
+"""
+
+import datetime
+import io
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from benchmarks.synthetic import SPECTRAL_MODES, new_seabass_text
+from eocdb.core import QueryParser
+from eocdb.core.models.dataset import Dataset
+from eocdb.core.models.dataset_query import DatasetQuery
+from eocdb.core.seabass.sb_file_reader import SbFileReader
+from eocdb.core.val.validator import Validator
+from eocdb.db.mongo_db_driver import MongoDbDriver
+from eocdb.db.mongo_query_generator import MongoQueryGenerator
+
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_REPEAT = 5
+DEFAULT_NUM_DATASETS = 1000
+DEFAULT_TOLERANCE = 0.2
+
+QUERY_EXPRESSIONS = ["cruise:jun16scs",
+                     "investigators:Jane_Doe AND experiment:BENCHMARK",
+                     "station:1 OR station:2",
+                     "wt:[15 TO 25]",
+                     "cruise:bench_*",
+                     "\"Synthetic Ocean Institute\""]
+
+# name -> (function to be timed, number of items it processes)
+Benchmark = Tuple[str, Callable[[], Any], int]
+
+
+def new_benchmarks(sizes: Sequence[int] = DEFAULT_SIZES,
+                   num_datasets: int = DEFAULT_NUM_DATASETS,
+                   name_filter: Optional[str] = None,
+                   mongodb_url: Optional[str] = None) -> List[Benchmark]:
+    """
+    Create the benchmarks. Benchmarks, whose names do not contain *name_filter*,
+    are skipped before their test data is generated. The find_datasets benchmarks use
+    mongomock, unless *mongodb_url* is given. Note that the database is cleared in this case.
+    """
+
+    def wanted(name: str) -> bool:
+        return name_filter is None or name_filter in name
+
+    benchmarks = []
+    validator = Validator()
+    for spectral_mode in SPECTRAL_MODES:
+        for size in sizes:
+            names = {kind: f"{kind}/{spectral_mode}/{size}" for kind in ("read", "validate", "to_dict", "from_dict")}
+            if not any(wanted(name) for name in names.values()):
+                continue
+            text = new_seabass_text(size, spectral_mode)
+            dataset = SbFileReader().read(io.StringIO(text))
+            dataset_dict = dataset.to_dict()
+            if wanted(names["read"]):
+                benchmarks.append((names["read"], _reader(text), size))
+            if wanted(names["validate"]):
+                benchmarks.append((names["validate"], _validator(validator, dataset), size))
+            if wanted(names["to_dict"]):
+                benchmarks.append((names["to_dict"], dataset.to_dict, size))
+            if wanted(names["from_dict"]):
+                benchmarks.append((names["from_dict"], _from_dict(dataset_dict), size))
+
+    if wanted("query/parse_generate"):
+        benchmarks.append(("query/parse_generate", _parse_and_generate, len(QUERY_EXPRESSIONS)))
+
+    find_names = [f"find_datasets/{num_datasets}/{kind}" for kind in ("all", "expr", "region", "page")]
+    if any(wanted(name) for name in find_names):
+        db_driver = _new_filled_db_driver(num_datasets, mongodb_url)
+        queries = [DatasetQuery(count=100),
+                   DatasetQuery(expr="cruise:bench_multispectral", count=100),
+                   DatasetQuery(region=[109.0, 11.0, 110.0, 12.0], count=100),
+                   DatasetQuery(offset=num_datasets // 2, count=100)]
+        for name, query in zip(find_names, queries):
+            if wanted(name):
+                benchmarks.append((name, _finder(db_driver, query), num_datasets))
+
+    return benchmarks
+
+
+def run_benchmarks(benchmarks: Sequence[Benchmark],
+                   repeat: int = DEFAULT_REPEAT,
+                   monitor: Callable[[str], None] = None) -> Dict[str, Any]:
+    """Time each benchmark *repeat* times and return a JSON-serializable result document."""
+    results = []
+    for name, function, num_items in benchmarks:
+        durations = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            function()
+            durations.append(time.perf_counter() - start_time)
+        median = statistics.median(durations)
+        result = dict(name=name,
+                      items=num_items,
+                      repeat=repeat,
+                      min_s=min(durations),
+                      median_s=median,
+                      mean_s=statistics.mean(durations),
+                      items_per_s=num_items / median if median > 0 else None)
+        results.append(result)
+        if monitor is not None:
+            monitor(f"{name}: median {median * 1000:.3f} ms, {result['items_per_s'] or 0:.1f} items/s")
+
+    return dict(meta=dict(created=datetime.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                          python=sys.version.split()[0],
+                          platform=platform.platform(),
+                          machine=platform.machine()),
+                results=results)
+
+
+def compare_results(results: Dict[str, Any],
+                    baseline: Dict[str, Any],
+                    tolerance: float = DEFAULT_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    Compare the median durations of *results* with the ones of *baseline*.
+    A benchmark has regressed, if it got slower by more than the relative *tolerance*.
+    """
+    baseline_results = {result["name"]: result for result in baseline.get("results", [])}
+    comparisons = []
+    for result in results["results"]:
+        baseline_result = baseline_results.get(result["name"])
+        if baseline_result is None or not baseline_result["median_s"]:
+            continue
+        ratio = result["median_s"] / baseline_result["median_s"]
+        comparisons.append(dict(name=result["name"],
+                                baseline_median_s=baseline_result["median_s"],
+                                median_s=result["median_s"],
+                                ratio=ratio,
+                                regressed=ratio > 1. + tolerance))
+    return comparisons
+
+
+def _reader(text: str) -> Callable[[], Any]:
+    return lambda: SbFileReader().read(io.StringIO(text))
+
+
+def _validator(validator: Validator, dataset: Dataset) -> Callable[[], Any]:
+    return lambda: validator.validate_dataset(dataset)
+
+
+def _from_dict(dataset_dict: Dict[str, Any]) -> Callable[[], Any]:
+    return lambda: Dataset.from_dict(dataset_dict)
+
+
+def _finder(db_driver: MongoDbDriver, query: DatasetQuery) -> Callable[[], Any]:
+    return lambda: db_driver.find_datasets(query)
+
+
+def _parse_and_generate():
+    for expression in QUERY_EXPRESSIONS:
+        query_generator = MongoQueryGenerator()
+        QueryParser.parse(expression).accept(query_generator)
+
+
+def _new_filled_db_driver(num_datasets: int, mongodb_url: Optional[str]) -> MongoDbDriver:
+    db_driver = MongoDbDriver()
+    if mongodb_url:
+        db_driver.init(url=mongodb_url)
+        db_driver.clear()
+    else:
+        db_driver.init(mock=True)
+    for i in range(num_datasets):
+        spectral_mode = SPECTRAL_MODES[i % len(SPECTRAL_MODES)]
+        dataset = SbFileReader().read(io.StringIO(new_seabass_text(10, spectral_mode, seed=i)))
+        dataset.path = f"BENCH/bench/{spectral_mode}/archive/dataset-{i:06d}.txt"
+        dataset.submission_id = f"bench-{i // 100}"
+        dataset.status = "PUBLISHED"
+        db_driver.add_dataset(dataset)
+    return db_driver
@@ -0,0 +1,84 @@
+"""
+Generators for synthetic, but valid, SeaBASS files used by the benchmarks.
+"""
+
+import datetime
+import random
+from typing import List
+
+MULTISPECTRAL_WAVELENGTHS = [380, 412, 443, 490, 510, 532, 555, 565, 589, 620, 665, 683, 705]
+HYPERSPECTRAL_WAVELENGTHS = [350 + 3 * i for i in range(151)]
+
+SPECTRAL_MODES = ("multispectral", "hyperspectral")
+
+
+def get_wavelengths(spectral_mode: str) -> List[int]:
+    if spectral_mode == "multispectral":
+        return MULTISPECTRAL_WAVELENGTHS
+    if spectral_mode == "hyperspectral":
+        return HYPERSPECTRAL_WAVELENGTHS
+    raise ValueError(f"spectral_mode must be one of {SPECTRAL_MODES}, but was {spectral_mode!r}")
+
+
+def new_seabass_text(num_rows: int, spectral_mode: str = "multispectral", seed: int = 0) -> str:
+    """
+    Generate the content of a SeaBASS file with *num_rows* records of down-welling irradiance (ED)
+    and up-welling radiance (LU) profiles at multi- or hyperspectral wavelengths.
+    The same *seed* always generates the same content.
+    """
+    rnd = random.Random(seed)
+    wavelengths = get_wavelengths(spectral_mode)
+
+    fields = ["date", "time", "lat", "lon", "depth", "wt"] \
+             + [f"ED{wl}" for wl in wavelengths] \
+             + [f"LU{wl}" for wl in wavelengths]
+    units = ["yyyymmdd", "hh:mm:ss", "degrees", "degrees", "m", "degreesC"] \
+            + ["uW/cm^2/nm"] * (2 * len(wavelengths))
+
+    start_time = datetime.datetime(2016, 6, 3, 5, 42, 49)
+    end_time = start_time + datetime.timedelta(seconds=num_rows - 1)
+    lat = 11.0 + 2.0 * rnd.random()
+    lon = 109.0 + 2.0 * rnd.random()
+
+    lines = ["/begin_header",
+             "/investigators=Jane_Doe",
+             "/affiliations=Synthetic_Ocean_Institute",
+             "/contact=jane.doe@example.org",
+             "/experiment=BENCHMARK",
+             f"/cruise=bench_{spectral_mode}",
+             "/station=1",
+             f"/data_file_name=bench_{spectral_mode}_{num_rows}.txt",
+             "/documents=bench_protocol.pdf",
+             "/calibration_files=bench_cal.txt",
+             "/data_type=cast",
+             "/data_status=final",
+             f"/start_date={start_time:%Y%m%d}",
+             f"/end_date={end_time:%Y%m%d}",
+             f"/start_time={start_time:%H:%M:%S}[GMT]",
+             f"/end_time={end_time:%H:%M:%S}[GMT]",
+             f"/north_latitude={lat + 0.5:.3f}[DEG]",
+             f"/south_latitude={lat:.3f}[DEG]",
+             f"/east_longitude={lon + 0.5:.3f}[DEG]",
+             f"/west_longitude={lon:.3f}[DEG]",
+             "/water_depth=120",
+             "/missing=-999",
+             "/delimiter=comma",
+             "/fields=" + ",".join(fields),
+             "/units=" + ",".join(units),
+             "/end_header"]
+
+    for i in range(num_rows):
+        timestamp = start_time + datetime.timedelta(seconds=i)
+        depth = 0.1 * (i % 1000)
+        attenuation = 1.0 / (1.0 + 0.05 * depth)
+        values = [f"{timestamp:%Y%m%d}",
+                  f"{timestamp:%H:%M:%S}",
+                  f"{lat + 0.5 * rnd.random():.5f}",
+                  f"{lon + 0.5 * rnd.random():.5f}",
+                  f"{depth:.1f}",
+                  f"{20.0 + rnd.random():.3f}"]
+        values += [f"{200.0 * attenuation * rnd.random():.6f}" for _ in wavelengths]
+        values += [f"{4.0 * attenuation * rnd.random():.6f}" for _ in wavelengths]
+        lines.append(",".join(values))
+
+    return "\n".join(lines) + "\n"
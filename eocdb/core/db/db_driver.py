@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import Optional, List
+from typing import Optional, List, Iterator, Dict, Any, Tuple
 
 from eocdb.core.db.db_links import DbLinks
 from eocdb.core.db.db_submission import DbSubmission
@@ -9,6 +9,14 @@ from .. import Service
 from ..models import DatasetQueryResult
 from ..models.dataset import Dataset
 from ..models.dataset_query import DatasetQuery
+from ..models.issue import Issue
+from ..models.qc_info import QcInfo
+
+# Number of datasets read from the database at once by DbDriver.iter_datasets()
+DATASETS_BATCH_SIZE = 1000
+
+# Fields submissions can be sorted by, see DbDriver.find_submissions()
+SUBMISSION_SORT_FIELDS = ("date", "status")
 
 
 class DbDriver(Service):
@@ -26,12 +34,54 @@ class DbDriver(Service):
         """Delete existing dataset by ID and return success."""
 
     @abstractmethod
-    def get_dataset(self, dataset_id: str) -> Optional[Dataset]:
-        """Get existing dataset by ID."""
+    def get_dataset(self, dataset_id: str, with_records: bool = True) -> Optional[Dataset]:
+        """Get existing dataset by ID. If *with_records* is False, the records of the dataset are empty."""
 
     @abstractmethod
-    def find_datasets(self, query: DatasetQuery) -> DatasetQueryResult:
-        """Find datasets for given query and return list of dataset references."""
+    def get_data_generation(self) -> str:
+        """
+        Get the data generation of the database, which changes whenever datasets are added, changed or removed,
+        by any process using the database. It is used to validate cached responses.
+        """
+
+    @abstractmethod
+    def update_dataset_qc_info(self, dataset_id: str, qc_info: QcInfo) -> bool:
+        """Set the QC info in the metadata of existing dataset by ID, without rewriting the dataset. Return success."""
+
+    @abstractmethod
+    def get_dataset_records(self, dataset_id: str, offset: int = 0, count: int = None,
+                            columns: List[int] = None) -> Optional[List[List]]:
+        """
+        Get *count* records, or all, of existing dataset by ID, starting at record index *offset*.
+        If *columns* is given, the records only contain the values of the columns with these indexes.
+        """
+
+    @abstractmethod
+    def find_datasets(self, query: DatasetQuery, timeout: float = None) -> DatasetQueryResult:
+        """
+        Find datasets for given query and return list of dataset references.
+        The references must be ordered by path, then by ID, so that the results of several drivers can be merged.
+        If *timeout* is given, the search must be abandoned with an error after that many seconds.
+        """
+
+    @abstractmethod
+    def iter_datasets(self, query: DatasetQuery, projection: List[str] = None,
+                      batch_size: int = DATASETS_BATCH_SIZE, search: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over all datasets matching *query*, ignoring its offset and count, in the order of find_datasets().
+        Datasets are read *batch_size* at a time as the iteration proceeds. Each dataset is given as dictionary
+        with its "id" and the fields named in *projection*, by default its "path". Nested fields are named
+        with dots, e.g. "metadata.cruise".
+        The datasets are read as up to date as writes see them, unless *search* is True. Then they may be read
+        like find_datasets() does, which only suits read-only operations.
+        """
+
+    @abstractmethod
+    def find_tile_counts(self, query: DatasetQuery, quadkey: str) -> Iterator[Dict[str, int]]:
+        """
+        For each dataset that matches *query* and has locations within the tile given by *quadkey*,
+        get its numbers of locations per tile at zoom level TILE_INDEX_ZOOM, keyed by quadkey.
+        """
 
     @abstractmethod
     def add_submission(self, submission: DbSubmission) -> str:
@@ -41,6 +91,14 @@ class DbDriver(Service):
     def get_submission_file(self, submission_id: str, index: int) -> Optional[SubmissionFile]:
         """Get existing submission_file by ID."""
 
+    @abstractmethod
+    def get_submission_file_issues(self, submission_id: str, index: int, offset: int = 0,
+                                   count: int = None) -> Optional[Tuple[int, List[Issue]]]:
+        """
+        Get the total number of validation issues of existing submission file by submission ID and index,
+        and *count* issues, or all, starting at issue index *offset*.
+        """
+
     @abstractmethod
     def get_submissions(self) -> List[DbSubmission]:
         """Get existing submissions for user."""
@@ -49,6 +107,16 @@ class DbDriver(Service):
     def get_submissions_for_user(self, user_id: str, is_admin: bool = False) -> List[DbSubmission]:
         """Get existing submissions for user."""
 
+    @abstractmethod
+    def find_submissions(self, user_id: str = None, status: str = None, sort_by: str = "date",
+                         descending: bool = False, offset: int = 0,
+                         count: int = None) -> Tuple[int, List[DbSubmission]]:
+        """
+        Find the submissions of the user with *user_id* and/or having *status*, or all, sorted by *sort_by*,
+        one of SUBMISSION_SORT_FIELDS. Return the total number of matching submissions, and *count* of them,
+        or all, starting at index *offset*. The files of the returned submissions have no validation results.
+        """
+
     @abstractmethod
     def get_submission(self, submission_id: str) -> Optional[DbSubmission]:
         """Get existing submission_file by ID."""
@@ -59,7 +127,19 @@ class DbDriver(Service):
 
     @abstractmethod
     def update_submission(self, submission: DbSubmission) -> bool:
-        """Get existing submission_file by ID."""
+        """
+        Replace existing submission by *submission* and increment the submission's version.
+        The update fails if the stored submission has been updated since *submission* was read. Return success.
+        """
+
+    @abstractmethod
+    def update_submission_fields(self, submission: DbSubmission, field_names: List[str],
+                                 check_version: bool = False) -> bool:
+        """
+        Atomically set the fields of existing submission named by *field_names*, e.g. "files.2.status",
+        to their values in *submission* and increment the submission's version. If *check_version* is True,
+        the update fails if the stored submission has been updated since *submission* was read. Return success.
+        """
 
     @abstractmethod
     def add_user(self, user: DbUser) -> str:
@@ -19,7 +19,8 @@ class DbSubmission(Submission):
                  files: List[SubmissionFile],
                  id_: str = None,
                  publication_date: datetime = None,
-                 allow_publication: bool = None):
+                 allow_publication: bool = None,
+                 version: int = 0):
         super().__init__(submission_id, user_id, date, status, qc_status, publication_date,
                          allow_publication, [])
 
@@ -27,6 +28,7 @@ class DbSubmission(Submission):
         self._path = path
         self._store_sub_path = store_sub_path
         self._files = files
+        self._version = version
 
     @property
     def files(self):
@@ -52,6 +54,15 @@ class DbSubmission(Submission):
     def store_sub_path(self, value: str):
         self._store_sub_path = value
 
+    @property
+    def version(self) -> int:
+        """Incremented with every update of the stored submission, used to detect concurrent updates."""
+        return self._version
+
+    @version.setter
+    def version(self, value: int):
+        self._version = value
+
     @property
     def id(self) -> str:
         return self._id
@@ -85,7 +96,14 @@ class DbSubmission(Submission):
                             publication_date=subm.publication_date,
                             allow_publication=subm.allow_publication,
                             files=subm_files_array,
-                            id_=id_)
+                            id_=id_,
+                            version=dictionary.get("version", 0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        submission_dict = super().to_dict()
+        # the version is maintained by the database driver
+        del submission_dict["version"]
+        return submission_dict
 
     def to_submission(self):
         file_refs = []
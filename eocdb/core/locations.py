@@ -0,0 +1,148 @@
+import base64
+import json
+import math
+from typing import Sequence, Tuple, List, Optional, Dict, Any, Iterable
+
+import numpy as np
+
+Point = Tuple[float, float]
+
+LOCATION_FORMATS = ('geojson', 'binary')
+
+# Coordinates of the binary encoding are integer multiples of this many degrees (about 11 cm at the equator)
+BINARY_RESOLUTION = 1e-6
+
+
+def thin_points(points: Sequence[Point], max_points: Optional[int]) -> Sequence[Point]:
+    """
+    Reduce *points* to at most *max_points* evenly spaced points, keeping the first and the last one.
+    """
+    num_points = len(points)
+    if max_points is None or max_points <= 0 or num_points <= max_points:
+        return points
+    if max_points == 1:
+        return [points[0]]
+    indexes = np.linspace(0, num_points - 1, max_points).round().astype(np.int64)
+    return [points[i] for i in indexes]
+
+
+def to_geojson(points: Sequence[Point]) -> Dict[str, Any]:
+    """Convert *points* given as (lon, lat) into a GeoJSON MultiPoint geometry."""
+    return dict(type='MultiPoint', coordinates=[[lon, lat] for lon, lat in points])
+
+
+def to_geojson_text(points: Sequence[Point]) -> Optional[str]:
+    """
+    Convert *points* given as (lon, lat) into the compact JSON text of a GeoJSON feature collection
+    with one point feature per point. Returns None, if there are no points.
+    """
+    if len(points) == 0:
+        return None
+    features = [{'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lon, lat]}}
+                for lon, lat in points]
+    return json.dumps({'type': 'FeatureCollection', 'features': features}, separators=(',', ':'))
+
+
+def encode_points(points: Sequence[Point]) -> str:
+    """
+    Encode *points* given as (lon, lat) into a base64 string of little-endian int32 values
+    lon0, lat0, dlon1, dlat1, ..., where coordinates are given in units of BINARY_RESOLUTION
+    degrees and all but the first point are given as difference to their predecessor.
+    """
+    if len(points) == 0:
+        return ''
+    coordinates = np.round(np.asarray(points, dtype=np.float64) / BINARY_RESOLUTION).astype(np.int64)
+    deltas = np.empty_like(coordinates)
+    deltas[0] = coordinates[0]
+    deltas[1:] = coordinates[1:] - coordinates[:-1]
+    return base64.b64encode(deltas.astype('<i4').tobytes()).decode('ascii')
+
+
+def decode_points(text: str) -> List[Point]:
+    """Decode points encoded by :func:`encode_points`."""
+    deltas = np.frombuffer(base64.b64decode(text), dtype='<i4').astype(np.int64).reshape((-1, 2))
+    coordinates = np.cumsum(deltas, axis=0) * BINARY_RESOLUTION
+    return [(float(lon), float(lat)) for lon, lat in coordinates.round(6)]
+
+
+# Zoom level of the tiles, given as quadkeys, that index the locations of each dataset (cells of about 10 km)
+TILE_INDEX_ZOOM = 12
+
+_MAX_LATITUDE = 85.05112878
+
+
+def to_tile(lon: float, lat: float, zoom: int) -> Tuple[int, int]:
+    """Get x and y of the Web Mercator tile at *zoom* that contains the point (*lon*, *lat*)."""
+    num_tiles = 1 << zoom
+    lat = min(max(lat, -_MAX_LATITUDE), _MAX_LATITUDE)
+    x = int((lon + 180.) / 360. * num_tiles)
+    y = int((1. - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2. * num_tiles)
+    return min(max(x, 0), num_tiles - 1), min(max(y, 0), num_tiles - 1)
+
+
+def tile_to_quadkey(zoom: int, x: int, y: int) -> str:
+    digits = []
+    for i in range(zoom, 0, -1):
+        mask = 1 << (i - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return ''.join(digits)
+
+
+def quadkey_to_tile(quadkey: str) -> Tuple[int, int, int]:
+    """Get zoom, x and y of the tile given by *quadkey*."""
+    x = y = 0
+    for digit in quadkey:
+        x = (x << 1) | (int(digit) & 1)
+        y = (y << 1) | (int(digit) >> 1)
+    return len(quadkey), x, y
+
+
+def tile_center(zoom: int, x: int, y: int) -> Point:
+    num_tiles = 1 << zoom
+    lon = (x + 0.5) / num_tiles * 360. - 180.
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1. - 2. * (y + 0.5) / num_tiles))))
+    return lon, lat
+
+
+def count_tiles(points: Sequence[Point], zoom: int = TILE_INDEX_ZOOM) -> Dict[str, int]:
+    """Count the *points* per tile at *zoom*. The tiles are given as quadkeys, in ascending order."""
+    counts = {}
+    for lon, lat in points:
+        quadkey = tile_to_quadkey(zoom, *to_tile(lon, lat, zoom))
+        counts[quadkey] = counts.get(quadkey, 0) + 1
+    return dict(sorted(counts.items()))
+
+
+def cluster_tiles(tile_counts: Iterable[Dict[str, int]], quadkey: str, cluster_zoom: int) -> List[Dict[str, Any]]:
+    """
+    Aggregate the index tile counts of several datasets into clusters within the tile given by *quadkey*.
+    There is one cluster per tile at *cluster_zoom* containing locations. A cluster's position is the
+    centroid of the centers of its index tiles, weighted by their numbers of locations.
+    """
+    clusters = {}
+    for dataset_tile_counts in tile_counts:
+        dataset_clusters = set()
+        for index_quadkey, count in dataset_tile_counts.items():
+            if not index_quadkey.startswith(quadkey):
+                continue
+            cluster_quadkey = index_quadkey[:cluster_zoom]
+            cluster = clusters.get(cluster_quadkey)
+            if cluster is None:
+                cluster = clusters[cluster_quadkey] = [0, 0, 0., 0.]
+            lon, lat = tile_center(*quadkey_to_tile(index_quadkey))
+            cluster[0] += count
+            cluster[2] += count * lon
+            cluster[3] += count * lat
+            if cluster_quadkey not in dataset_clusters:
+                dataset_clusters.add(cluster_quadkey)
+                cluster[1] += 1
+
+    result = []
+    for cluster_quadkey, (count, num_datasets, lon_sum, lat_sum) in sorted(clusters.items()):
+        zoom, x, y = quadkey_to_tile(cluster_quadkey)
+        result.append(dict(tile=f'{zoom}/{x}/{y}',
+                           lon=round(lon_sum / count, 6),
+                           lat=round(lat_sum / count, 6),
+                           count=count,
+                           datasets=num_datasets))
+    return result
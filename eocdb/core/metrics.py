@@ -0,0 +1,204 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Sequence, Dict, Tuple, List, Optional
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10.)
+
+LabelValues = Tuple[str, ...]
+
+
+class MetricsRegistry:
+    """A collection of metrics that can be rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, metric: "Metric"):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'metric "{metric.name}" is already registered')
+            self._metrics[metric.name] = metric
+
+    def get_metric(self, name: str) -> Optional["Metric"]:
+        return self._metrics.get(name)
+
+    def to_text(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.to_lines())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Metric:
+    """Base class for metrics. A metric has a value per combination of its labels' values."""
+
+    type_name = None
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 registry: Optional[MetricsRegistry] = REGISTRY):
+        self._name = name
+        self._documentation = documentation
+        self._label_names = tuple(label_names)
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def label_names(self) -> Tuple[str, ...]:
+        return self._label_names
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def to_lines(self) -> List[str]:
+        lines = [f'# HELP {self._name} {_escape_help(self._documentation)}',
+                 f'# TYPE {self._name} {self.type_name}']
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            lines.extend(self._sample_lines(label_values, value))
+        return lines
+
+    def _sample_lines(self, label_values: LabelValues, value) -> List[str]:
+        return [f'{self._name}{self._format_labels(label_values)} {_format_value(value)}']
+
+    def _get_key(self, labels: Dict[str, str]) -> LabelValues:
+        if len(labels) != len(self._label_names):
+            raise ValueError(f'metric "{self._name}" requires labels {self._label_names}')
+        try:
+            return tuple(str(labels[label_name]) for label_name in self._label_names)
+        except KeyError:
+            raise ValueError(f'metric "{self._name}" requires labels {self._label_names}')
+
+    def _format_labels(self, label_values: LabelValues, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self._label_names, label_values)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + '}'
+
+
+class Counter(Metric):
+    """A value that only increases, e.g. the number of processed requests."""
+
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1., **labels):
+        if amount < 0:
+            raise ValueError('counters can only be increased')
+        key = self._get_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._get_key(labels), 0.)
+
+
+class Gauge(Metric):
+    """A value that can go up and down, e.g. the number of requests in progress."""
+
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._get_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1., **labels):
+        key = self._get_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.) + amount
+
+    def dec(self, amount: float = 1., **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._get_key(labels), 0.)
+
+
+class Histogram(Metric):
+    """Counts observed values, e.g. request latencies in seconds, in cumulative buckets."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional[MetricsRegistry] = REGISTRY):
+        super().__init__(name, documentation, label_names=label_names, registry=registry)
+        self._buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._get_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = _HistogramState(len(self._buckets))
+                self._values[key] = state
+            state.observe(self._buckets, value)
+
+    def get_count(self, **labels) -> int:
+        state = self._values.get(self._get_key(labels))
+        return state.count if state is not None else 0
+
+    def get_sum(self, **labels) -> float:
+        state = self._values.get(self._get_key(labels))
+        return state.sum if state is not None else 0.
+
+    def _sample_lines(self, label_values: LabelValues, state: "_HistogramState") -> List[str]:
+        lines = []
+        cumulative_count = 0
+        for bound, count in zip(self._buckets, state.bucket_counts):
+            cumulative_count += count
+            labels = self._format_labels(label_values, (('le', _format_value(bound)),))
+            lines.append(f'{self._name}_bucket{labels} {cumulative_count}')
+        labels = self._format_labels(label_values, (('le', '+Inf'),))
+        lines.append(f'{self._name}_bucket{labels} {state.count}')
+        labels = self._format_labels(label_values)
+        lines.append(f'{self._name}_sum{labels} {_format_value(state.sum)}')
+        lines.append(f'{self._name}_count{labels} {state.count}')
+        return lines
+
+
+class _HistogramState:
+
+    def __init__(self, num_buckets: int):
+        self.bucket_counts = [0] * num_buckets
+        self.count = 0
+        self.sum = 0.
+
+    def observe(self, buckets: Sequence[float], value: float):
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    return repr(float(value))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
@@ -52,6 +52,9 @@ class Dataset(Model):
         self._attributes = []
         self._groups = []
         self._times = []
+        self._min_depth = None
+        self._max_depth = None
+        self._wlmode = None
 
     @property
     def id(self) -> Optional[str]:
@@ -155,6 +158,31 @@ class Dataset(Model):
         assert_not_none(value, name='times')
         self._times = value
 
+    @property
+    def min_depth(self) -> Optional[float]:
+        return self._min_depth
+
+    @min_depth.setter
+    def min_depth(self, value: Optional[float]):
+        self._min_depth = value
+
+    @property
+    def max_depth(self) -> Optional[float]:
+        return self._max_depth
+
+    @max_depth.setter
+    def max_depth(self, value: Optional[float]):
+        self._max_depth = value
+
+    @property
+    def wlmode(self) -> Optional[str]:
+        """The spectral mode, "multispectral" or "hyperspectral", or None if the dataset has no spectral data."""
+        return self._wlmode
+
+    @wlmode.setter
+    def wlmode(self, value: Optional[str]):
+        self._wlmode = value
+
     def to_dict(self) -> Dict[str, Any]:
         result_dict = super().to_dict()
         converted_times = []
@@ -24,33 +24,44 @@ from typing import List, Optional
 
 from ..model import Model
 
+# Orders of search results: by path, or by relevance of the datasets to the free-text terms of the search expression
+DATASET_SORT_MODES = ('path', 'relevance')
+
 
 class DatasetQuery(Model):
     """
     The DatasetQuery model.
     """
 
+    # queries created by from_dict() from dictionaries without sort mode
+    _sort = 'path'
+
     def __init__(self,
                  expr: str = None,
                  region: List[float] = None,
                  time: List[str] = None,
                  wdepth: List[float] = None,
                  mtype: str = 'all',
+                 wlmode: str = 'all',
                  shallow: str = None,
-                 pmode: str = 'all',
+                 pmode: str = 'contains',
                  pgroup: List[str] = None,
                  status: str = None,
                  submission_id: str = None,
                  pname: List[str] = None,
                  geojson: bool=False,
+                 locformat: str = None,
+                 maxpoints: int = None,
                  offset: int = 1,
                  user_id: str = None,
-                 count: int = 1000):
+                 count: int = 1000,
+                 sort: str = 'path'):
         self._expr = expr
         self._region = region
         self._time = time
         self._wdepth = wdepth
         self._mtype = mtype
+        self._wlmode = wlmode
         self._shallow = shallow
         self._pmode = pmode
         self._pgroup = pgroup
@@ -58,9 +69,12 @@ class DatasetQuery(Model):
         self._submission_id = submission_id
         self._pname = pname
         self._geojson = geojson
+        self._locformat = locformat
+        self._maxpoints = maxpoints
         self._offset = offset
         self._count = count
         self._user_id = user_id
+        self._sort = sort
 
     @property
     def expr(self) -> Optional[str]:
@@ -102,6 +116,14 @@ class DatasetQuery(Model):
     def mtype(self, value: Optional[str]):
         self._mtype = value
 
+    @property
+    def wlmode(self) -> Optional[str]:
+        return self._wlmode
+
+    @wlmode.setter
+    def wlmode(self, value: Optional[str]):
+        self._wlmode = value
+
     @property
     def shallow(self) -> Optional[str]:
         return self._shallow
@@ -158,6 +180,24 @@ class DatasetQuery(Model):
     def geojson(self, value: bool):
         self._geojson = value
 
+    @property
+    def locformat(self) -> Optional[str]:
+        """Format of the locations, "geojson" or "binary". None for GeoJSON text."""
+        return self._locformat
+
+    @locformat.setter
+    def locformat(self, value: Optional[str]):
+        self._locformat = value
+
+    @property
+    def maxpoints(self) -> Optional[int]:
+        """Maximum number of locations per dataset."""
+        return self._maxpoints
+
+    @maxpoints.setter
+    def maxpoints(self, value: Optional[int]):
+        self._maxpoints = value
+
     @property
     def offset(self) -> Optional[int]:
         return self._offset
@@ -181,3 +221,12 @@ class DatasetQuery(Model):
     @user_id.setter
     def user_id(self, value: Optional[int]):
         self._user_id = value
+
+    @property
+    def sort(self) -> str:
+        """Order of the results, one of DATASET_SORT_MODES."""
+        return self._sort
+
+    @sort.setter
+    def sort(self, value: str):
+        self._sort = value
@@ -20,6 +20,8 @@
 # SOFTWARE.
 
 
+from typing import Any, Dict, Optional
+
 from ..model import Model
 from ...core.asserts import assert_not_none
 
@@ -29,13 +31,18 @@ class DatasetRef(Model):
     The DatasetRef model.
     """
 
+    # only set for results of searches in relevance mode
+    _score = None
+
     def __init__(self,
                  id_: str,
-                 path: str):
+                 path: str,
+                 score: float = None):
         assert_not_none(id_, name='id_')
         assert_not_none(path, name='path')
         self._id = id_
         self._path = path
+        self._score = score
 
     @property
     def id(self) -> str:
@@ -53,4 +60,19 @@ class DatasetRef(Model):
     @path.setter
     def path(self, value: str):
         assert_not_none(value, name='value')
-        self._path = value
\ No newline at end of file
+        self._path = value
+
+    @property
+    def score(self) -> Optional[float]:
+        """Relevance of the dataset to the free-text terms of the search expression."""
+        return self._score
+
+    @score.setter
+    def score(self, value: Optional[float]):
+        self._score = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        dataset_ref_dict = super().to_dict()
+        if dataset_ref_dict.get("score") is None:
+            dataset_ref_dict.pop("score", None)
+        return dataset_ref_dict
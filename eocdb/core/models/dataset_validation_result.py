@@ -20,7 +20,7 @@
 # SOFTWARE.
 
 
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from .issue import Issue
 from ..asserts import assert_not_none, assert_one_of
@@ -36,14 +36,19 @@ class DatasetValidationResult(Model):
     The DatasetValidationResult model.
     """
 
+    # results read by from_dict() without issue counts
+    _issue_counts = None
+
     def __init__(self,
                  status: str,
-                 issues: List[Issue]):
+                 issues: List[Issue],
+                 issue_counts: Dict[str, int] = None):
         assert_not_none(status, name='status')
         assert_one_of(status, ['OK', 'WARNING', 'ERROR'], name='status')
         assert_not_none(issues, name='issues')
         self._status = status
         self._issues = issues
+        self._issue_counts = issue_counts
 
     @property
     def status(self) -> str:
@@ -63,3 +68,21 @@ class DatasetValidationResult(Model):
     def issues(self, value: Optional[List[Issue]]):
         assert_not_none(value, name='value')
         self._issues = value
+
+    @property
+    def issue_counts(self) -> Optional[Dict[str, int]]:
+        """
+        The total numbers of issues per issue type, if *issues* only contains the first of them.
+        None, if *issues* is complete.
+        """
+        return self._issue_counts
+
+    @issue_counts.setter
+    def issue_counts(self, value: Optional[Dict[str, int]]):
+        self._issue_counts = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        result_dict = super().to_dict()
+        if result_dict.get("issue_counts") is None:
+            result_dict.pop("issue_counts", None)
+        return result_dict
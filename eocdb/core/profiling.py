@@ -0,0 +1,67 @@
+import cProfile
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+# Python allows only one active profiler per process
+_PROFILER_LOCK = threading.Lock()
+
+
+class Profiler:
+    """
+    Runs the deterministic profiler around a single unit of work, such as a web service request,
+    and writes its statistics in pstats format into a directory.
+
+    Only one profiler can run at a time, :meth:`start` returns False if another one is running.
+    """
+
+    def __init__(self, name: str, profile_dir: str):
+        self._name = name
+        file_name = time.strftime('%Y%m%d-%H%M%S') + '-' + re.sub(r'[^\w.-]', '_', name) + '.pstats'
+        self._path = os.path.join(profile_dir, file_name)
+        self._profile = None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def path(self) -> str:
+        """The path of the file the statistics are written to."""
+        return self._path
+
+    @property
+    def is_running(self) -> bool:
+        return self._profile is not None
+
+    def start(self) -> bool:
+        if self._profile is not None:
+            return True
+        if not _PROFILER_LOCK.acquire(blocking=False):
+            return False
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another tool, e.g. a debugger or coverage, is profiling
+            _PROFILER_LOCK.release()
+            return False
+        self._profile = profile
+        return True
+
+    def stop(self) -> Optional[str]:
+        """Stop profiling and write the statistics. Return the path of the written file."""
+        profile = self._profile
+        if profile is None:
+            return None
+        self._profile = None
+        try:
+            profile.disable()
+        finally:
+            _PROFILER_LOCK.release()
+
+        os.makedirs(os.path.dirname(self._path) or '.', exist_ok=True)
+        profile.dump_stats(self._path)
+        return self._path
@@ -29,6 +29,14 @@ from ...db.static_data import get_groups_for_product
 
 EOF = 'end_of_file'
 
+# Datasets with at least this many distinct wavelengths are hyperspectral, others multispectral
+HYPERSPECTRAL_MIN_WAVELENGTHS = 30
+
+# Wavelength suffixes in nanometers of field names, e.g. "ed412", "rrs443.5" or "lu_unc555"
+_WAVELENGTH_SUFFIX = re.compile(r'[a-z_]+(\d{3,4}(?:\.\d+)?)$')
+_MIN_WAVELENGTH = 200.
+_MAX_WAVELENGTH = 2500.
+
 
 class SbFileReader:
 
@@ -121,13 +129,11 @@ class SbFileReader:
     def _extract_group_list(self):
         full_field_list = self._extract_field_list()
         group_list = []
+        group_set = set()
         for field in full_field_list:
-            groups = get_groups_for_product(field)
-            if len(groups) == 0:
-                continue
-
-            for group in groups:
-                if not group in group_list:
+            for group in get_groups_for_product(field):
+                if group not in group_set:
+                    group_set.add(group)
                     group_list.append(group)
 
         return group_list
@@ -141,6 +147,52 @@ class SbFileReader:
     def _extract_searchfields(self, dataset):
         self._extract_geo_locations(dataset)
         self._extract_times(dataset)
+        self._extract_depth_range(dataset)
+        self._extract_wlmode(dataset)
+
+    def _extract_depth_range(self, dataset):
+        missing_value = self._get_missing_value(dataset.metadata)
+        depths = []
+        if 'depth' in dataset.attribute_names:
+            depth_index = dataset.attribute_names.index('depth')
+            for record in dataset.records:
+                if depth_index < len(record):
+                    depth = record[depth_index]
+                    if isinstance(depth, (int, float)) and depth != missing_value:
+                        depths.append(depth)
+        elif 'measurement_depth' in dataset.metadata:
+            depth_string = dataset.metadata['measurement_depth']
+            if self._is_number(self._strip_unit(depth_string)):
+                depths.append(float(self._strip_unit(depth_string)))
+
+        if depths:
+            dataset.min_depth = float(min(depths))
+            dataset.max_depth = float(max(depths))
+
+    def _extract_wlmode(self, dataset):
+        wavelengths = set()
+        if 'wavelength' in dataset.attribute_names:
+            wavelength_index = dataset.attribute_names.index('wavelength')
+            for record in dataset.records:
+                if wavelength_index < len(record) and isinstance(record[wavelength_index], (int, float)):
+                    wavelengths.add(float(record[wavelength_index]))
+        for attribute_name in dataset.attribute_names:
+            match = _WAVELENGTH_SUFFIX.match(attribute_name)
+            if match is not None:
+                wavelengths.add(float(match.group(1)))
+
+        num_wavelengths = sum(1 for wl in wavelengths if _MIN_WAVELENGTH <= wl <= _MAX_WAVELENGTH)
+        if num_wavelengths >= HYPERSPECTRAL_MIN_WAVELENGTHS:
+            dataset.wlmode = 'hyperspectral'
+        elif num_wavelengths > 0:
+            dataset.wlmode = 'multispectral'
+
+    @classmethod
+    def _get_missing_value(cls, metadata):
+        missing_string = metadata.get('missing')
+        if missing_string is not None and cls._is_number(missing_string):
+            return float(missing_string)
+        return None
 
     def _extract_times(self, dataset):
         if 'date' in dataset.attribute_names and 'time' in dataset.attribute_names:
@@ -290,11 +342,14 @@ class SbFileReader:
 
     @classmethod
     def _extract_angle(cls, angle_str):
-        parse_str = angle_str
-        if '[' in angle_str:
-            unit_index = parse_str.find('[')
-            parse_str = angle_str[0:unit_index]
-        return float(parse_str)
+        return float(cls._strip_unit(angle_str))
+
+    @classmethod
+    def _strip_unit(cls, value_str):
+        if '[' in value_str:
+            unit_index = value_str.find('[')
+            return value_str[0:unit_index]
+        return value_str
 
     @classmethod
     def _extract_date(cls, date_str, time_str, check_gmt=False):
@@ -0,0 +1,85 @@
+import contextlib
+import contextvars
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+_CURRENT_TRACE = contextvars.ContextVar('eocdb_current_trace', default=None)
+
+
+class Trace:
+    """
+    Accumulates the time spent in named phases, e.g. "parse", "auth", "db", "serialize", "write",
+    of a single unit of work such as a web service request.
+    """
+
+    def __init__(self, trace_id: str, name: str):
+        self._trace_id = trace_id
+        self._name = name
+        self._start_time = time.perf_counter()
+        self._durations = OrderedDict()
+
+    @property
+    def trace_id(self) -> str:
+        return self._trace_id
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def elapsed(self) -> float:
+        """Time in seconds since this trace has been started."""
+        return time.perf_counter() - self._start_time
+
+    @property
+    def durations(self) -> Dict[str, float]:
+        """Mapping from phase names to accumulated durations in seconds."""
+        return dict(self._durations)
+
+    def add(self, phase: str, duration: float):
+        self._durations[phase] = self._durations.get(phase, 0.) + duration
+
+    @contextlib.contextmanager
+    def phase(self, phase: str):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start_time)
+
+    def activate(self):
+        """Make this the current trace of the current execution context."""
+        _CURRENT_TRACE.set(self)
+
+    @classmethod
+    def deactivate(cls):
+        _CURRENT_TRACE.set(None)
+
+    def to_server_timing(self) -> str:
+        """Get the value of an HTTP "Server-Timing" header, durations are given in milliseconds."""
+        metrics = [f'{phase};dur={duration * 1000:.1f}' for phase, duration in self._durations.items()]
+        metrics.append(f'total;dur={self.elapsed * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = OrderedDict(trace_id=self._trace_id, name=self._name, total_ms=round(self.elapsed * 1000, 3))
+        for phase, duration in self._durations.items():
+            d[f'{phase}_ms'] = round(duration * 1000, 3)
+        return d
+
+
+def current_trace() -> Optional[Trace]:
+    """Get the current trace or None, if tracing is not active in the current execution context."""
+    return _CURRENT_TRACE.get()
+
+
+@contextlib.contextmanager
+def trace_phase(phase: str):
+    """Add the time spent in the with-block to *phase* of the current trace, if any."""
+    trace = _CURRENT_TRACE.get()
+    if trace is None:
+        yield
+    else:
+        with trace.phase(phase):
+            yield
@@ -1,8 +1,8 @@
 from datetime import datetime
 from typing import List, Optional
 
-from eocdb.core.models import Issue, ISSUE_TYPE_ERROR, ISSUE_TYPE_WARNING
-from eocdb.core.val._gap_aware_dict import GapAwareDict
+from eocdb.core.models import Issue, ISSUE_TYPE_ERROR
+from eocdb.core.val._issue_aggregator import IssueAggregator
 from eocdb.core.val._message_library import MessageLibrary
 
 
@@ -19,20 +19,24 @@ class DateRecordRule:
         self._name = name
         self._min_year = min_year
 
-    def eval(self, unit: str, values: List[str], library: MessageLibrary, missing_value: float = None) -> Optional[List[Issue]]:
+    def eval(self, unit: str, values: List[str], library: MessageLibrary, missing_value: float = None,
+             detail: bool = False) -> Optional[List[Issue]]:
         empty = ""
-        issues = []
+        lower_bound = datetime(self._min_year, 1, 1, 0, 0, 0)
+        aggregator = IssueAggregator(library, {"field_name": self._name,
+                                               "lower_bound": str(lower_bound),
+                                               "upper_bound": str(datetime.today())}, detail=detail)
 
         index = 0
         for value in values:
             value = str(value)
             index += 1
             if value is empty:
-                self._append_error_issue("@data_invalid_date", index, issues, library)
+                aggregator.add(ISSUE_TYPE_ERROR, "@data_invalid_date", index, value)
                 continue
 
             if len(value) != 8:
-                self._append_error_issue("@data_invalid_date", index, issues, library)
+                aggregator.add(ISSUE_TYPE_ERROR, "@data_invalid_date", index, value)
                 continue
 
             try:
@@ -40,39 +44,20 @@ class DateRecordRule:
                 month = int(value[4:6])
                 day = int(value[6:8])
             except:
-                self._append_error_issue("@data_invalid_date", index, issues, library)
+                aggregator.add(ISSUE_TYPE_ERROR, "@data_invalid_date", index, value)
                 continue
 
             if year < self._min_year:
-                self._append_error_issue("@data_date_bounds_error", index, issues, library)
+                aggregator.add(ISSUE_TYPE_ERROR, "@data_date_bounds_error", index, value)
                 continue
 
             if month > 12 or month < 1:
-                self._append_error_issue("@data_invalid_month", index, issues, library)
+                aggregator.add(ISSUE_TYPE_ERROR, "@data_invalid_month", index, value)
 
             if day > 31 or day < 1:
-                self._append_error_issue("@data_invalid_day_of_month", index, issues, library)
-
-        if len(issues) > 0:
-            return issues
-
-        return None
+                aggregator.add(ISSUE_TYPE_ERROR, "@data_invalid_day_of_month", index, value)
 
-    def _append_error_issue(self, message, index, issues, library):
-        error_message = self._assemble_error_message(index, library, message)
-        issues.append(Issue(ISSUE_TYPE_ERROR, error_message))
-
-    def _append_warning_issue(self, message, index, issues, library):
-        error_message = self._assemble_error_message(index, library, message)
-        issues.append(Issue(ISSUE_TYPE_WARNING, error_message))
-
-    def _assemble_error_message(self, index, library, message):
-        today = datetime.today()
-        lower_bound = datetime(self._min_year, 1, 1, 0, 0, 0)
-        message_dict = GapAwareDict(
-            {"field_name": self._name, "line": index, "lower_bound": str(lower_bound), "upper_bound": str(today)})
-        error_message = library.resolve_error(message, message_dict)
-        return error_message
+        return aggregator.get_issues()
 
     @property
     def name(self) -> str:
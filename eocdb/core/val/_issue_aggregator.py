@@ -0,0 +1,99 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from eocdb.core.models import Issue
+from eocdb.core.val._gap_aware_dict import GapAwareDict
+from eocdb.core.val._message_library import MessageLibrary
+
+# Maximum number of line runs listed in an aggregated issue
+MAX_LINE_RUNS = 5
+
+
+class IssueAggregator:
+    """
+    Collects the issues a record rule finds in single measurement lines.
+
+    By default, the lines having the same issue are aggregated into a single issue. Its message is resolved
+    only once, with the "line" token given as runs of line numbers, e.g. "12-15, 20 (5 occurrences)", and
+    the "value" token as range of the offending values. A single occurrence gives the same message as in
+    detail mode, where there is one issue per line.
+    """
+
+    def __init__(self, library: MessageLibrary, tokens: Dict[str, Any], detail: bool = False):
+        self._library = library
+        self._tokens = tokens
+        self._detail = detail
+        self._issues = []
+        self._runs: Dict[Tuple[str, str], _LineRuns] = {}
+
+    def add(self, issue_type: str, message: str, line: int, value: Any = None):
+        if self._detail:
+            message_dict = GapAwareDict(self._tokens)
+            message_dict["line"] = line
+            message_dict["value"] = value
+            self._issues.append(Issue(issue_type, self._library.resolve_error(message, message_dict)))
+            return
+
+        key = (issue_type, message)
+        runs = self._runs.get(key)
+        if runs is None:
+            self._runs[key] = _LineRuns(line, value)
+        else:
+            runs.add(line, value)
+
+    def get_issues(self) -> Optional[List[Issue]]:
+        issues = list(self._issues)
+        for (issue_type, message), runs in self._runs.items():
+            message_dict = GapAwareDict(self._tokens)
+            message_dict["line"] = runs.format_lines()
+            message_dict["value"] = runs.format_values()
+            issues.append(Issue(issue_type, self._library.resolve_error(message, message_dict)))
+        return issues if issues else None
+
+
+class _LineRuns:
+
+    def __init__(self, line: int, value: Any):
+        self._runs = [[line, line]]
+        self._more_runs = False
+        self._last_line = line
+        self._count = 1
+        self._first_value = value
+        self._min_value = self._max_value = value if _is_number(value) else None
+        self._all_numbers = _is_number(value)
+
+    def add(self, line: int, value: Any):
+        if line == self._last_line + 1 and not self._more_runs:
+            self._runs[-1][1] = line
+        elif len(self._runs) < MAX_LINE_RUNS:
+            self._runs.append([line, line])
+        else:
+            self._more_runs = True
+        self._last_line = line
+        self._count += 1
+
+        if self._all_numbers and _is_number(value):
+            self._min_value = min(self._min_value, value)
+            self._max_value = max(self._max_value, value)
+        else:
+            self._all_numbers = False
+
+    def format_lines(self) -> str:
+        text = ", ".join(str(start) if start == stop else f"{start}-{stop}" for start, stop in self._runs)
+        if self._more_runs:
+            text += ", ..."
+        if self._count > 1:
+            text += f" ({self._count} occurrences)"
+        return text
+
+    def format_values(self) -> Any:
+        if self._count == 1:
+            return self._first_value
+        if self._all_numbers:
+            if self._min_value == self._max_value:
+                return self._min_value
+            return f"min {self._min_value}, max {self._max_value}"
+        return f"{self._first_value}, ..."
+
+
+def _is_number(value: Any) -> bool:
+    return type(value) is float or type(value) is int
@@ -3,6 +3,7 @@ from typing import Optional, List
 
 from eocdb.core.models import Issue, ISSUE_TYPE_ERROR
 from eocdb.core.val._gap_aware_dict import GapAwareDict
+from eocdb.core.val._issue_aggregator import IssueAggregator
 from eocdb.core.val._message_library import MessageLibrary
 
 no_units: List[str] = ["none", "unitless"]
@@ -63,7 +64,7 @@ class NumberRecordRule:
         self._upper_bound = upper_bound
 
     def eval(self, unit: str, values: List[float], library: MessageLibrary,
-             missing_value: float = None) -> Optional[List[Issue]]:
+             missing_value: float = None, detail: bool = False) -> Optional[List[Issue]]:
         issues = []
 
         if unit not in self._units:
@@ -71,42 +72,26 @@ class NumberRecordRule:
             error_message = library.resolve_error(self._unit_error, message_dict)
             issues.append(Issue(ISSUE_TYPE_ERROR, error_message))
 
-        line = 1
-        message_dict = GapAwareDict({"field_name": self._name,
-                                     "line": line,
-                                     "value": 0,
-                                     "lower_bound": self._lower_bound,
-                                     "upper_bound": self._upper_bound})
+        aggregator = IssueAggregator(library, {"field_name": self._name,
+                                               "lower_bound": self._lower_bound,
+                                               "upper_bound": self._upper_bound}, detail=detail)
+        check_lower_bound = not math.isnan(self._lower_bound)
+        check_upper_bound = not math.isnan(self._upper_bound)
 
+        line = 0
         for value in values:
-            out_of_bounds = False
+            line += 1
             if not (type(value) is float or type(value) is int):
-                message_dict["line"] = line
-                message_dict["value"] = value
-                error_message = library.resolve_error("@field_number_not_a_number", message_dict)
-                issues.append(Issue(ISSUE_TYPE_ERROR, error_message))
-                line += 1
+                aggregator.add(ISSUE_TYPE_ERROR, "@field_number_not_a_number", line, value)
                 continue
 
             if missing_value is not None and value == missing_value:
-                line += 1
                 continue
 
-            if not math.isnan(self._lower_bound):
-                if value < self._lower_bound:
-                    out_of_bounds = True
-
-            if not math.isnan(self._upper_bound):
-                if value > self._upper_bound:
-                    out_of_bounds = True
+            if (check_lower_bound and value < self._lower_bound) or (check_upper_bound and value > self._upper_bound):
+                aggregator.add(ISSUE_TYPE_ERROR, self._value_error, line, value)
 
-            if out_of_bounds:
-                message_dict["line"] = line
-                message_dict["value"] = value
-                error_message = library.resolve_error(self._value_error, message_dict)
-                issues.append(Issue(ISSUE_TYPE_ERROR, error_message))
-
-            line += 1
+        issues.extend(aggregator.get_issues() or [])
 
         if len(issues) > 0:
             return issues
@@ -1,7 +1,7 @@
 from typing import List, Optional
 
 from eocdb.core.models import Issue, ISSUE_TYPE_ERROR
-from eocdb.core.val._gap_aware_dict import GapAwareDict
+from eocdb.core.val._issue_aggregator import IssueAggregator
 from eocdb.core.val._message_library import MessageLibrary
 
 
@@ -18,22 +18,18 @@ class StringRecordRule:
         self._name = name
         self._error = error
 
-    def eval(self, unit: str, values: List[str], library: MessageLibrary, missing_value: float = None) -> Optional[List[Issue]]:
+    def eval(self, unit: str, values: List[str], library: MessageLibrary, missing_value: float = None,
+             detail: bool = False) -> Optional[List[Issue]]:
         empty = ""
-        issues = []
+        aggregator = IssueAggregator(library, {"field_name": self._name}, detail=detail)
 
         index = 1
         for value in values:
             if value is empty:
-                message_dict = GapAwareDict({"field_name": self._name, "line": index})
-                error_message = library.resolve_error(self._error, message_dict)
-                issues.append(Issue(ISSUE_TYPE_ERROR, error_message))
+                aggregator.add(ISSUE_TYPE_ERROR, self._error, index, value)
             index += 1
 
-        if len(issues) > 0:
-            return issues
-
-        return None
+        return aggregator.get_issues()
 
     @property
     def name(self):
@@ -3,6 +3,7 @@ from typing import List, Optional
 
 from eocdb.core.models import Issue, ISSUE_TYPE_ERROR
 from eocdb.core.val._gap_aware_dict import GapAwareDict
+from eocdb.core.val._issue_aggregator import IssueAggregator
 from eocdb.core.val._message_library import MessageLibrary
 
 
@@ -24,8 +25,8 @@ class TimeRecordRule:
         self._units = unit.lower().split(",")
         self._unit_error = error
 
-    def eval(self, unit: str, values: List[str], library: MessageLibrary, missing_value: float = None) -> Optional[
-        List[Issue]]:
+    def eval(self, unit: str, values: List[str], library: MessageLibrary, missing_value: float = None,
+             detail: bool = False) -> Optional[List[Issue]]:
         issues = []
 
         if unit not in self._units:
@@ -33,13 +34,12 @@ class TimeRecordRule:
             error_message = library.resolve_error(self._unit_error, message_dict)
             issues.append(Issue(ISSUE_TYPE_ERROR, error_message))
 
+        aggregator = IssueAggregator(library, {"field_name": self._name}, detail=detail)
         index = 0
         for value in values:
             index +=1
-            message_dict = GapAwareDict({"field_name": self._name, "line": index})
             if not self._time_string_pattern.match(value):
-                error_message = library.resolve_error("@invalid_time_record", message_dict)
-                issues.append(Issue(ISSUE_TYPE_ERROR, error_message))
+                aggregator.add(ISSUE_TYPE_ERROR, "@invalid_time_record", index, value)
                 continue
 
             tokens = value.split(":")
@@ -50,10 +50,11 @@ class TimeRecordRule:
             if hour not in self._hour_range \
                     or minute not in self._min_sec_range \
                     or second not in self._min_sec_range:
-                error_message = library.resolve_error("@invalid_time_value", message_dict)
-                issues.append(Issue(ISSUE_TYPE_ERROR, error_message))
+                aggregator.add(ISSUE_TYPE_ERROR, "@invalid_time_value", index, value)
                 continue
 
+        issues.extend(aggregator.get_issues() or [])
+
         if len(issues) > 0:
             return issues
 
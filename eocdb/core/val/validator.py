@@ -1,6 +1,7 @@
 import json
 import os
 import re
+import time
 
 from eocdb.core.val._date_record_rule import DateRecordRule
 from eocdb.core.val._gap_aware_dict import GapAwareDict
@@ -8,6 +9,7 @@ from eocdb.core.val._meta_field_obsolete_rule import MetaFieldObsoleteRule
 from eocdb.core.val._number_record_rule import NumberRecordRule
 from eocdb.core.val._string_record_rule import StringRecordRule
 from eocdb.core.val._time_record_rule import TimeRecordRule
+from ..metrics import Counter
 from ..models.dataset import Dataset
 from ..models.dataset_validation_result import DatasetValidationResult
 from ..models.issue import ISSUE_TYPE_WARNING, ISSUE_TYPE_ERROR, Issue
@@ -19,6 +21,10 @@ from ...ws.context import Config
 
 validator_inst = None
 
+_VALIDATED_DATASETS = Counter('ocdb_validator_datasets_total', 'Number of validated datasets.')
+_VALIDATED_ROWS = Counter('ocdb_validator_rows_total', 'Number of validated measurement records.')
+_VALIDATION_SECONDS = Counter('ocdb_validator_seconds_total', 'Time spent in dataset validation in seconds.')
+
 
 def validate_dataset(dataset: Dataset, config: Config) -> DatasetValidationResult:
     global validator_inst
@@ -28,7 +34,7 @@ def validate_dataset(dataset: Dataset, config: Config) -> DatasetValidationResul
     if "mock_validation" in config:
         return DatasetValidationResult("OK", [])
 
-    return validator_inst.validate_dataset(dataset)
+    return validator_inst.validate_dataset(dataset, detail=config.get("validation_detail", False))
 
 
 class Validator(MessageLibrary):
@@ -43,16 +49,25 @@ class Validator(MessageLibrary):
 
         self._var_name_pattern = re.compile("[A-Za-z]*[0-9]*")
 
-    def validate_dataset(self, dataset: Dataset) -> DatasetValidationResult:
+    def validate_dataset(self, dataset: Dataset, detail: bool = False) -> DatasetValidationResult:
+        """
+        Validate *dataset*. Issues that a record rule finds in several measurement lines are
+        aggregated into a single issue, unless *detail* is set, which gives one issue per line.
+        """
+        start_time = time.perf_counter()
         issues = []
 
         header_errors = self._validate_header(dataset, issues)
-        data_errors = self._validate_measurements(dataset, issues)
+        data_errors = self._validate_measurements(dataset, issues, detail)
 
         num_errors = header_errors + data_errors
 
         status = "OK" if not issues else ISSUE_TYPE_ERROR if num_errors else ISSUE_TYPE_WARNING
         validation_result = DatasetValidationResult(status, issues)
+
+        _VALIDATED_DATASETS.inc()
+        _VALIDATED_ROWS.inc(len(dataset.records))
+        _VALIDATION_SECONDS.inc(time.perf_counter() - start_time)
         return validation_result
 
     def resolve_warning(self, template: str, tokens: GapAwareDict) -> str:
@@ -85,7 +100,7 @@ class Validator(MessageLibrary):
                     num_errors += 1
         return num_errors
 
-    def _validate_measurements(self, dataset, issues) -> int:
+    def _validate_measurements(self, dataset, issues, detail=False) -> int:
         if "fields" not in dataset.metadata or "units" not in dataset.metadata:
             issues.append(Issue(ISSUE_TYPE_ERROR,
                                 "Header tags /fields or /units missing. Skipping parsing of measurement records."))
@@ -126,7 +141,7 @@ class Validator(MessageLibrary):
             for record in dataset.records:
                 values.append(record[index])
 
-            record_issues = rule.eval(units[index], values, self, missing_value)
+            record_issues = rule.eval(units[index], values, self, missing_value, detail=detail)
             if record_issues is not None:
                 issues.extend(record_issues)
                 for record_issue in record_issues:
@@ -1,38 +1,185 @@
+import re
+import threading
+import uuid
 from datetime import datetime
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Optional, List, Iterator, Set, Tuple
 
 import bson.objectid
 import numpy as np
 import pymongo
+import pymongo.common
 import pymongo.errors
+import pymongo.monitoring
+import pymongo.read_preferences
 
 from eocdb.core.db.db_links import DbLinks
 from eocdb.core.db.db_user import DbUser
 from ..core import QueryParser
-from ..core.db.db_driver import DbDriver
+from ..core.db.db_driver import DbDriver, DATASETS_BATCH_SIZE, SUBMISSION_SORT_FIELDS
 from ..core.db.db_submission import DbSubmission
 from ..core.db.errors import OperationalError
+from ..core.locations import thin_points, to_geojson, to_geojson_text, encode_points, count_tiles
+from ..core.metrics import Histogram, Counter
 from ..core.models.dataset import Dataset
 from ..core.models.dataset_query import DatasetQuery
 from ..core.models.dataset_query_result import DatasetQueryResult
 from ..core.models.dataset_ref import DatasetRef
+from ..core.models.issue import Issue
+from ..core.models.qc_info import QcInfo
 from ..core.models.submission_file import SubmissionFile
 from ..core.time_helper import TimeHelper
 from ..db.mongo_query_generator import MongoQueryGenerator
+from ..db.packed_records import pack_records, unpack_records, FLOAT_DTYPES, COMPRESSIONS
 
 LAT_INDEX_NAME = "_latitudes_"
 LON_INDEX_NAME = "_longitudes_"
 ATTRIBUTES_INDEX_NAME = "_attributes_"
 TIMES_INDEX_NAME = "_times_"
+DEPTH_INDEX_NAME = "_depth_"
+WLMODE_INDEX_NAME = "_wlmode_"
+GROUPS_INDEX_NAME = "_groups_"
+CRUISE_INDEX_NAME = "_cruise_"
+TILES_INDEX_NAME = "_tiles_"
+DATASET_CHUNK_INDEX_NAME = "_dataset_chunk_"
 USER_ID_INDEX_NAME = "_userid_"
+PATH_INDEX_NAME = "_path_"
+ISSUES_INDEX_NAME = "_issues_"
+ISSUES_ID_INDEX_NAME = "_issues_id_"
+SUBMISSION_DATE_INDEX_NAME = "_submission_date_"
+SUBMISSION_USER_DATE_INDEX_NAME = "_submission_user_date_"
+SUBMISSION_STATUS_DATE_INDEX_NAME = "_submission_status_date_"
+TEXT_INDEX_NAME = "_text_"
+
+# Key of the unique index of the "dataset_chunks" collection. An update writes a new set of chunks for the dataset
+# before it deletes the old one.
+DATASET_CHUNK_INDEX_KEY = [("dataset_id", pymongo.ASCENDING), ("chunk_set", pymongo.ASCENDING),
+                           ("chunk_no", pymongo.ASCENDING)]
+
+# Metadata fields covered by the text index and their weights, which rank the results of free-text searches.
+# A collection can only have one text index, so an index with other fields or weights is replaced.
+TEXT_INDEX_WEIGHTS = {
+    "metadata.investigators": 10,
+    "metadata.cruise": 8,
+    "metadata.experiment": 5,
+    "metadata.affiliations": 5,
+    "metadata.station": 3,
+    "metadata.documents": 1,
+}
+
+# Maximum number of validation issues kept in a submission file's result, further ones are stored separately
+INLINE_ISSUES_COUNT = 10
+
+# Fields of the dataset documents that are not part of the Dataset model
+_DATASET_PROJECTION = {"tiles": False, "tile_counts": False}
+
+# ID of the document of the "data_generation" collection that counts the changes of the datasets
+_DATA_GENERATION_ID = "datasets"
+
+# Order of search results, see DbDriver.find_datasets()
+DATASET_SORT_ORDER = [("path", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]
+
+# Fields of the submission documents that refer to the issues stored in the "validation_issues" collection
+_ISSUES_REFS_PROJECTION = {"submission_id": True, "files.filename": True, "files.result.issue_counts": True,
+                           "files.result.issues_id": True}
+
+# Fields of the submission documents not loaded by find_submissions()
+_SUBMISSION_LIST_PROJECTION = {"files.result": False}
+
+# Names of submission fields containing validation results: "files", "files.<index>", "files.<index>.result"
+_FILES_FIELD_PATTERN = re.compile(r"files(?:\.(\d+)(?:\.(result))?)?")
+
+# Seconds a client that has been replaced by a reconfiguration is kept open,
+# so that queries still running on it can complete.
+DEFAULT_CLIENT_CLOSE_DELAY = 30.0
+
+# Driver parameters that are passed to pymongo.MongoClient() under their MongoDB option name
+_CLIENT_PARAM_NAMES = {
+    "max_pool_size": "maxPoolSize",
+    "min_pool_size": "minPoolSize",
+    "max_idle_time_ms": "maxIdleTimeMS",
+    "wait_queue_timeout_ms": "waitQueueTimeoutMS",
+    "read_preference": "readPreference",
+    "max_staleness_seconds": "maxStalenessSeconds",
+    "compressors": "compressors",
+    "zlib_compression_level": "zlibCompressionLevel",
+}
+
+# Driver parameters that are consumed by the driver itself
+_DRIVER_PARAM_NAMES = {"mock", "search_read_preference", "search_max_staleness_seconds", "client_close_delay",
+                       "records_format", "records_float_dtype", "records_compression", "records_chunk_size"}
+
+# Formats of the records of dataset documents, see MongoDbDriver
+RECORDS_FORMATS = ("arrays", "packed")
+PACKED_RECORDS_FIELD = "packed_records"
+CHUNKED_RECORDS_FIELD = "chunked_records"
+
+# Number of records per document of the "dataset_chunks" collection
+DEFAULT_RECORDS_CHUNK_SIZE = 1000
+
+# Number of times a dataset is read again if its chunks are replaced while being read
+_CHUNKED_READ_ATTEMPTS = 3
+
+# Count of a $slice projection that includes all remaining array elements
+_MAX_SLICE_COUNT = 2 ** 31 - 1
+
+_READ_PREFERENCES = {
+    "primary": pymongo.read_preferences.Primary,
+    "primaryPreferred": pymongo.read_preferences.PrimaryPreferred,
+    "secondary": pymongo.read_preferences.Secondary,
+    "secondaryPreferred": pymongo.read_preferences.SecondaryPreferred,
+    "nearest": pymongo.read_preferences.Nearest,
+}
+
+_SHARED_CLIENTS = {}
+_SHARED_CLIENTS_LOCK = threading.Lock()
+
+_OPERATION_DURATION = Histogram('ocdb_mongo_operation_duration_seconds',
+                                'Duration of MongoDB commands in seconds.',
+                                label_names=('command',))
+_OPERATION_ERRORS = Counter('ocdb_mongo_operation_errors_total',
+                            'Number of failed MongoDB commands.',
+                            label_names=('command',))
 
 
 class MongoDbDriver(DbDriver):
+    """
+    Database driver for MongoDB.
+
+    Besides the options of ``pymongo.MongoClient`` and the "url" of the database, the driver accepts
+    the parameters "max_pool_size", "min_pool_size", "max_idle_time_ms", "wait_queue_timeout_ms",
+    "read_preference", "max_staleness_seconds", "compressors" (e.g. "zstd,snappy,zlib") and
+    "zlib_compression_level". Drivers of the same process with equal client parameters share one client.
+
+    Read-only operations, i.e. ``find_datasets``, ``get_dataset``, ``find_submissions``, ``get_submissions``
+    and ``get_submissions_for_user``, as well as ``iter_datasets`` if called with ``search=True``, use the read preference given by "search_read_preference", e.g.
+    "secondaryPreferred", optionally bounded by "search_max_staleness_seconds" (at least 90).
+    All other operations, including the lookups preceding writes, are pinned to the primary.
+
+    Dataset records are stored as arrays of rows, unless "records_format" is "packed". Then numeric
+    columns are stored as binary blobs of "records_float_dtype" ("float64" or "float32") floats or of
+    integers, compressed if "records_compression" is "zlib", see :mod:`eocdb.db.packed_records`.
+    Datasets are read in either format.
+
+    The records are stored in blocks of "records_chunk_size" rows (default 1000) in the collection
+    "dataset_chunks", so that the dataset documents only hold metadata and search fields. A chunk
+    size of zero stores the records within the dataset documents. Updates write the chunks of the new
+    records as a new chunk set, so the dataset documents refer to complete chunk sets only.
+
+    Dataset documents carry a tile index of their locations for ``find_tile_counts``. Datasets stored without
+    it are indexed when the driver connects, which takes a while the first time for a large archive.
+    """
 
     def add_dataset(self, dataset: Dataset) -> str:
         dateset_dict = dataset.to_dict()
         converted_dict = MongoDbDriver._convert_times(dateset_dict)
+        MongoDbDriver._add_tile_index(converted_dict)
+        obj_id = bson.objectid.ObjectId()
+        converted_dict["_id"] = obj_id
+        chunks = self._chunk_records(converted_dict, obj_id)
+        if chunks:
+            self._chunk_collection.insert_many(chunks)
         result = self._collection.insert_one(converted_dict)
+        self._increment_data_generation()
         return str(result.inserted_id)
 
     def update_dataset(self, dataset: Dataset) -> bool:
@@ -43,9 +190,21 @@ class MongoDbDriver(DbDriver):
         dataset_dict = dataset.to_dict()
         if "id" in dataset_dict:
             del dataset_dict["id"]
-
-        result = self._collection.replace_one({"_id": obj_id}, dataset_dict, upsert=True)
-        return result.modified_count == 1
+        MongoDbDriver._add_tile_index(dataset_dict)
+        chunks = self._chunk_records(dataset_dict, obj_id)
+
+        # the records are written as a new chunk set before the dataset refers to it, and the chunk set of the
+        # replaced dataset is deleted only then, so readers and concurrent updates never see incomplete records
+        if chunks:
+            self._chunk_collection.insert_many(chunks)
+        old_dataset_dict = self._collection.find_one_and_replace({"_id": obj_id}, dataset_dict,
+                                                                 projection={CHUNKED_RECORDS_FIELD: True},
+                                                                 upsert=True)
+        if old_dataset_dict is not None and old_dataset_dict.get(CHUNKED_RECORDS_FIELD) is not None:
+            self._chunk_collection.delete_many(self._chunk_set_filter(obj_id,
+                                                                      old_dataset_dict[CHUNKED_RECORDS_FIELD]))
+        self._increment_data_generation()
+        return old_dataset_dict is not None
 
     def delete_dataset(self, dataset_id: str) -> bool:
         obj_id = self._obj_id(dataset_id)
@@ -53,27 +212,119 @@ class MongoDbDriver(DbDriver):
             return False
 
         result = self._collection.delete_one({'_id': obj_id})
+        self._chunk_collection.delete_many({"dataset_id": obj_id})
+        if result.deleted_count == 1:
+            self._increment_data_generation()
         return result.deleted_count == 1
 
-    def get_dataset(self, dataset_id: str) -> Optional[Dataset]:
+    def get_dataset(self, dataset_id: str, with_records: bool = True) -> Optional[Dataset]:
         obj_id = self._obj_id(dataset_id)
         if obj_id is None:
             return None
 
-        dataset_dict = self._collection.find_one({"_id": obj_id})
-        if dataset_dict is not None:
+        projection = _DATASET_PROJECTION
+        if not with_records:
+            projection = dict(projection, records=False, **{PACKED_RECORDS_FIELD: False})
+        for _ in range(_CHUNKED_READ_ATTEMPTS):
+            dataset_dict = self._search_collection.find_one({"_id": obj_id}, projection=projection)
+            if dataset_dict is None:
+                return None
             del dataset_dict["_id"]
             dataset_dict["id"] = dataset_id
+            chunked = dataset_dict.pop(CHUNKED_RECORDS_FIELD, None)
+            if not with_records:
+                dataset_dict["records"] = []
+            elif chunked is not None:
+                dataset_dict["records"] = self._get_chunked_records(obj_id, chunked, 0, chunked["num_rows"])
+                if dataset_dict["records"] is None:
+                    continue
+            MongoDbDriver._unpack_records(dataset_dict)
             return Dataset.from_dict(dataset_dict)
-        return None
+        raise OperationalError(f"Records of dataset {dataset_id} changed while being read")
+
+    def update_dataset_qc_info(self, dataset_id: str, qc_info: QcInfo) -> bool:
+        obj_id = self._obj_id(dataset_id)
+        if obj_id is None:
+            return False
+
+        result = self._collection.update_one({"_id": obj_id}, {"$set": {"metadata.qc_info": qc_info.to_dict()}})
+        if result.matched_count == 1:
+            self._increment_data_generation()
+        return result.matched_count == 1
+
+    def get_data_generation(self) -> str:
+        # the counter is only created by the first change of the datasets, reading never writes
+        generation_dict = self._generation_collection.find_one({"_id": _DATA_GENERATION_ID})
+        if generation_dict is None:
+            return "0"
+        return f'{generation_dict["epoch"]}-{generation_dict["count"]}'
+
+    def _increment_data_generation(self):
+        # a new epoch is chosen whenever the counter is created, so that generations of a dropped database
+        # are never reused
+        self._generation_collection.update_one({"_id": _DATA_GENERATION_ID},
+                                               {"$inc": {"count": 1},
+                                                "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}},
+                                               upsert=True)
+
+    def get_dataset_records(self, dataset_id: str, offset: int = 0, count: int = None,
+                            columns: List[int] = None) -> Optional[List[List]]:
+        obj_id = self._obj_id(dataset_id)
+        if obj_id is None:
+            return None
+
+        # inline records are sliced by the server
+        records_slice = [offset, count if count is not None else _MAX_SLICE_COUNT]
+        if count == 0:
+            return []
+        for _ in range(_CHUNKED_READ_ATTEMPTS):
+            dataset_dict = self._search_collection.find_one({"_id": obj_id},
+                                                            projection={"records": {"$slice": records_slice},
+                                                                        PACKED_RECORDS_FIELD: True,
+                                                                        CHUNKED_RECORDS_FIELD: True})
+            if dataset_dict is None:
+                return None
+
+            chunked = dataset_dict.get(CHUNKED_RECORDS_FIELD)
+            if chunked is None:
+                break
+            stop = chunked["num_rows"] if count is None else min(offset + count, chunked["num_rows"])
+            records = self._get_chunked_records(obj_id, chunked, offset, stop, columns=columns)
+            if records is not None:
+                return records
+        else:
+            raise OperationalError(f"Records of dataset {dataset_id} changed while being read")
 
-    def find_datasets(self, query: DatasetQuery) -> DatasetQueryResult:
+        packed = dataset_dict.get(PACKED_RECORDS_FIELD)
+        if packed is not None:
+            records = unpack_records(packed, columns=columns)
+            return records[offset:] if count is None else records[offset:offset + count]
+
+        records = dataset_dict.get("records", [])
+        if columns is not None:
+            records = [[record[i] for i in columns] for record in records]
+        return records
+
+    def find_datasets(self, query: DatasetQuery, timeout: float = None) -> DatasetQueryResult:
         start_index, count = MongoDbDriver._get_start_index_and_count(query)
+        # the server aborts the search with pymongo.errors.ExecutionTimeout once the time limit is exceeded
+        time_limit = {} if timeout is None else {"maxTimeMS": max(1, int(timeout * 1000))}
+
+        query_dict = self._query_converter.to_dict(query, collection=self._search_collection)
 
-        query_dict = self._query_converter.to_dict(query)
+        with_locations = query.geojson or query.locformat is not None
+        projection = {"path": True}
+        if with_locations:
+            projection.update(longitudes=True, latitudes=True)
 
-        cursor = self._collection.find(query_dict, skip=start_index, limit=count)
-        total_num_results = self._collection.count_documents(query_dict)
+        sort = DATASET_SORT_ORDER
+        if query.sort == "relevance" and self._has_text_filter(query_dict):
+            projection["score"] = {"$meta": "textScore"}
+            sort = [("score", {"$meta": "textScore"})] + DATASET_SORT_ORDER
+
+        cursor = self._search_collection.find(query_dict, projection=projection, skip=start_index, limit=count,
+                                              sort=sort, max_time_ms=time_limit.get("maxTimeMS"))
+        total_num_results = self._search_collection.count_documents(query_dict, **time_limit)
 
         if query.count == 0:
             return DatasetQueryResult({}, total_num_results, [], query)
@@ -81,19 +332,77 @@ class MongoDbDriver(DbDriver):
             dataset_refs = []
             locations = {}
             for dataset_dict in cursor:
-                ds_ref, points = self._to_dataset_ref(dataset_dict, query.geojson)
+                ds_ref, points = self._to_dataset_ref(dataset_dict, with_locations)
                 dataset_refs.append(ds_ref)
                 if points is not None:
-                    feature_collection = self._to_geojson(points)
-                    locations.update({ds_ref.id: feature_collection})
+                    points = thin_points(points, query.maxpoints)
+                    if query.locformat == 'geojson':
+                        locations[ds_ref.id] = to_geojson(points)
+                    elif query.locformat == 'binary':
+                        locations[ds_ref.id] = encode_points(points)
+                    else:
+                        locations[ds_ref.id] = self._to_geojson(points)
 
             return DatasetQueryResult(locations, total_num_results, dataset_refs, query)
 
+    def iter_datasets(self, query: DatasetQuery, projection: List[str] = None,
+                      batch_size: int = DATASETS_BATCH_SIZE, search: bool = False) -> Iterator[Dict[str, Any]]:
+        collection = self._search_collection if search else self._collection
+        query_dict = self._query_converter.to_dict(query, collection=collection)
+        field_projection = {field: True for field in (projection if projection is not None else ["path"])}
+
+        cursor = collection.find(query_dict, projection=field_projection, sort=DATASET_SORT_ORDER,
+                                 batch_size=batch_size)
+        try:
+            for dataset_dict in cursor:
+                dataset_dict["id"] = str(dataset_dict.pop("_id"))
+                yield dataset_dict
+        finally:
+            cursor.close()
+
+    def find_tile_counts(self, query: DatasetQuery, quadkey: str) -> Iterator[Dict[str, int]]:
+        query_dict = self._query_converter.to_dict(query, collection=self._search_collection)
+        if quadkey:
+            query_dict["tiles"] = {"$regex": "^" + quadkey}
+
+        cursor = self._search_collection.find(query_dict, projection={"_id": False, "tiles": True, "tile_counts": True})
+        for dataset_dict in cursor:
+            yield dict(zip(dataset_dict.get("tiles") or [], dataset_dict.get("tile_counts") or []))
+
     def add_submission(self, submission: DbSubmission):
         sf_dict = submission.to_dict()
+        for file_dict in sf_dict.get("files") or []:
+            self._move_issues(submission.submission_id, file_dict)
         result = self._submit_collection.insert_one(sf_dict)
         return str(result.inserted_id)
 
+    def get_submission_file_issues(self, submission_id: str, index: int, offset: int = 0,
+                                   count: int = None) -> Optional[Tuple[int, List[Issue]]]:
+        if index < 0:
+            return None
+        subm_dict = self._submit_collection.find_one({"submission_id": submission_id},
+                                                     projection={"files": {"$slice": [index, 1]}})
+        if subm_dict is None or not subm_dict.get("files"):
+            return None
+
+        file_dict = subm_dict["files"][0]
+        result = file_dict.get("result") or {}
+        issue_counts = result.get("issue_counts")
+        if issue_counts is None:
+            issue_dicts = result.get("issues") or []
+            total_count = len(issue_dicts)
+            issue_dicts = issue_dicts[offset:] if count is None else issue_dicts[offset:offset + count]
+        else:
+            total_count = sum(issue_counts.values())
+            issue_dicts = self._issues_collection.find(self._issues_filter(submission_id, file_dict.get("filename"),
+                                                                           result.get("issues_id")),
+                                                       projection={"_id": False, "type": True, "description": True},
+                                                       sort=[("issue_no", pymongo.ASCENDING)],
+                                                       skip=offset, limit=count or 0)
+            if count == 0:
+                issue_dicts = []
+        return total_count, [Issue.from_dict(issue_dict) for issue_dict in issue_dicts]
+
     def get_submission_file(self, submission_id: str, index: int) -> Optional[SubmissionFile]:
         subm_dict = self._submit_collection.find_one({"submission_id": submission_id})
         if subm_dict is None:
@@ -110,7 +419,7 @@ class MongoDbDriver(DbDriver):
 
     def get_submissions(self) -> List[DbSubmission]:
         submissions = []
-        cursor = self._submit_collection.find()
+        cursor = self._submit_search_collection.find()
         for subm_dict in cursor:
             del subm_dict["_id"]
             subm = DbSubmission.from_dict(subm_dict)
@@ -121,9 +430,9 @@ class MongoDbDriver(DbDriver):
     def get_submissions_for_user(self, user_id: str, is_admin: bool = False) -> List[DbSubmission]:
         submissions = []
         if is_admin:
-            cursor = self._submit_collection.find({})
+            cursor = self._submit_search_collection.find({})
         else:
-            cursor = self._submit_collection.find({"user_id": user_id})
+            cursor = self._submit_search_collection.find({"user_id": user_id})
         for subm_dict in cursor:
             del subm_dict["_id"]
             subm = DbSubmission.from_dict(subm_dict)
@@ -131,6 +440,38 @@ class MongoDbDriver(DbDriver):
 
         return submissions
 
+    def find_submissions(self, user_id: str = None, status: str = None, sort_by: str = "date",
+                         descending: bool = False, offset: int = 0,
+                         count: int = None) -> Tuple[int, List[DbSubmission]]:
+        if sort_by not in SUBMISSION_SORT_FIELDS:
+            raise ValueError(f"sort_by must be one of {', '.join(SUBMISSION_SORT_FIELDS)}")
+
+        filter_dict = {}
+        if user_id is not None:
+            filter_dict["user_id"] = user_id
+        if status is not None:
+            filter_dict["status"] = status
+
+        # a single direction, so that the compound indexes of the submissions serve both orders
+        direction = pymongo.DESCENDING if descending else pymongo.ASCENDING
+        sort_fields = ["date", "_id"] if sort_by == "date" else [sort_by, "date", "_id"]
+
+        total_count = self._submit_search_collection.count_documents(filter_dict)
+        if count == 0:
+            # a limit of zero means no limit to MongoDB
+            return total_count, []
+        cursor = self._submit_search_collection.find(filter_dict,
+                                                     projection=_SUBMISSION_LIST_PROJECTION,
+                                                     sort=[(field, direction) for field in sort_fields],
+                                                     skip=offset,
+                                                     limit=count or 0)
+        submissions = []
+        for subm_dict in cursor:
+            del subm_dict["_id"]
+            submissions.append(DbSubmission.from_dict(subm_dict))
+
+        return total_count, submissions
+
     def get_submission(self, submission_id: str) -> Optional[DbSubmission]:
         subm_dict = self._submit_collection.find_one({"submission_id": submission_id})
 
@@ -149,9 +490,131 @@ class MongoDbDriver(DbDriver):
         submission_dict = submission.to_dict()
         if "id" in submission_dict:
             submission_dict["id"] = None
+        submission_dict["version"] = submission.version + 1
 
-        result = self._submit_collection.replace_one({"_id": obj_id}, submission_dict)
-        return result.modified_count == 1
+        issues_ids = [self._move_issues(submission.submission_id, file_dict)
+                      for file_dict in submission_dict.get("files") or []]
+
+        # the whole submission is written, so it must not have changed since it was read
+        old_subm_dict = self._submit_collection.find_one_and_replace(
+            self._submission_version_filter(obj_id, submission), submission_dict, projection=_ISSUES_REFS_PROJECTION)
+        if old_subm_dict is None:
+            self._delete_issues(issues_ids)
+            return False
+        if old_subm_dict.get("submission_id") != submission.submission_id:
+            self._issues_collection.update_many({"submission_id": old_subm_dict.get("submission_id")},
+                                                {"$set": {"submission_id": submission.submission_id}})
+        self._delete_unreferenced_issues(submission.submission_id, old_subm_dict, submission_dict)
+        submission.version += 1
+        return True
+
+    def update_submission_fields(self, submission: DbSubmission, field_names: List[str],
+                                 check_version: bool = False) -> bool:
+        obj_id = self._obj_id(submission.id)
+        if obj_id is None:
+            return False
+
+        submission_dict = submission.to_dict()
+        fields = {field_name: self._get_field(submission_dict, field_name) for field_name in field_names}
+        if check_version:
+            filter_dict = self._submission_version_filter(obj_id, submission)
+        else:
+            filter_dict = {"_id": obj_id}
+
+        files_changed = False
+        issues_ids = []
+        for field_name, value in fields.items():
+            match = _FILES_FIELD_PATTERN.fullmatch(field_name)
+            if match is None:
+                continue
+            files_changed = True
+            index, sub_field_name = match.group(1), match.group(2)
+            if index is None:
+                file_dicts = value
+            elif sub_field_name is None:
+                file_dicts = [value]
+            else:
+                file_dicts = [dict(filename=submission.files[int(index)].filename, result=value)]
+            for file_dict in file_dicts:
+                issues_ids.append(self._move_issues(submission.submission_id, file_dict))
+
+        old_subm_dict = self._submit_collection.find_one_and_update(filter_dict,
+                                                                    {"$set": fields, "$inc": {"version": 1}},
+                                                                    projection=_ISSUES_REFS_PROJECTION)
+        if old_subm_dict is None:
+            self._delete_issues(issues_ids)
+            return False
+        if files_changed:
+            new_subm_dict = self._submit_collection.find_one({"_id": obj_id}, projection=_ISSUES_REFS_PROJECTION)
+            self._delete_unreferenced_issues(submission.submission_id, old_subm_dict, new_subm_dict or {})
+        submission.version += 1
+        return True
+
+    @staticmethod
+    def _submission_version_filter(obj_id: bson.objectid.ObjectId, submission: DbSubmission) -> Dict[str, Any]:
+        # submissions stored before versioning have no version field
+        return {"_id": obj_id, "version": {"$in": [0, None]} if submission.version == 0 else submission.version}
+
+    def _move_issues(self, submission_id: str, file_dict: Dict[str, Any]) -> Optional[str]:
+        """
+        Store the validation issues of a submission file in the issues collection under a new issues ID
+        if there are more than INLINE_ISSUES_COUNT, and keep only the first ones, the counts per issue type
+        and the issues ID in *file_dict*. Return the issues ID, or None if the issues have not been stored.
+        Results whose issues have been moved before are left as they are.
+
+        The issues are stored before the submission refers to them, so they must be deleted again
+        if the submission cannot be written.
+        """
+        result = file_dict.get("result")
+        if result is None or result.get("issue_counts") is not None:
+            return None
+        if len(result.get("issues") or []) <= INLINE_ISSUES_COUNT:
+            return None
+
+        issues = result["issues"]
+        issues_id = uuid.uuid4().hex
+        self._issues_collection.insert_many([dict(submission_id=submission_id, filename=file_dict.get("filename"),
+                                                  issues_id=issues_id, issue_no=issue_no, **issue)
+                                             for issue_no, issue in enumerate(issues)])
+        issue_counts = {}
+        for issue in issues:
+            issue_counts[issue["type"]] = issue_counts.get(issue["type"], 0) + 1
+        result["issues"] = issues[:INLINE_ISSUES_COUNT]
+        result["issue_counts"] = issue_counts
+        result["issues_id"] = issues_id
+        return issues_id
+
+    def _delete_issues(self, issues_ids: List[Optional[str]]):
+        issues_ids = [issues_id for issues_id in issues_ids if issues_id is not None]
+        if issues_ids:
+            self._issues_collection.delete_many({"issues_id": {"$in": issues_ids}})
+
+    def _delete_unreferenced_issues(self, submission_id: str, old_subm_dict: Dict[str, Any],
+                                    new_subm_dict: Dict[str, Any]):
+        """
+        Delete the stored issues the submission referred to as *old_subm_dict* but no longer refers to
+        as *new_subm_dict*. Issues IDs are never reused, so these issues can be deleted even if the submission
+        has been updated again meanwhile.
+        """
+        for filename, issues_id in self._get_issues_refs(old_subm_dict) - self._get_issues_refs(new_subm_dict):
+            self._issues_collection.delete_many(self._issues_filter(submission_id, filename, issues_id))
+
+    @staticmethod
+    def _get_issues_refs(subm_dict: Dict[str, Any]) -> Set[Tuple[str, Optional[str]]]:
+        """Get the file name and issues ID of the files of *subm_dict* whose issues are stored separately."""
+        refs = set()
+        for file_dict in subm_dict.get("files") or []:
+            result = file_dict.get("result") or {}
+            if result.get("issue_counts") is not None:
+                refs.add((file_dict.get("filename"), result.get("issues_id")))
+        return refs
+
+    @staticmethod
+    def _issues_filter(submission_id: str, filename: str, issues_id: Optional[str]) -> Dict[str, Any]:
+        if issues_id is None:
+            # issues stored before issues IDs were introduced
+            return {"submission_id": submission_id, "filename": filename, "issues_id": None}
+        return {"issues_id": issues_id}
 
     def delete_submission(self, submission_id: str) -> bool:
         subm_dict = self._submit_collection.find_one({"submission_id": submission_id})
@@ -159,6 +622,7 @@ class MongoDbDriver(DbDriver):
             return False
 
         result = self._submit_collection.delete_one(subm_dict)
+        self._issues_collection.delete_many({"submission_id": submission_id})
         return result.deleted_count == 1
 
     def add_user(self, user: DbUser):
@@ -273,11 +737,19 @@ class MongoDbDriver(DbDriver):
     def __init__(self):
         self._db = None
         self._client = None
+        self._shared_client = None
         self._collection = None
+        self._search_collection = None
+        self._chunk_collection = None
+        self._chunk_search_collection = None
         self._submit_collection = None
+        self._submit_search_collection = None
+        self._issues_collection = None
+        self._generation_collection = None
         self._user_collection = None
         self._links_collection = None
         self._config = None
+        self._search_read_preference = None
         self._query_converter = MongoDbDriver.QueryConverter()
 
     def init(self, **config):
@@ -285,9 +757,16 @@ class MongoDbDriver(DbDriver):
         self.connect()
 
     def update(self, **config):
+        """
+        Apply a new configuration. A new client is only created if the client parameters have changed.
+        The replaced client is closed with a delay, so queries running on it are not interrupted.
+        """
+        old_shared_client = self._shared_client
         self._set_config(config)
-        self.close()
-        self.connect()
+        self._use_shared_client(self._new_shared_client())
+        if old_shared_client is not None:
+            _release_shared_client(old_shared_client, self._config.get("client_close_delay",
+                                                                        DEFAULT_CLIENT_CLOSE_DELAY))
 
     def dispose(self):
         self.close()
@@ -296,35 +775,95 @@ class MongoDbDriver(DbDriver):
         if self._client is not None:
             raise OperationalError("Database already connected")
 
+        self._use_shared_client(self._new_shared_client())
+
+    def close(self):
+        if self._shared_client is not None:
+            _release_shared_client(self._shared_client, 0)
+            self._shared_client = None
+            self._client = None
+
+    def clear(self):
+        if self._client is not None:
+            self._collection.drop()
+            self._chunk_collection.drop()
+            self._submit_collection.drop()
+            self._issues_collection.drop()
+            self._generation_collection.drop()
+
+    @property
+    def pool_metrics(self) -> Dict[str, Any]:
+        """Get the connection pool metrics of the client currently in use."""
+        if self._shared_client is None:
+            return {}
+        metrics = self._shared_client.metrics.to_dict()
+        metrics["max_pool_size"] = self._config.get("max_pool_size", pymongo.common.MAX_POOL_SIZE)
+        return metrics
+
+    def _new_shared_client(self) -> "_SharedClient":
         if self._config.get("mock", False):
             import mongomock
-            self._client = mongomock.MongoClient()
-        else:
-            self._client = pymongo.MongoClient(**self._config)
-            try:
-                # @trello: Resolve call hanging when requesting MongoDb server up
-                # The ismaster command is cheap and does not require auth.
-                self._client.admin.command('ismaster')
-            except pymongo.errors.ConnectionFailure as e:
-                raise RuntimeError("Database connection failure") from e
+            return _SharedClient(mongomock.MongoClient(), _ConnectionPoolMetrics())
+        return _acquire_shared_client(self._get_client_params())
+
+    def _use_shared_client(self, shared_client: "_SharedClient"):
+        self._shared_client = shared_client
+        self._client = shared_client.client
 
         # Create database "eocdb"
         self._db = self._client.eocdb
         # Create collection "eocdb.sb_datasets"
-        self._collection = self._client.eocdb.sb_datasets
-        self._submit_collection = self._client.eocdb.submission_files
-        self._user_collection = self._client.eocdb.users
-        self._links_collection = self._client.eocdb.links
+        self._collection = self._primary(self._client.eocdb.sb_datasets)
+        self._chunk_collection = self._primary(self._client.eocdb.dataset_chunks)
+        self._submit_collection = self._primary(self._client.eocdb.submission_files)
+        self._issues_collection = self._primary(self._client.eocdb.validation_issues)
+        self._generation_collection = self._primary(self._client.eocdb.data_generation)
+        self._user_collection = self._primary(self._client.eocdb.users)
+        self._links_collection = self._primary(self._client.eocdb.links)
+
+        self._search_collection = self._with_read_preference(self._client.eocdb.sb_datasets,
+                                                             self._search_read_preference)
+        self._chunk_search_collection = self._with_read_preference(self._client.eocdb.dataset_chunks,
+                                                                   self._search_read_preference)
+        self._submit_search_collection = self._with_read_preference(self._client.eocdb.submission_files,
+                                                                    self._search_read_preference)
         self._ensure_indices()
+        self._ensure_tile_index()
+
+    def _get_client_params(self) -> Dict[str, Any]:
+        client_params = {}
+        for key, value in self._config.items():
+            if key in _DRIVER_PARAM_NAMES:
+                continue
+            if key == "compressors" and isinstance(value, str):
+                value = [compressor.strip() for compressor in value.split(",")]
+            if key == "read_preference":
+                _get_read_preference_class(value)
+            client_params[_CLIENT_PARAM_NAMES.get(key, key)] = value
+        return client_params
 
-    def close(self):
-        if self._client is not None:
-            self._client.close()
+    @classmethod
+    def _primary(cls, collection):
+        return collection.with_options(read_preference=pymongo.read_preferences.Primary())
 
-    def clear(self):
-        if self._client is not None:
-            self._collection.drop()
-            self._submit_collection.drop()
+    @classmethod
+    def _with_read_preference(cls, collection, read_preference):
+        if read_preference is None:
+            return collection
+        return collection.with_options(read_preference=read_preference)
+
+    @classmethod
+    def _new_read_preference(cls, name: Optional[str], max_staleness: Optional[int] = None):
+        if name is None:
+            if max_staleness is not None:
+                raise ValueError("a maximum staleness requires a read preference")
+            return None
+        read_preference_class = _get_read_preference_class(name)
+        if max_staleness is None:
+            return read_preference_class()
+        if read_preference_class is pymongo.read_preferences.Primary:
+            raise ValueError("a maximum staleness cannot be used with read preference 'primary'")
+        return read_preference_class(max_staleness=max_staleness)
 
     def _set_config(self, config: Dict[str, Any]):
         for key in ("url", "uri"):
@@ -341,24 +880,45 @@ class MongoDbDriver(DbDriver):
                 #
                 config["host"] = uri
                 del config[key]
+        self._search_read_preference = self._new_read_preference(config.get("search_read_preference"),
+                                                                 config.get("search_max_staleness_seconds"))
+        if config.get("records_format", "arrays") not in RECORDS_FORMATS:
+            raise ValueError(f"records_format must be one of {', '.join(RECORDS_FORMATS)}")
+        if config.get("records_float_dtype", "float64") not in FLOAT_DTYPES:
+            raise ValueError(f"records_float_dtype must be one of {', '.join(FLOAT_DTYPES)}")
+        if config.get("records_compression") not in COMPRESSIONS:
+            raise ValueError("records_compression must be 'zlib' or not given")
+        if not isinstance(config.get("records_chunk_size", 0), int) or config.get("records_chunk_size", 0) < 0:
+            raise ValueError("records_chunk_size must be a non-negative integer")
         self._config = config
 
     @staticmethod
     def _to_dataset_ref(dataset_dict, geojson=False):
         dataset_id = str(dataset_dict.get("_id"))
         path = dataset_dict.get("path")
-        ds_ref = DatasetRef(dataset_id, path)
+        ds_ref = DatasetRef(dataset_id, path, score=dataset_dict.get("score"))
 
         if geojson:
-            lons = dataset_dict.get("longitudes")
-            lats = dataset_dict.get("latitudes")
-            points = []
-            for lon, lat in zip(lons, lats):
-                points.append((lon, lat))
+            points = list(zip(dataset_dict.get("longitudes") or [], dataset_dict.get("latitudes") or []))
         else:
             points = None
         return ds_ref, points
 
+    @classmethod
+    def _has_text_filter(cls, query_dict: Any) -> bool:
+        if isinstance(query_dict, dict):
+            return "$text" in query_dict or any(cls._has_text_filter(value) for value in query_dict.values())
+        if isinstance(query_dict, list):
+            return any(cls._has_text_filter(value) for value in query_dict)
+        return False
+
+    @staticmethod
+    def _get_field(document: Dict[str, Any], field_name: str) -> Any:
+        value = document
+        for name in field_name.split("."):
+            value = value[int(name)] if isinstance(value, list) else value[name]
+        return value
+
     @staticmethod
     def _convert_times(dataset_dict) -> dict:
         times_array = dataset_dict["times"]
@@ -368,6 +928,103 @@ class MongoDbDriver(DbDriver):
         dataset_dict["times"] = converted_times
         return dataset_dict
 
+    def _ensure_tile_index(self):
+        """
+        Add the tile index to the datasets stored before it was introduced.
+        Datasets written meanwhile already have it and are not touched.
+        """
+        cursor = self._collection.find({"tiles": {"$exists": False}},
+                                       projection={"longitudes": True, "latitudes": True})
+        try:
+            for dataset_dict in cursor:
+                MongoDbDriver._add_tile_index(dataset_dict)
+                self._collection.update_one({"_id": dataset_dict["_id"], "tiles": {"$exists": False}},
+                                            {"$set": {"tiles": dataset_dict["tiles"],
+                                                      "tile_counts": dataset_dict["tile_counts"]}})
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _add_tile_index(dataset_dict):
+        points = zip(dataset_dict.get("longitudes") or [], dataset_dict.get("latitudes") or [])
+        tile_counts = count_tiles(list(points))
+        dataset_dict["tiles"] = list(tile_counts.keys())
+        dataset_dict["tile_counts"] = list(tile_counts.values())
+        return dataset_dict
+
+    def _chunk_records(self, dataset_dict, obj_id) -> List[Dict[str, Any]]:
+        """Move the records of *dataset_dict* into chunk documents, unless chunking is disabled."""
+        chunk_size = self._config.get("records_chunk_size", DEFAULT_RECORDS_CHUNK_SIZE)
+        if not chunk_size:
+            self._pack_records(dataset_dict)
+            return []
+
+        records = dataset_dict.pop("records")
+        chunk_set = uuid.uuid4().hex
+        chunks = []
+        for chunk_no, start in enumerate(range(0, len(records), chunk_size)):
+            chunk = dict(dataset_id=obj_id, chunk_set=chunk_set, chunk_no=chunk_no,
+                         records=records[start:start + chunk_size])
+            chunks.append(self._pack_records(chunk))
+        dataset_dict[CHUNKED_RECORDS_FIELD] = dict(num_rows=len(records), chunk_size=chunk_size,
+                                                   num_chunks=len(chunks), chunk_set=chunk_set)
+        return chunks
+
+    @staticmethod
+    def _chunk_set_filter(obj_id, chunked: Dict[str, Any]) -> Dict[str, Any]:
+        # chunks stored before chunk sets were introduced have no chunk set
+        return {"dataset_id": obj_id, "chunk_set": chunked.get("chunk_set")}
+
+    def _get_chunked_records(self, obj_id, chunked: Dict[str, Any], start: int, stop: int,
+                             columns: List[int] = None) -> List[List]:
+        """
+        Get the records *start* to *stop* (exclusive), fetching only the chunks that contain them.
+        If given, only the *columns* with these indexes are returned. Return None if chunks are missing,
+        because the dataset has been updated or deleted after *chunked* was read.
+        """
+        if start >= stop:
+            return []
+        chunk_size = chunked["chunk_size"]
+        first_chunk_no = start // chunk_size
+        last_chunk_no = (stop - 1) // chunk_size
+        cursor = self._chunk_search_collection.find(dict(self._chunk_set_filter(obj_id, chunked),
+                                                         chunk_no={"$gte": first_chunk_no, "$lte": last_chunk_no}),
+                                                    projection={"_id": False, "records": True,
+                                                                PACKED_RECORDS_FIELD: True},
+                                                    sort=[("chunk_no", pymongo.ASCENDING)])
+        chunks = list(cursor)
+        if len(chunks) != last_chunk_no - first_chunk_no + 1:
+            return None
+        records = []
+        for chunk in chunks:
+            packed = chunk.get(PACKED_RECORDS_FIELD)
+            if packed is not None:
+                records.extend(unpack_records(packed, columns=columns))
+            elif columns is not None:
+                records.extend([record[i] for i in columns] for record in chunk["records"])
+            else:
+                records.extend(chunk["records"])
+        offset = first_chunk_no * chunk_size
+        return records[start - offset:stop - offset]
+
+    def _pack_records(self, dataset_dict):
+        if self._config.get("records_format", "arrays") != "packed":
+            return dataset_dict
+        packed = pack_records(dataset_dict["records"],
+                              float_dtype=self._config.get("records_float_dtype", "float64"),
+                              compression=self._config.get("records_compression"))
+        if packed is not None:
+            dataset_dict[PACKED_RECORDS_FIELD] = packed
+            del dataset_dict["records"]
+        return dataset_dict
+
+    @staticmethod
+    def _unpack_records(dataset_dict):
+        packed = dataset_dict.pop(PACKED_RECORDS_FIELD, None)
+        if packed is not None:
+            dataset_dict["records"] = unpack_records(packed)
+        return dataset_dict
+
     def _ensure_indices(self):
         # the main collection
         index_information = self._collection.index_information()
@@ -379,11 +1036,68 @@ class MongoDbDriver(DbDriver):
             self._collection.create_index("attributes", name=ATTRIBUTES_INDEX_NAME, background=True)
         if not TIMES_INDEX_NAME in index_information:
             self._collection.create_index("times", name=TIMES_INDEX_NAME, background=True)
+        if not PATH_INDEX_NAME in index_information:
+            self._collection.create_index(DATASET_SORT_ORDER, name=PATH_INDEX_NAME, background=True)
+        if not DEPTH_INDEX_NAME in index_information:
+            self._collection.create_index([("min_depth", pymongo.ASCENDING), ("max_depth", pymongo.ASCENDING)],
+                                          name=DEPTH_INDEX_NAME, background=True)
+        if not WLMODE_INDEX_NAME in index_information:
+            self._collection.create_index("wlmode", name=WLMODE_INDEX_NAME, background=True)
+        if not GROUPS_INDEX_NAME in index_information:
+            self._collection.create_index("groups", name=GROUPS_INDEX_NAME, background=True)
+        if not TILES_INDEX_NAME in index_information:
+            self._collection.create_index("tiles", name=TILES_INDEX_NAME, background=True)
+        if not CRUISE_INDEX_NAME in index_information:
+            self._collection.create_index("metadata.cruise", name=CRUISE_INDEX_NAME, background=True)
+        self._ensure_text_index(index_information)
+
+        index_information = self._chunk_collection.index_information()
+        chunk_index_info = index_information.get(DATASET_CHUNK_INDEX_NAME)
+        if chunk_index_info is not None and [tuple(key) for key in chunk_index_info["key"]] != DATASET_CHUNK_INDEX_KEY:
+            # the index of former versions allowed only one set of chunks per dataset
+            self._chunk_collection.drop_index(DATASET_CHUNK_INDEX_NAME)
+            chunk_index_info = None
+        if chunk_index_info is None:
+            self._chunk_collection.create_index(DATASET_CHUNK_INDEX_KEY, name=DATASET_CHUNK_INDEX_NAME, unique=True,
+                                                background=True)
 
         # the quarantane collection
         index_information = self._submit_collection.index_information()
         if not USER_ID_INDEX_NAME in index_information:
             self._submit_collection.create_index("user_id", name=USER_ID_INDEX_NAME, background=True)
+        if not SUBMISSION_DATE_INDEX_NAME in index_information:
+            self._submit_collection.create_index([("date", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)],
+                                                 name=SUBMISSION_DATE_INDEX_NAME, background=True)
+        if not SUBMISSION_USER_DATE_INDEX_NAME in index_information:
+            self._submit_collection.create_index([("user_id", pymongo.ASCENDING),
+                                                  ("date", pymongo.ASCENDING),
+                                                  ("_id", pymongo.ASCENDING)],
+                                                 name=SUBMISSION_USER_DATE_INDEX_NAME, background=True)
+        if not SUBMISSION_STATUS_DATE_INDEX_NAME in index_information:
+            self._submit_collection.create_index([("status", pymongo.ASCENDING),
+                                                  ("date", pymongo.ASCENDING),
+                                                  ("_id", pymongo.ASCENDING)],
+                                                 name=SUBMISSION_STATUS_DATE_INDEX_NAME, background=True)
+
+        index_information = self._issues_collection.index_information()
+        if not ISSUES_INDEX_NAME in index_information:
+            self._issues_collection.create_index([("submission_id", pymongo.ASCENDING),
+                                                  ("filename", pymongo.ASCENDING),
+                                                  ("issue_no", pymongo.ASCENDING)],
+                                                 name=ISSUES_INDEX_NAME, background=True)
+        if not ISSUES_ID_INDEX_NAME in index_information:
+            self._issues_collection.create_index([("issues_id", pymongo.ASCENDING), ("issue_no", pymongo.ASCENDING)],
+                                                 name=ISSUES_ID_INDEX_NAME, background=True)
+
+    def _ensure_text_index(self, index_information: Dict[str, Any]):
+        for index_name, index_info in index_information.items():
+            if not any(direction == pymongo.TEXT for _, direction in index_info["key"]):
+                continue
+            if index_name == TEXT_INDEX_NAME and index_info.get("weights", TEXT_INDEX_WEIGHTS) == TEXT_INDEX_WEIGHTS:
+                return
+            self._collection.drop_index(index_name)
+        self._collection.create_index([(field, pymongo.TEXT) for field in TEXT_INDEX_WEIGHTS],
+                                      name=TEXT_INDEX_NAME, weights=TEXT_INDEX_WEIGHTS, background=True)
 
     @staticmethod
     def _parse_datetime(time_string) -> datetime:
@@ -393,25 +1107,15 @@ class MongoDbDriver(DbDriver):
 
     @staticmethod
     def _to_geojson(locations):
-        if len(locations) == 0:
-            return None
-
-        geojson = "{'type':'FeatureCollection','features':["
-        for location in locations:
-            feature = "{'type':'Feature','geometry':{'type':'Point','coordinates':["
-            feature += str(location[0])
-            feature += ","
-            feature += str(location[1])
-            feature += "]}},"
-            geojson += feature
-
-        geojson = geojson[:-1]
-        geojson += "]}"
-        return geojson
+        return to_geojson_text(locations)
 
     class QueryConverter():
 
-        def to_dict(self, query: DatasetQuery) -> dict:
+        def to_dict(self, query: DatasetQuery, collection=None) -> dict:
+            """
+            Convert *query* into a MongoDB filter. The *collection* is needed to resolve the cruises
+            of product group queries in "same_cruise" mode, without it the mode falls back to "contains".
+            """
             query_dict = {}
             if query.expr is not None:
                 query_generator = MongoQueryGenerator()
@@ -449,8 +1153,26 @@ class MongoDbDriver(DbDriver):
             if query.status is not None:
                 query_dict.update({'status': query.status})
 
-            if query.pgroup is not None:
-                query_dict.update({'groups': {'$in': query.pgroup}})
+            if query.wdepth is not None:
+                min_depth, max_depth = query.wdepth[0], query.wdepth[1]
+                if min_depth is None and max_depth is None:
+                    raise ValueError("Both water depth values are none.")
+                # the depth range of the dataset must overlap the requested one
+                if min_depth is not None:
+                    self._add_condition(query_dict, 'max_depth', {'$gte': min_depth})
+                if max_depth is not None:
+                    self._add_condition(query_dict, 'min_depth', {'$lte': max_depth})
+
+            if query.wlmode is not None and query.wlmode != 'all':
+                self._add_condition(query_dict, 'wlmode', query.wlmode)
+
+            if query.pgroup is not None and query.pmode != 'dont_apply':
+                groups_condition = {'groups': {'$in': query.pgroup}}
+                if query.pmode == 'same_cruise' and collection is not None:
+                    cruises = collection.distinct('metadata.cruise', groups_condition)
+                    self._add_condition(query_dict, 'metadata.cruise', {'$in': cruises})
+                else:
+                    self._add_condition(query_dict, 'groups', groups_condition['groups'])
 
             if query.pname is not None:
                 query_dict.update({'attributes': {'$in': query.pname}})
@@ -465,3 +1187,144 @@ class MongoDbDriver(DbDriver):
                 query_dict.update({'metadata.data_type': query.mtype})
 
             return query_dict
+
+        @staticmethod
+        def _add_condition(query_dict: dict, key: str, condition: Any):
+            if key in query_dict:
+                query_dict.setdefault('$and', []).append({key: condition})
+            else:
+                query_dict[key] = condition
+
+
+class _CommandMetrics(pymongo.monitoring.CommandListener):
+    """Records the durations and failures of the commands of all clients."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        _OPERATION_DURATION.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        _OPERATION_DURATION.observe(event.duration_micros / 1e6, command=event.command_name)
+        _OPERATION_ERRORS.inc(command=event.command_name)
+
+
+_COMMAND_METRICS = _CommandMetrics()
+
+
+class _ConnectionPoolMetrics(pymongo.monitoring.ConnectionPoolListener):
+    """Counts the connection pool events of a client."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict(connections_created=0,
+                            connections_closed=0,
+                            connections_checked_out=0,
+                            connections_checked_in=0,
+                            check_out_failures=0,
+                            check_out_timeouts=0,
+                            pools_cleared=0)
+
+    def to_dict(self) -> Dict[str, int]:
+        with self._lock:
+            metrics = dict(self._counts)
+        metrics["connections_open"] = metrics["connections_created"] - metrics["connections_closed"]
+        metrics["connections_in_use"] = metrics["connections_checked_out"] - metrics["connections_checked_in"]
+        return metrics
+
+    def _inc(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._inc("pools_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._inc("connections_created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._inc("connections_closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._inc("check_out_failures")
+        if event.reason == pymongo.monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            self._inc("check_out_timeouts")
+
+    def connection_checked_out(self, event):
+        self._inc("connections_checked_out")
+
+    def connection_checked_in(self, event):
+        self._inc("connections_checked_in")
+
+
+class _SharedClient:
+    """A client shared by all drivers of this process that use the same client parameters."""
+
+    def __init__(self, client, metrics: _ConnectionPoolMetrics, key: str = None):
+        self.client = client
+        self.metrics = metrics
+        self.key = key
+        self.ref_count = 1
+
+
+def _acquire_shared_client(client_params: Dict[str, Any]) -> _SharedClient:
+    key = repr(sorted(client_params.items()))
+    with _SHARED_CLIENTS_LOCK:
+        shared_client = _SHARED_CLIENTS.get(key)
+        if shared_client is not None:
+            shared_client.ref_count += 1
+            return shared_client
+
+        metrics = _ConnectionPoolMetrics()
+        client_params = dict(client_params)
+        event_listeners = [metrics, _COMMAND_METRICS] + list(client_params.pop("event_listeners", []))
+        client = pymongo.MongoClient(event_listeners=event_listeners, **client_params)
+        try:
+            # @trello: Resolve call hanging when requesting MongoDb server up
+            # The ismaster command is cheap and does not require auth.
+            client.admin.command('ismaster')
+        except pymongo.errors.ConnectionFailure as e:
+            client.close()
+            raise RuntimeError("Database connection failure") from e
+
+        shared_client = _SharedClient(client, metrics, key=key)
+        _SHARED_CLIENTS[key] = shared_client
+        return shared_client
+
+
+def _release_shared_client(shared_client: _SharedClient, close_delay: float):
+    with _SHARED_CLIENTS_LOCK:
+        shared_client.ref_count -= 1
+        if shared_client.ref_count > 0:
+            return
+        if shared_client.key is not None:
+            del _SHARED_CLIENTS[shared_client.key]
+
+    if close_delay > 0:
+        timer = threading.Timer(close_delay, shared_client.client.close)
+        timer.daemon = True
+        timer.start()
+    else:
+        shared_client.client.close()
+
+
+def _get_read_preference_class(name: str):
+    if name not in _READ_PREFERENCES:
+        raise ValueError(f"read preference must be one of {list(_READ_PREFERENCES.keys())}, but was {name!r}")
+    return _READ_PREFERENCES[name]
@@ -0,0 +1,102 @@
+"""
+Packed column storage of dataset records.
+
+Numeric columns are stored as binary blobs of little-endian integers or floats, optionally compressed,
+all other columns as plain value lists::
+
+    {"num_rows": 2,
+     "columns": [{"dtype": "<f8", "compression": "zlib", "data": b"..."},
+                 {"values": ["a", "b"]}]}
+
+Columns that mix integers and floats are stored as floats, so their integers are read back as floats.
+"""
+
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+FLOAT_DTYPES = {"float32": "<f4", "float64": "<f8"}
+COMPRESSIONS = (None, "zlib")
+
+_INT_DTYPE = "<i8"
+
+Column = Union[np.ndarray, List[Any]]
+
+
+def pack_records(records: Sequence[Sequence[Any]],
+                 float_dtype: str = "float64",
+                 compression: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Pack *records* column-wise. Floats are stored with *float_dtype*, "float64" or "float32",
+    blobs are compressed with *compression*, None or "zlib".
+    Returns None, if the records cannot be packed, because their rows differ in length.
+    """
+    if float_dtype not in FLOAT_DTYPES:
+        raise ValueError(f"float_dtype must be one of {', '.join(FLOAT_DTYPES)}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"compression must be one of {COMPRESSIONS}")
+
+    num_rows = len(records)
+    num_columns = len(records[0]) if num_rows else 0
+    if any(len(record) != num_columns for record in records):
+        return None
+
+    columns = [_pack_column([record[i] for record in records], FLOAT_DTYPES[float_dtype], compression)
+               for i in range(num_columns)]
+    return dict(num_rows=num_rows, columns=columns)
+
+
+def unpack_columns(packed: Dict[str, Any], columns: Sequence[int] = None) -> List[Column]:
+    """
+    Unpack the columns of *packed* records, or only those with the indexes given by *columns*.
+    Numeric columns are returned as NumPy arrays.
+    """
+    packed_columns = packed["columns"]
+    if columns is not None:
+        packed_columns = [packed_columns[i] for i in columns]
+    unpacked_columns = []
+    for column in packed_columns:
+        if "values" in column:
+            unpacked_columns.append(column["values"])
+            continue
+        data = column["data"]
+        if column.get("compression") == "zlib":
+            data = zlib.decompress(data)
+        unpacked_columns.append(np.frombuffer(data, dtype=column["dtype"]))
+    return unpacked_columns
+
+
+def unpack_records(packed: Dict[str, Any], columns: Sequence[int] = None) -> List[List[Any]]:
+    """Unpack *packed* records into rows of Python values, optionally only the columns with the given indexes."""
+    columns = [column.tolist() if isinstance(column, np.ndarray) else column
+               for column in unpack_columns(packed, columns=columns)]
+    if not columns:
+        return [[] for _ in range(packed["num_rows"])]
+    return [list(record) for record in zip(*columns)]
+
+
+def _pack_column(values: List[Any], float_dtype: str, compression: Optional[str]) -> Dict[str, Any]:
+    dtype = _get_numeric_dtype(values, float_dtype)
+    if dtype is None:
+        return dict(values=values)
+    try:
+        data = np.array(values, dtype=dtype).tobytes()
+    except OverflowError:
+        return dict(values=values)
+    if compression == "zlib":
+        data = zlib.compress(data)
+    return dict(dtype=dtype, compression=compression, data=data)
+
+
+def _get_numeric_dtype(values: List[Any], float_dtype: str) -> Optional[str]:
+    dtype = None
+    for value in values:
+        value_type = type(value)
+        if value_type is int:
+            dtype = dtype or _INT_DTYPE
+        elif value_type is float:
+            dtype = float_dtype
+        else:
+            return None
+    return dtype
@@ -1,8 +1,10 @@
 import csv
 import fnmatch
+import functools
 import json
 import os
-from typing import List, Any, Dict
+import re
+from typing import List, Any, Dict, Sequence
 
 Field = Dict[str, Any]
 ProductGroup = Dict[str, Any]
@@ -20,10 +22,12 @@ _NON_PRODUCT_FIELD_NAMES = {
     "year",
 }
 
-_FIELDS = None
 _PRODUCT_GROUPS = None
 _PRODUCT_TO_GROUP = None
-_WILDCARD_PRODUCT_TO_GROUP = None
+_WILDCARD_GROUPS = None
+_WILDCARD_REGEX = None
+_FIELDS = None
+_PRODUCTS = None
 
 
 def get_product_groups() -> List[ProductGroup]:
@@ -38,70 +42,73 @@ def get_product_groups() -> List[ProductGroup]:
             _PRODUCT_GROUPS = json.load(fp)
     return _PRODUCT_GROUPS
 
+
+@functools.lru_cache(maxsize=4096)
 def get_groups_for_product(product) -> List[str]:
     """
         Return a list of product groups names the product passed in belongs to.
-        May return empty list.
+        May return empty list. The returned list is shared and must not be modified.
         """
-    global _PRODUCT_TO_GROUP
-    global _WILDCARD_PRODUCT_TO_GROUP
-
     if _PRODUCT_TO_GROUP is None:
         _load_product_to_group_map()
 
-    if product in _PRODUCT_TO_GROUP:
-        return _PRODUCT_TO_GROUP[product]
+    groups = _PRODUCT_TO_GROUP.get(product)
+    if groups is not None:
+        return groups
 
-    for wc_product in _WILDCARD_PRODUCT_TO_GROUP:
-        if fnmatch.fnmatch(product, wc_product):
-            return _WILDCARD_PRODUCT_TO_GROUP[wc_product]
+    # a single regex with one alternative per wildcard product, the first matching one wins
+    match = _WILDCARD_REGEX.match(product) if _WILDCARD_REGEX is not None else None
+    if match is not None:
+        return _WILDCARD_GROUPS[match.lastindex - 1]
 
     return []
 
 
 def _load_product_to_group_map():
     global _PRODUCT_TO_GROUP
-    _PRODUCT_TO_GROUP = {}
+    global _WILDCARD_GROUPS
+    global _WILDCARD_REGEX
 
-    global _WILDCARD_PRODUCT_TO_GROUP
-    _WILDCARD_PRODUCT_TO_GROUP = {}
-
-    product_groups = get_product_groups()
-    for product_group in product_groups:
+    product_to_group = {}
+    wildcard_product_to_group = {}
+    for product_group in get_product_groups():
         for product in product_group["products"]:
             if "*" in product or "?" in product:
-                if not product in _WILDCARD_PRODUCT_TO_GROUP:
-                    _WILDCARD_PRODUCT_TO_GROUP.update({product: [product_group["name"]]})
-                else:
-                    _WILDCARD_PRODUCT_TO_GROUP[product].append(product_group["name"])
+                wildcard_product_to_group.setdefault(product, []).append(product_group["name"])
             else:
-                if not product in _PRODUCT_TO_GROUP:
-                    _PRODUCT_TO_GROUP.update({product: [product_group["name"]]})
-                else:
-                    _PRODUCT_TO_GROUP[product].append(product_group["name"])
+                product_to_group.setdefault(product, []).append(product_group["name"])
+
+    wildcard_products = list(wildcard_product_to_group)
+    _WILDCARD_GROUPS = [wildcard_product_to_group[product] for product in wildcard_products]
+    _WILDCARD_REGEX = re.compile("|".join(f"({fnmatch.translate(product)})" for product in wildcard_products)) \
+        if wildcard_products else None
+    _PRODUCT_TO_GROUP = product_to_group
 
 
-def get_products() -> List[Field]:
+def get_products() -> Sequence[Field]:
     """
-    Return a list of allowed and valid product names of the form
+    Return an immutable sequence of allowed and valid product names of the form
     ``dict(name=<product-group-name>, description=<description>, products=<products>)``, where
     <products> is a list of the form ``[<field-wildcard>, <field-wildcard>, <field-wildcard>, ...]``.
 
     This is a filtered version of the list returned by func::get_fields.
     """
-    return [f for f in get_fields() if f["name"] not in _NON_PRODUCT_FIELD_NAMES]
+    global _PRODUCTS
+    if _PRODUCTS is None:
+        _PRODUCTS = tuple(f for f in get_fields() if f["name"] not in _NON_PRODUCT_FIELD_NAMES)
+    return _PRODUCTS
 
 
-def get_fields() -> List[Field]:
+def get_fields() -> Sequence[Field]:
     """
-    Return a list of allowed and valid field names of the form
+    Return an immutable sequence of allowed and valid field names of the form
     ``[<field-wildcard>, <units>, <description>]``.
 
     A "field" refers to a column name
     """
     global _FIELDS
     if _FIELDS is None:
-        _FIELDS = []
+        fields = []
 
         file = os.path.join(os.path.dirname(__file__), "res", "fields.csv")
         with open(file, encoding="utf8") as fp:
@@ -111,5 +118,10 @@ def get_fields() -> List[Field]:
                     raise ValueError(f"malformed file {file}, rows must have 3 columns")
                 name = row[0]
                 groups = get_groups_for_product(name)
-                _FIELDS.append(dict(name=name, units=row[1], description=row[2], groups=groups))
+                fields.append(dict(name=name, units=row[1], description=row[2], groups=groups))
+        _FIELDS = tuple(fields)
     return _FIELDS
+
+
+# load eagerly, so that the first request or file does not pay for it
+get_products()
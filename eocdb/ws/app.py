@@ -21,13 +21,25 @@
 
 
 import os
+from typing import Optional
 
-from tornado.web import Application, StaticFileHandler
+from tornado.web import Application, StaticFileHandler, GZipContentEncoding
 
+from .defaults import DEFAULT_COMPRESS_MIN_LENGTH
 from .handlers import MAPPINGS
 
 
-def new_application():
+def new_application(compress_min_length: Optional[int] = DEFAULT_COMPRESS_MIN_LENGTH):
+    """
+    Create the web application. Responses of at least *compress_min_length* bytes are gzip-compressed,
+    if the client accepts it. If *compress_min_length* is None, responses are not compressed.
+    """
     mappings = [('/res/(.*)', StaticFileHandler, {'path': os.path.join(os.path.dirname(__file__), 'res')})] + MAPPINGS
-    application = Application(mappings, cookie_secret="__theEOCDB_secretEncryptionString__")
+    transforms = []
+    if compress_min_length is not None:
+        class _GZipContentEncoding(GZipContentEncoding):
+            MIN_LENGTH = compress_min_length
+
+        transforms.append(_GZipContentEncoding)
+    application = Application(mappings, transforms=transforms, cookie_secret="__theEOCDB_secretEncryptionString__")
     return application
@@ -19,12 +19,16 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import collections
 import concurrent.futures
 import logging
 import os
-from typing import Any, Dict, Sequence, Optional
+import threading
+import time
+from typing import Any, Dict, Sequence, Optional, List, Tuple, Callable, Hashable
 
-from .defaults import DEFAULT_SERVER_NAME, DEFAULT_MAX_THREAD_COUNT
+from .defaults import DEFAULT_SERVER_NAME, DEFAULT_MAX_THREAD_COUNT, DEFAULT_SEARCH_TIMEOUT, DEFAULT_USER_CACHE_TTL, \
+    DEFAULT_TILE_CACHE_TTL, DEFAULT_TILE_CACHE_SIZE
 from ..core.db.db_driver import DbDriver
 from ..core.db.db_user import DbUser
 from ..core.service import ServiceRegistry
@@ -39,6 +43,10 @@ DEFAULT_STORE_PATH = "~/.ocdb/store"
 DEFAULT_UPLOAD_PATH = "~/.ocdb/store"
 
 DB_DRIVERS_CONFIG_NAME = "databases"
+SEARCH_TIMEOUT_CONFIG_NAME = "search_timeout"
+USER_CACHE_TTL_CONFIG_NAME = "user_cache_ttl"
+TILE_CACHE_TTL_CONFIG_NAME = "tile_cache_ttl"
+TILE_CACHE_SIZE_CONFIG_NAME = "tile_cache_size"
 
 DATASETS_DIR_NAME = "archive"
 DOC_FILES_DIR_NAME = "documents"
@@ -51,6 +59,11 @@ class WsContext:
         self._config = {}
         self._store_path = None
         self._db_drivers = ServiceRegistry()
+        self._db_driver_resolution = None
+        self._user_cache = dict()
+        self._user_cache_lock = threading.Lock()
+        self._tile_cache = collections.OrderedDict()
+        self._tile_cache_lock = threading.Lock()
         self._thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=DEFAULT_MAX_THREAD_COUNT,
                                                                   thread_name_prefix=DEFAULT_SERVER_NAME)
 
@@ -70,38 +83,38 @@ class WsContext:
     def upload_path(self) -> str:
         return self._extract_path(UPLOAD_PATH_CONFIG_NAME, DEFAULT_UPLOAD_PATH)
 
+    @property
+    def thread_pool(self) -> concurrent.futures.ThreadPoolExecutor:
+        return self._thread_pool
+
     @property
     def db_drivers(self) -> Sequence[DbDriver]:
-        # noinspection PyTypeChecker
-        return self._db_drivers.find_services(service_type=DbDriver)
+        return self._get_db_driver_resolution().db_drivers
+
+    @property
+    def db_driver_search_timeouts(self) -> List[Tuple[DbDriver, float]]:
+        """
+        Get all database drivers together with the time in seconds they may take to answer a search.
+        The timeout is given by the driver's "search_timeout" setting or the global one.
+        """
+        return self._get_db_driver_resolution().search_timeouts
 
     @property
     def db_driver(self) -> DbDriver:
         """Get the primary database driver."""
+        resolution = self._get_db_driver_resolution()
+        if resolution.primary_db_driver is None:
+            raise RuntimeError(resolution.primary_db_driver_error)
+        return resolution.primary_db_driver
 
-        primary_db_driver = None
-
-        def filter_db_drivers(service_id, service, config):
-            nonlocal primary_db_driver
-            if not isinstance(service, DbDriver):
-                return False
-            if config.get('primary', False):
-                if primary_db_driver is not None:
-                    raise RuntimeError('There can only be a single primary database driver')
-                primary_db_driver = service
-            return True
-
-        drivers = self._db_drivers.find_services(service_filter=filter_db_drivers)
-        if primary_db_driver is None:
-            if len(drivers) == 1:
-                primary_db_driver = drivers[0]
-            elif len(drivers) == 0:
-                raise RuntimeError('No database driver found')
-            else:
-                raise RuntimeError('With multiple database drivers, one must be configured to be the primary one')
-
-        # noinspection PyTypeChecker
-        return primary_db_driver
+    @property
+    def data_generation(self) -> str:
+        """
+        Get the data generation of the primary database, which changes whenever its datasets change.
+        It is persisted by the database, so all service processes using it agree on it,
+        and it can be used to validate cached responses.
+        """
+        return self.db_driver.instance().get_data_generation()
 
     def get_datasets_store_path(self, sub_path: str) -> str:
         return os.path.join(self.store_path, sub_path, DATASETS_DIR_NAME)
@@ -128,11 +141,79 @@ class WsContext:
             self._db_drivers.update(new_db_drivers)
 
         self._config = dict(new_config)
+        self._db_driver_resolution = None
+        self.invalidate_user()
+        self.invalidate_tiles()
 
     def dispose(self):
         self._db_drivers.dispose()
+        self._db_driver_resolution = None
+        self.invalidate_user()
+        self.invalidate_tiles()
 
     def get_user(self, user_name: str, password: str = None) -> Optional[DbUser]:
+        """
+        Get the user named *user_name*. Lookups without *password* are served from a cache
+        whose entries expire after "user_cache_ttl" seconds, so callers must not modify the returned user.
+        """
+        if password is not None:
+            return self._load_user(user_name, password)
+
+        ttl = self._config.get(USER_CACHE_TTL_CONFIG_NAME, DEFAULT_USER_CACHE_TTL)
+        if ttl <= 0:
+            return self._load_user(user_name)
+
+        now = time.monotonic()
+        with self._user_cache_lock:
+            entry = self._user_cache.get(user_name)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        user = self._load_user(user_name)
+        with self._user_cache_lock:
+            self._user_cache[user_name] = (now + ttl, user)
+        return user
+
+    def invalidate_user(self, user_name: str = None):
+        """Remove user *user_name* or, if not given, all users from the user cache."""
+        with self._user_cache_lock:
+            if user_name is None:
+                self._user_cache.clear()
+            else:
+                self._user_cache.pop(user_name, None)
+
+    def get_tile(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Get the map tile for *key* from the tile cache, or compute and cache it using *compute*.
+        Tiles expire after "tile_cache_ttl" seconds, the least recently used ones are removed
+        if there are more than "tile_cache_size". Callers must not modify the returned tile.
+        """
+        ttl = self._config.get(TILE_CACHE_TTL_CONFIG_NAME, DEFAULT_TILE_CACHE_TTL)
+        if ttl <= 0:
+            return compute()
+
+        now = time.monotonic()
+        with self._tile_cache_lock:
+            entry = self._tile_cache.get(key)
+            if entry is not None and entry[0] > now:
+                self._tile_cache.move_to_end(key)
+                return entry[1]
+
+        tile = compute()
+        max_size = self._config.get(TILE_CACHE_SIZE_CONFIG_NAME, DEFAULT_TILE_CACHE_SIZE)
+        with self._tile_cache_lock:
+            self._tile_cache[key] = (now + ttl, tile)
+            self._tile_cache.move_to_end(key)
+            while len(self._tile_cache) > max_size:
+                self._tile_cache.popitem(last=False)
+        return tile
+
+    def invalidate_tiles(self):
+        """Remove all tiles from the tile cache, must be called whenever datasets are added, changed or removed."""
+        with self._tile_cache_lock:
+            self._tile_cache.clear()
+
+    def _load_user(self, user_name: str, password: str = None) -> Optional[DbUser]:
         user = self.db_driver.get_user(user_name=user_name, password=password)
         if user is None:
             user_dict = self.config["admin_user"]
@@ -145,9 +226,52 @@ class WsContext:
 
         return user
 
+    def _get_db_driver_resolution(self) -> "_DbDriverResolution":
+        # Resolved once per configuration, configure() and dispose() reset it
+        resolution = self._db_driver_resolution
+        if resolution is None:
+            resolution = _DbDriverResolution(self._db_drivers,
+                                             self._config.get(SEARCH_TIMEOUT_CONFIG_NAME, DEFAULT_SEARCH_TIMEOUT))
+            self._db_driver_resolution = resolution
+        return resolution
+
     def _extract_path(self, property_name, default_path):
         path = self.config.get(property_name, default_path)
         path = os.path.expanduser(path)
         if not os.path.isabs(path):
             path = os.path.join(self.base_dir, path)
         return path
+
+
+class _DbDriverResolution:
+    """The database drivers of a given configuration, including the primary one."""
+
+    def __init__(self, db_drivers: ServiceRegistry, default_search_timeout: float):
+        primary_db_drivers = []
+        search_timeouts = []
+
+        def filter_db_drivers(service_id, service, config):
+            if not isinstance(service, DbDriver):
+                return False
+            if config.get('primary', False):
+                primary_db_drivers.append(service)
+            search_timeouts.append((service, config.get(SEARCH_TIMEOUT_CONFIG_NAME, default_search_timeout)))
+            return True
+
+        # noinspection PyTypeChecker
+        self.db_drivers = db_drivers.find_services(service_filter=filter_db_drivers)  # type: Sequence[DbDriver]
+        self.search_timeouts = search_timeouts
+        self.primary_db_driver = None  # type: Optional[DbDriver]
+        self.primary_db_driver_error = None  # type: Optional[str]
+
+        if len(primary_db_drivers) > 1:
+            self.primary_db_driver_error = 'There can only be a single primary database driver'
+        elif len(primary_db_drivers) == 1:
+            self.primary_db_driver = primary_db_drivers[0]
+        elif len(self.db_drivers) == 1:
+            self.primary_db_driver = self.db_drivers[0]
+        elif len(self.db_drivers) == 0:
+            self.primary_db_driver_error = 'No database driver found'
+        else:
+            self.primary_db_driver_error = 'With multiple database drivers, ' \
+                                           'one must be configured to be the primary one'
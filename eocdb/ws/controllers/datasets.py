@@ -20,19 +20,33 @@
 # SOFTWARE.
 
 
-from typing import List
+import concurrent.futures
+import copy
+import heapq
+import itertools
+import time
+from typing import List, Tuple, Dict, Any, Optional, Iterator
 
-from ..context import WsContext
+from ..context import WsContext, _LOG
 from ...core.asserts import assert_not_none, assert_one_of, assert_instance
+from ...core.db.db_driver import DbDriver
+from ...core.locations import LOCATION_FORMATS, TILE_INDEX_ZOOM, tile_to_quadkey, cluster_tiles
 from ...core.models.dataset import Dataset
-from ...core.models.dataset_query import DatasetQuery
+from ...core.models.dataset_query import DatasetQuery, DATASET_SORT_MODES
 from ...core.models.dataset_query_result import DatasetQueryResult
 from ...core.models.dataset_ref import DatasetRef
 from ...core.models.dataset_validation_result import DatasetValidationResult
 from ...core.models.qc_info import QcInfo, QC_STATUS_SUBMITTED
+from ...core.time_helper import TimeHelper
 from ...core.val import validator
 from ...ws.errors import WsResourceNotFoundError, WsBadRequestError, WsNotImplementedError
 
+# The clusters of a map tile are the tiles this many zoom levels below it, that is up to 8 x 8 clusters
+TILE_CLUSTER_ZOOM_OFFSET = 3
+
+# Number of records read from the database at once by get_dataset_records()
+RECORDS_BATCH_SIZE = 1000
+
 
 def validate_dataset(ctx: WsContext, dataset: Dataset) -> DatasetValidationResult:
     return validator.validate_dataset(dataset, ctx.config)
@@ -52,10 +66,121 @@ def find_datasets(ctx: WsContext,
                   submission_id: str = None,
                   pname: List[str] = None,
                   geojson: bool = False,
+                  locformat: str = None,
+                  maxpoints: int = None,
                   offset: int = 1,
                   user_id: str = None,
-                  count: int = 1000) -> DatasetQueryResult:
-    """Find datasets."""
+                  count: int = 1000,
+                  sort: str = 'path') -> DatasetQueryResult:
+    """
+    Find datasets. If *sort* is "relevance", datasets matching the free-text terms of *expr* are ranked by
+    their text score, otherwise the results are ordered by path.
+    """
+    if locformat is not None:
+        assert_one_of(locformat, list(LOCATION_FORMATS), name='locformat')
+    assert_one_of(sort, list(DATASET_SORT_MODES), name='sort')
+    query = _new_dataset_query(expr=expr, region=region, time=time, wdepth=wdepth, mtype=mtype, wlmode=wlmode,
+                               shallow=shallow, pmode=pmode, pgroup=pgroup, status=status,
+                               submission_id=submission_id, pname=pname, user_id=user_id)
+    query.geojson = geojson
+    query.locformat = locformat
+    query.maxpoints = maxpoints
+    query.offset = offset
+    query.count = count
+    query.sort = sort
+
+    db_driver_timeouts = ctx.db_driver_search_timeouts
+    if len(db_driver_timeouts) == 1:
+        db_driver, _ = db_driver_timeouts[0]
+        return db_driver.instance().find_datasets(query)
+
+    return _find_datasets_federated(ctx, query, db_driver_timeouts)
+
+
+def iter_datasets(ctx: WsContext,
+                  expr: str = None,
+                  region: List[float] = None,
+                  time: List[str] = None,
+                  wdepth: List[float] = None,
+                  mtype: str = 'all',
+                  wlmode: str = 'all',
+                  shallow: str = 'no',
+                  pmode: str = 'contains',
+                  pgroup: List[str] = None,
+                  status: str = None,
+                  submission_id: str = None,
+                  pname: List[str] = None,
+                  user_id: str = None,
+                  projection: List[str] = None,
+                  search: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over all datasets of the primary database matching the given criteria. Unlike find_datasets(),
+    the result is not limited to a page and is read batch-wise while iterating, so it suits bulk operations.
+    Each dataset is given as dictionary with its "id" and the fields named in *projection*, by default "path".
+    Pass *search* as True only for read-only operations, which may then read from the search replicas.
+    """
+    query = _new_dataset_query(expr=expr, region=region, time=time, wdepth=wdepth, mtype=mtype, wlmode=wlmode,
+                               shallow=shallow, pmode=pmode, pgroup=pgroup, status=status,
+                               submission_id=submission_id, pname=pname, user_id=user_id)
+    return ctx.db_driver.instance().iter_datasets(query, projection=projection, search=search)
+
+
+def get_dataset_tile(ctx: WsContext,
+                     z: int,
+                     x: int,
+                     y: int,
+                     expr: str = None,
+                     region: List[float] = None,
+                     time: List[str] = None,
+                     wdepth: List[float] = None,
+                     mtype: str = 'all',
+                     wlmode: str = 'all',
+                     shallow: str = 'no',
+                     pmode: str = 'contains',
+                     pgroup: List[str] = None,
+                     status: str = None,
+                     submission_id: str = None,
+                     pname: List[str] = None,
+                     user_id: str = None) -> Dict[str, Any]:
+    """
+    Get the locations of the datasets matching the given criteria within map tile *z*/*x*/*y*,
+    aggregated into clusters with their numbers of locations and datasets.
+    """
+    if not 0 <= z <= TILE_INDEX_ZOOM:
+        raise WsBadRequestError(f"Zoom level must be in the range 0 to {TILE_INDEX_ZOOM}")
+    if not (0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        raise WsBadRequestError(f"Tile {z}/{x}/{y} does not exist")
+    query = _new_dataset_query(expr=expr, region=region, time=time, wdepth=wdepth, mtype=mtype, wlmode=wlmode,
+                               shallow=shallow, pmode=pmode, pgroup=pgroup, status=status,
+                               submission_id=submission_id, pname=pname, user_id=user_id)
+
+    def compute_tile():
+        quadkey = tile_to_quadkey(z, x, y)
+        datasets = []
+        for db_driver in ctx.db_drivers:
+            datasets.extend(db_driver.instance().find_tile_counts(query, quadkey))
+        clusters = cluster_tiles(datasets, quadkey, min(z + TILE_CLUSTER_ZOOM_OFFSET, TILE_INDEX_ZOOM))
+        return dict(z=z, x=x, y=y, total_count=len(datasets), clusters=clusters)
+
+    key = (z, x, y) + tuple(tuple(value) if isinstance(value, list) else value
+                            for value in (expr, region, time, wdepth, mtype, wlmode, shallow, pmode, pgroup,
+                                          status, submission_id, pname, user_id))
+    return ctx.get_tile(key, compute_tile)
+
+
+def _new_dataset_query(expr: Optional[str],
+                       region: Optional[List[float]],
+                       time: Optional[List[str]],
+                       wdepth: Optional[List[float]],
+                       mtype: str,
+                       wlmode: str,
+                       shallow: str,
+                       pmode: str,
+                       pgroup: Optional[List[str]],
+                       status: Optional[str],
+                       submission_id: Optional[str],
+                       pname: Optional[List[str]],
+                       user_id: Optional[str]) -> DatasetQuery:
     assert_one_of(wlmode, ['all', 'multispectral', 'hyperspectral'], name='wlmode')
     assert_one_of(shallow, ['no', 'yes', 'exclusively'], name='shallow')
     assert_one_of(pmode, ['contains', 'same_cruise', 'dont_apply'], name='pmode')
@@ -74,19 +199,82 @@ def find_datasets(ctx: WsContext,
     query.submission_id = submission_id
     query.status = status
     query.pname = pname
-    query.geojson = geojson
-    query.offset = offset
-    query.count = count
     query.user_id = user_id
+    return query
+
+
+def _find_datasets_federated(ctx: WsContext,
+                             query: DatasetQuery,
+                             db_driver_timeouts: List[Tuple[DbDriver, float]]) -> DatasetQueryResult:
+    """
+    Search all databases concurrently and merge their results, which are ordered by path and ID,
+    in relevance mode by descending score first.
+    Each database delivers the first offset + count results, so the requested page can be cut
+    from the merged results. Databases that fail or time out are left out, unless all of them do.
+    The drivers abandon searches that exceed their timeout themselves, because a running search cannot
+    be cancelled and would otherwise keep occupying a worker of the thread pool.
+    """
+    if query.offset == 0:
+        raise ValueError("Page offset is out of range")
+    start_index = 0 if query.offset is None else query.offset - 1
+    stop_index = start_index + query.count if query.count is not None and query.count >= 0 else None
+
+    driver_query = copy.copy(query)
+    driver_query.offset = 1
+    if stop_index is not None and query.count > 0:
+        driver_query.count = stop_index
+
+    start_time = time.monotonic()
+    futures = [(ctx.thread_pool.submit(_find_datasets_until, db_driver.instance(), driver_query,
+                                       start_time + timeout), db_driver, timeout)
+               for db_driver, timeout in db_driver_timeouts]
+
+    result_parts = []
+    errors = []
+    for future, db_driver, timeout in futures:
+        try:
+            result_parts.append(future.result(timeout=max(0., start_time + timeout - time.monotonic())))
+        except concurrent.futures.TimeoutError as e:
+            _LOG.warning(f"{type(db_driver).__name__}: search timed out after {timeout} seconds")
+            errors.append(e)
+        except Exception as e:
+            _LOG.warning(f"{type(db_driver).__name__}: search failed: {e}")
+            errors.append(e)
+
+    if errors and not result_parts:
+        raise errors[0]
+
+    total_count = sum(result_part.total_count for result_part in result_parts)
+    if query.count == 0:
+        return DatasetQueryResult({}, total_count, [], query)
+
+    merged_datasets = heapq.merge(*[result_part.datasets for result_part in result_parts],
+                                  key=_dataset_score_key if query.sort == 'relevance' else _dataset_sort_key)
+    datasets = list(itertools.islice(merged_datasets, start_index, stop_index))
+
+    all_locations = {}
+    for result_part in result_parts:
+        all_locations.update(result_part.locations)
+    locations = {ds.id: all_locations[ds.id] for ds in datasets if ds.id in all_locations}
+
+    return DatasetQueryResult(locations, total_count, datasets, query)
+
+
+def _find_datasets_until(db_driver: DbDriver, query: DatasetQuery, deadline: float) -> DatasetQueryResult:
+    # the search may have waited for a free worker, so the driver only gets the time that is left
+    timeout = deadline - time.monotonic()
+    if timeout <= 0.:
+        raise concurrent.futures.TimeoutError()
+    return db_driver.find_datasets(query, timeout=timeout)
+
 
-    result = DatasetQueryResult({}, 0, [], query)
-    for driver in ctx.db_drivers:
-        result_part = driver.instance().find_datasets(query)
-        result.total_count += result_part.total_count
-        result.datasets += result_part.datasets
-        result.locations.update(result_part.locations)
+def _dataset_sort_key(dataset_ref: DatasetRef):
+    return dataset_ref.path, dataset_ref.id
 
-    return result
+
+def _dataset_score_key(dataset_ref: DatasetRef):
+    # datasets without score have not matched any free-text terms
+    return -(dataset_ref.score or 0.), dataset_ref.path, dataset_ref.id
 
 
 def add_dataset(ctx: WsContext,
@@ -101,6 +289,7 @@ def add_dataset(ctx: WsContext,
     dataset_id = ctx.db_driver.instance().add_dataset(dataset)
     if not dataset_id:
         raise WsBadRequestError(f"Could not add dataset {dataset.path}")
+    ctx.invalidate_tiles()
     return DatasetRef(dataset_id, dataset.path)
 
 
@@ -116,6 +305,7 @@ def update_dataset(ctx: WsContext,
     updated = ctx.db_driver.instance().update_dataset(dataset)
     if not updated:
         raise WsResourceNotFoundError(f"Dataset with ID {dataset.id} not found")
+    ctx.invalidate_tiles()
     return updated
 
 
@@ -127,6 +317,7 @@ def delete_dataset(ctx: WsContext,
     deleted = ctx.db_driver.instance().delete_dataset(dataset_id)
     if not deleted:
         raise WsResourceNotFoundError(f"Dataset with ID {dataset_id} not found")
+    ctx.invalidate_tiles()
     return deleted
 
 
@@ -140,6 +331,80 @@ def get_dataset_by_id_strict(ctx: WsContext,
     raise WsResourceNotFoundError(f"Dataset with ID {dataset_id} not found")
 
 
+def get_dataset_records(ctx: WsContext,
+                        dataset_id: str,
+                        columns: List[str] = None,
+                        offset: int = 0,
+                        count: int = None,
+                        time: List[Optional[str]] = None) -> Tuple[List[str], Iterator[List[List[Dataset.Field]]]]:
+    """
+    Get the names of the selected *columns*, or of all columns, of a dataset and an iterator over batches of
+    its records that contain only these columns. If *time* is given as [start, end], only records measured
+    in this time window are selected. Then *offset* and *count* select a range of the remaining records.
+    Records are read batch-wise, so that only the requested part of the dataset is loaded.
+    """
+    assert_not_none(dataset_id, name='dataset_id')
+    if offset < 0 or (count is not None and count < 0):
+        raise WsBadRequestError("Offset and count must not be negative")
+    db_driver = ctx.db_driver.instance()
+    dataset = db_driver.get_dataset(dataset_id, with_records=False)
+    if dataset is None:
+        raise WsResourceNotFoundError(f"Dataset with ID {dataset_id} not found")
+
+    column_names = list(dataset.attributes)
+    column_indexes = None
+    if columns is not None:
+        unknown_columns = [column for column in columns if column not in column_names]
+        if unknown_columns:
+            raise WsBadRequestError(f"Dataset has no column(s) {', '.join(unknown_columns)}")
+        column_indexes = [column_names.index(column) for column in columns]
+        column_names = list(columns)
+
+    row_indexes = None
+    if time is not None:
+        row_indexes = _get_row_indexes_in_time_window(dataset, time)
+        if row_indexes is not None:
+            row_indexes = row_indexes[offset:] if count is None else row_indexes[offset:offset + count]
+
+    def iter_batches() -> Iterator[List[List[Dataset.Field]]]:
+        if row_indexes is None:
+            start = offset
+            stop = None if count is None else offset + count
+            while stop is None or start < stop:
+                batch_count = RECORDS_BATCH_SIZE if stop is None else min(RECORDS_BATCH_SIZE, stop - start)
+                records = db_driver.get_dataset_records(dataset_id, start, batch_count, columns=column_indexes)
+                if not records:
+                    break
+                yield records
+                start += len(records)
+        else:
+            for i in range(0, len(row_indexes), RECORDS_BATCH_SIZE):
+                batch_indexes = row_indexes[i:i + RECORDS_BATCH_SIZE]
+                start = batch_indexes[0]
+                records = db_driver.get_dataset_records(dataset_id, start, batch_indexes[-1] + 1 - start,
+                                                        columns=column_indexes)
+                yield [records[index - start] for index in batch_indexes]
+
+    return column_names, iter_batches()
+
+
+def _get_row_indexes_in_time_window(dataset: Dataset, time: List[Optional[str]]) -> Optional[List[int]]:
+    """
+    Get the indexes of the records of *dataset* measured within the time window *time*.
+    Returns None, if the dataset has a single time within the window, so that all records are selected.
+    """
+    try:
+        start_time, end_time = [TimeHelper.parse_datetime(t) if t else None for t in time]
+    except (ValueError, TypeError):
+        raise WsBadRequestError(f"Invalid time window: {time}")
+    times = [TimeHelper.parse_datetime(t) if isinstance(t, str) else t for t in dataset.times]
+    row_indexes = [i for i, t in enumerate(times)
+                   if (start_time is None or start_time <= t) and (end_time is None or t <= end_time)]
+    if len(times) == 1 and row_indexes:
+        return None
+    return row_indexes
+
+
 def get_dataset_by_id(ctx: WsContext,
                       dataset_id: str) -> Dataset:
     """Get dataset by ID."""
@@ -178,7 +443,9 @@ def get_dataset_by_name(ctx: WsContext,
 def get_dataset_qc_info(ctx: WsContext,
                         dataset_id: str) -> QcInfo:
     assert_not_none(dataset_id, name='dataset_id')
-    dataset = ctx.db_driver.get_dataset(dataset_id)
+    dataset = ctx.db_driver.get_dataset(dataset_id, with_records=False)
+    if dataset is None:
+        raise WsResourceNotFoundError(f"Dataset with ID {dataset_id} not found")
     qc_info_dict = dataset.metadata.get("qc_info")
     return QcInfo.from_dict(qc_info_dict) if qc_info_dict else QcInfo(QC_STATUS_SUBMITTED)
 
@@ -188,6 +455,6 @@ def set_dataset_qc_info(ctx: WsContext,
                         dataset_id: str,
                         qc_info: QcInfo):
     assert_not_none(dataset_id, name='dataset_id')
-    dataset = ctx.db_driver.get_dataset(dataset_id)
-    dataset.metadata["qc_info"] = qc_info.to_dict()
-    ctx.db_driver.update_dataset(dataset)
+    if not ctx.db_driver.update_dataset_qc_info(dataset_id, qc_info):
+        raise WsResourceNotFoundError(f"Dataset with ID {dataset_id} not found")
+    ctx.invalidate_tiles()
@@ -0,0 +1,230 @@
+# The MIT License (MIT)
+# Copyright (c) 2018 by EUMETSAT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import csv
+import io
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..context import WsContext
+from ...core.tracing import trace_phase
+from ...ws.controllers.datasets import iter_datasets, RECORDS_BATCH_SIZE
+from ...ws.errors import WsBadRequestError
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    # Arrow and Parquet exports are not available
+    pyarrow = None
+
+# Export format -> content type
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Columns that identify the origin of each exported record
+PROVENANCE_COLUMNS = ['dataset_id', 'cruise', 'station']
+
+
+class _DatasetHeader:
+    def __init__(self, dataset_id: str, cruise: Optional[str], station: Optional[str], columns: List[str]):
+        self.dataset_id = dataset_id
+        self.cruise = cruise
+        self.station = station
+        self.columns = columns
+
+
+def export_store_records(ctx: WsContext,
+                         expr: str = None,
+                         region: List[float] = None,
+                         s_time: List[str] = None,
+                         wdepth: List[float] = None,
+                         mtype: str = 'all',
+                         wlmode: str = 'all',
+                         shallow: str = 'no',
+                         pmode: str = 'contains',
+                         pgroup: List[str] = None,
+                         pname: List[str] = None,
+                         status: str = None,
+                         user_id: str = None,
+                         fmt: str = 'csv') -> Iterator[bytes]:
+    """
+    Export the records of all datasets matching the query as one table in format *fmt*, one of
+    EXPORT_FORMATS. The table's columns are the PROVENANCE_COLUMNS followed by the union of the
+    columns of the datasets. The export is generated incrementally as a sequence of byte chunks.
+    Only the headers of the datasets are held in memory, records are read batch-wise.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise WsBadRequestError(f"Format must be one of {', '.join(EXPORT_FORMATS)}")
+    if fmt in ('arrow', 'parquet') and pyarrow is None:
+        raise WsBadRequestError(f"Format {fmt} is not available, it requires the pyarrow package")
+
+    db_driver = ctx.db_driver.instance()
+    headers = []
+    columns = []
+    column_set = set()
+    with trace_phase('db'):
+        for dataset in iter_datasets(ctx, expr=expr, region=region, time=s_time, wdepth=wdepth, mtype=mtype,
+                                     wlmode=wlmode, shallow=shallow, pmode=pmode, pgroup=pgroup, pname=pname,
+                                     status=status, user_id=user_id,
+                                     projection=["metadata.cruise", "metadata.station", "attributes"],
+                                     search=True):
+            metadata = dataset.get('metadata') or {}
+            attributes = dataset.get('attributes') or []
+            headers.append(_DatasetHeader(dataset['id'], metadata.get('cruise'), metadata.get('station'),
+                                          attributes))
+            for column in attributes:
+                if column not in column_set:
+                    column_set.add(column)
+                    columns.append(column)
+
+    batches = _iter_record_batches(db_driver, headers, columns)
+    if fmt == 'csv':
+        return _write_csv(columns, batches)
+    if fmt == 'jsonl':
+        return _write_json_lines(columns, batches)
+    # the types are determined by a first pass over the records, once the export is being streamed
+    return _write_arrow(columns, _iter_record_batches(db_driver, headers, columns), batches, fmt)
+
+
+def _iter_record_batches(db_driver, headers: List[_DatasetHeader], columns: List[str]) \
+        -> Iterator[Tuple[_DatasetHeader, List[List[Any]]]]:
+    """Generate batches of records of the datasets, each record having a value or None for all *columns*."""
+    for header in headers:
+        column_indexes = {column: i for i, column in enumerate(header.columns)}
+        indexes = [column_indexes.get(column) for column in columns]
+        offset = 0
+        while True:
+            records = db_driver.get_dataset_records(header.dataset_id, offset, RECORDS_BATCH_SIZE)
+            if not records:
+                break
+            yield header, [[record[i] if i is not None and i < len(record) else None for i in indexes]
+                           for record in records]
+            offset += len(records)
+
+
+def _write_csv(columns: List[str], batches) -> Iterator[bytes]:
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator='\n')
+    writer.writerow(PROVENANCE_COLUMNS + columns)
+    for header, records in batches:
+        provenance = [header.dataset_id, header.cruise, header.station]
+        writer.writerows(provenance + record for record in records)
+        yield text.getvalue().encode('utf-8')
+        text.seek(0)
+        text.truncate()
+    yield text.getvalue().encode('utf-8')
+
+
+def _write_json_lines(columns: List[str], batches) -> Iterator[bytes]:
+    for header, records in batches:
+        provenance = dict(dataset_id=header.dataset_id, cruise=header.cruise, station=header.station)
+        lines = []
+        for record in records:
+            record_dict = dict(provenance)
+            record_dict.update((column, value) for column, value in zip(columns, record) if value is not None)
+            lines.append(json.dumps(record_dict) + '\n')
+        yield ''.join(lines).encode('utf-8')
+
+
+def _get_column_types(columns: List[str], batches) -> Dict[str, str]:
+    """
+    Get the type, "float" or "string", of each of the *columns* from all records of the *batches*.
+    A column is of type "float", if all its values are numbers, so that no value is lost by the conversion.
+    """
+    float_indexes = set(range(len(columns)))
+    for header, records in batches:
+        for i in list(float_indexes):
+            if not all(_is_number(record[i]) for record in records):
+                float_indexes.discard(i)
+        if not float_indexes:
+            break
+    return {column: 'float' if i in float_indexes else 'string' for i, column in enumerate(columns)}
+
+
+def _is_number(value) -> bool:
+    return value is None or (isinstance(value, (int, float)) and not isinstance(value, bool))
+
+
+def _write_arrow(columns: List[str], type_batches, batches, fmt: str) -> Iterator[bytes]:
+    column_types = _get_column_types(columns, type_batches)
+    fields = [pyarrow.field(column, pyarrow.string()) for column in PROVENANCE_COLUMNS]
+    fields += [pyarrow.field(column, pyarrow.float64() if column_types[column] == 'float' else pyarrow.string())
+               for column in columns]
+    schema = pyarrow.schema(fields)
+
+    sink = _ChunkSink()
+    if fmt == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+    try:
+        for header, records in batches:
+            arrays = [pyarrow.array([value] * len(records), type=pyarrow.string())
+                      for value in (header.dataset_id, header.cruise, header.station)]
+            for i, column in enumerate(columns):
+                values = [record[i] for record in records]
+                if column_types[column] == 'float':
+                    arrays.append(pyarrow.array([None if value is None else float(value) for value in values],
+                                                type=pyarrow.float64()))
+                else:
+                    arrays.append(pyarrow.array([None if value is None else str(value) for value in values],
+                                                type=pyarrow.string()))
+            batch = pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+            if fmt == 'parquet':
+                writer.write_table(pyarrow.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+class _ChunkSink(io.RawIOBase):
+    """A write-only file that hands out the bytes written so far, but keeps track of the total position."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
@@ -26,6 +26,7 @@ from typing import Dict
 import yaml
 
 from ..context import WsContext
+from ...core.metrics import REGISTRY, Gauge, MetricsRegistry
 
 
 # noinspection PyUnusedLocal
@@ -33,3 +34,25 @@ def get_service_info(ctx: WsContext) -> Dict:
     file = os.path.join(os.path.dirname(__file__), "..", "res", "openapi.yml")
     with open(file) as fp:
         return yaml.load(fp)
+
+
+def get_metrics(ctx: WsContext) -> str:
+    """Get the process' metrics in the Prometheus text exposition format."""
+    # Current state is sampled on each scrape rather than tracked continuously
+    registry = MetricsRegistry()
+    queue_depth = Gauge('ocdb_executor_queue_depth', 'Number of tasks waiting for an executor thread.',
+                        registry=registry)
+    # noinspection PyProtectedMember
+    queue_depth.set(ctx.thread_pool._work_queue.qsize())
+
+    pool_metrics = Gauge('ocdb_mongo_pool_connections', 'Connections of MongoDB connection pools.',
+                         label_names=('driver', 'state'), registry=registry)
+    for index, db_driver in enumerate(ctx.db_drivers):
+        driver_pool_metrics = getattr(db_driver.instance(), 'pool_metrics', None)
+        if not driver_pool_metrics:
+            continue
+        driver = f'{index}:{type(db_driver.instance()).__name__}'
+        for state in ('connections_open', 'connections_in_use', 'max_pool_size'):
+            pool_metrics.set(driver_pool_metrics.get(state, 0), driver=driver, state=state)
+
+    return REGISTRY.to_text() + registry.to_text()
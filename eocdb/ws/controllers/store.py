@@ -20,29 +20,34 @@
 # SOFTWARE.
 import datetime
 import io
+import itertools
 import os
 import tempfile
 import time
 import zipfile
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from eocdb.core.roles import Roles
 from ..context import WsContext, _LOG
 from ...core.asserts import assert_not_none
+from ...core.db.db_driver import SUBMISSION_SORT_FIELDS
 from ...core.db.db_submission import DbSubmission
-from ...core.models import DatasetRef, DatasetQueryResult, DatasetQuery, DATASET_VALIDATION_RESULT_STATUS_OK, \
-    DATASET_VALIDATION_RESULT_STATUS_WARNING, QC_STATUS_SUBMITTED, QC_STATUS_VALIDATED, \
-    QC_STATUS_PUBLISHED, QC_STATUS_CANCELED, QC_STATUS_PROCESSED, User
+from ...core.models import DATASET_VALIDATION_RESULT_STATUS_OK, DATASET_VALIDATION_RESULT_STATUS_WARNING, \
+    QC_STATUS_SUBMITTED, QC_STATUS_VALIDATED, QC_STATUS_PUBLISHED, QC_STATUS_CANCELED, QC_STATUS_PROCESSED, User
 from ...core.models.dataset_validation_result import DatasetValidationResult, DATASET_VALIDATION_RESULT_STATUS_ERROR
 from ...core.models.issue import Issue, ISSUE_TYPE_ERROR
 from ...core.models.submission import Submission, TYPE_MEASUREMENT, TYPE_DOCUMENT
 from ...core.models.submission_file import SubmissionFile
 from ...core.models.uploaded_file import UploadedFile
 from ...core.seabass.sb_file_reader import SbFileReader, SbFormatError
+from ...core.tracing import trace_phase
 from ...core.val import validator
 from ...db.static_data import get_product_groups, get_products
-from ...ws.controllers.datasets import find_datasets, get_dataset_by_id, delete_dataset
-from ...ws.errors import WsBadRequestError
+from ...ws.controllers.datasets import iter_datasets, delete_dataset
+from ...ws.errors import WsBadRequestError, WsConflictError, WsResourceNotFoundError
+
+# Number of validation issues returned by get_submission_file_issues() by default
+ISSUES_PAGE_SIZE = 100
 
 
 # noinspection PyUnusedLocal
@@ -174,10 +179,8 @@ def delete_submission(ctx: WsContext, submission_id: str) -> bool:
     ##for file in submission.files:
     #    _delete_submission_file(ctx=ctx, file_to_delete=file, submission=submission)
 
-    result = find_datasets(ctx=ctx, submission_id=submission_id)
-
-    for ds in result.datasets:
-        delete_dataset(ctx=ctx, dataset_id=ds.id)
+    for ds in iter_datasets(ctx=ctx, submission_id=submission_id):
+        delete_dataset(ctx=ctx, dataset_id=ds["id"])
 
     return ctx.db_driver.delete_submission(submission_id)
 
@@ -194,40 +197,55 @@ def update_submission(ctx: WsContext, submission: DbSubmission, status: str, pub
 
     if status == QC_STATUS_PUBLISHED or status == QC_STATUS_PROCESSED:
         submission.publication_date = publication_date
-        result = find_datasets(ctx=ctx, submission_id=submission.submission_id)
-
-        for ds in result.datasets:
-            delete_dataset(ctx=ctx, dataset_id=ds.id)
+        for ds in iter_datasets(ctx=ctx, submission_id=submission.submission_id):
+            delete_dataset(ctx=ctx, dataset_id=ds["id"])
 
         _publish_submission(ctx, submission, status)
 
     if status == QC_STATUS_CANCELED:
-        result = find_datasets(ctx=ctx, submission_id=submission.submission_id)
+        for ds in iter_datasets(ctx=ctx, submission_id=submission.submission_id):
+            delete_dataset(ctx=ctx, dataset_id=ds["id"])
 
-        for ds in result.datasets:
-            delete_dataset(ctx=ctx, dataset_id=ds.id)
-
-    return ctx.db_driver.update_submission(submission)
+    return ctx.db_driver.update_submission_fields(submission, ["status", "publication_date"])
 
 
 def get_submissions(ctx: WsContext, user: User) -> List[Submission]:
-    roles = []
-    # user = ctx.get_user(user.name)
+    return find_submissions(ctx, user)[1]
+
+
+def find_submissions(ctx: WsContext,
+                     user: User,
+                     user_id: str = None,
+                     status: str = None,
+                     sort_by: str = "date",
+                     order: str = "asc",
+                     offset: int = 0,
+                     count: int = None) -> Tuple[int, List[Submission]]:
+    """
+    Get the total number of submissions matching *user_id* and *status* and a page of them, sorted by *sort_by*
+    in *order*, "asc" or "desc". Admins may see the submissions of all users, other users only their own ones.
+    """
+    if sort_by not in SUBMISSION_SORT_FIELDS:
+        raise WsBadRequestError(f"Sort field must be one of {', '.join(SUBMISSION_SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise WsBadRequestError("Sort order must be asc or desc")
+    if offset < 0:
+        raise WsBadRequestError("Offset must not be negative")
+    if count is not None and count < 0:
+        raise WsBadRequestError("Count must not be negative")
 
+    roles = []
     if user is not None and user.roles is not None:
         roles = user.roles
 
-    if Roles.is_admin(roles):
-        result = ctx.db_driver.get_submissions()
-    else:
-        result = ctx.db_driver.get_submissions_for_user(user.id)
-
-    submissions = []
-    for db_subm in result:
-        subm = db_subm.to_submission()
-        submissions.append(subm)
+    if not Roles.is_admin(roles):
+        if user_id is not None and user_id != user.id:
+            return 0, []
+        user_id = user.id
 
-    return submissions
+    total_count, result = ctx.db_driver.find_submissions(user_id=user_id, status=status, sort_by=sort_by,
+                                                         descending=order == "desc", offset=offset, count=count)
+    return total_count, [db_subm.to_submission() for db_subm in result]
 
 
 def get_submission(ctx: WsContext, submission_id: str) -> Optional[DbSubmission]:
@@ -241,6 +259,23 @@ def get_submission_file(ctx: WsContext,
     return result
 
 
+def get_submission_file_issues(ctx: WsContext,
+                               submission_id: str,
+                               index: int,
+                               offset: int = 0,
+                               count: int = ISSUES_PAGE_SIZE) -> Dict[str, Any]:
+    """Get a page of the validation issues of a submission file together with their total number."""
+    if offset < 0:
+        raise WsBadRequestError("Offset must not be negative")
+    if count is not None and count < 0:
+        raise WsBadRequestError("Count must not be negative")
+    result = ctx.db_driver.get_submission_file_issues(submission_id, index, offset=offset, count=count)
+    if result is None:
+        raise WsResourceNotFoundError(f"Submission file {index} of submission {submission_id} not found")
+    total_count, issues = result
+    return dict(total_count=total_count, offset=offset, issues=[issue.to_dict() for issue in issues])
+
+
 def update_submission_files(ctx: WsContext,
                             path: str,
                             store_sub_path: str,
@@ -268,6 +303,15 @@ def update_submission_files(ctx: WsContext,
     old_path = submission.path.split('/')
     new_path = path.split('/')
 
+    submission.submission_id = new_submission_id
+    submission.path = path
+    submission.store_sub_path = store_sub_path
+    submission.publication_date = publication_date
+    submission.allow_publication = allow_publication
+
+    if not ctx.db_driver.update_submission(submission):
+        raise WsConflictError(f"Submission {submission_id} has been changed meanwhile, please try again")
+
     import shutil
     if old_path[0] != new_path[0]:
         shutil.move(os.path.join(submission_path, old_path[0]), os.path.join(submission_path, new_path[0]))
@@ -280,15 +324,6 @@ def update_submission_files(ctx: WsContext,
         shutil.move(os.path.join(submission_path, old_path[0], old_path[1], old_path[2]),
                     os.path.join(submission_path, new_path[0], new_path[1], new_path[2]))
 
-    submission.submission_id = new_submission_id
-    submission.path = path
-    submission.store_sub_path = store_sub_path
-    submission.publication_date = publication_date
-    submission.allow_publication = allow_publication
-
-    ctx.db_driver.delete_submission(submission_id)
-    ctx.db_driver.add_submission(submission)
-
     return True
 
 
@@ -336,7 +371,8 @@ def update_submission_file(ctx: WsContext, submission: DbSubmission,
 
     _update_validation_status(submission)
 
-    result = ctx.db_driver.update_submission(submission)
+    # the submission status depends on the status of all files, so it must not have changed meanwhile
+    result = ctx.db_driver.update_submission_fields(submission, [f"files.{index}", "status"], check_version=True)
     if not result:
         return DatasetValidationResult(DATASET_VALIDATION_RESULT_STATUS_ERROR,
                                        [Issue(ISSUE_TYPE_ERROR, "Database access error")])
@@ -347,15 +383,18 @@ def update_submission_file(ctx: WsContext, submission: DbSubmission,
 def delete_submission_file(ctx: WsContext, submission: DbSubmission, index: int) -> bool:
     file_to_delete = submission.files[index]
 
-    _delete_submission_file(ctx, file_to_delete, submission)
-
     del submission.files[index]
     new_index = 0
     for file_ref in submission.files:
         file_ref.index = new_index
         new_index += 1
 
-    return ctx.db_driver.update_submission(submission)
+    # the indexes of the following files shift, so the submission must not have changed meanwhile
+    if not ctx.db_driver.update_submission(submission):
+        raise WsConflictError(f"Submission {submission.submission_id} has been changed meanwhile, please try again")
+
+    _delete_submission_file(ctx, file_to_delete, submission)
+    return True
 
 
 def _delete_submission_file(ctx, file_to_delete, submission):
@@ -379,7 +418,7 @@ def _delete_submission(ctx, submission):
 def update_submission_file_status(ctx: WsContext, submission: DbSubmission, index: int, status: str) -> bool:
     submission.files[index].status = status
 
-    return ctx.db_driver.update_submission(submission)
+    return ctx.db_driver.update_submission_fields(submission, [f"files.{index}.status"])
 
 
 # noinspection PyTypeChecker
@@ -395,42 +434,47 @@ def download_store_files(ctx: WsContext,
                          pgroup: List[str] = None,
                          pname: List[str] = None,
                          docs: bool = False) -> zipfile.ZipFile:
-    result = find_datasets(ctx,
-                           expr=expr,
-                           region=region,
-                           time=s_time,
-                           wdepth=wdepth,
-                           mtype=mtype,
-                           wlmode=wlmode,
-                           shallow=shallow,
-                           pmode=pmode,
-                           pgroup=pgroup,
-                           pname=pname,
-                           geojson=False)
-
-    if result.total_count < 1:
+    with trace_phase('db'):
+        datasets = iter_datasets(ctx,
+                                 expr=expr,
+                                 region=region,
+                                 time=s_time,
+                                 wdepth=wdepth,
+                                 mtype=mtype,
+                                 wlmode=wlmode,
+                                 shallow=shallow,
+                                 pmode=pmode,
+                                 pgroup=pgroup,
+                                 pname=pname,
+                                 projection=["path", "metadata.documents"],
+                                 search=True)
+        first_dataset = next(datasets, None)
+
+    if first_dataset is None:
         # @todo 2 tb/tb is this correct? Or raise exception? 2018-12-13
         return None
 
-    return _assemble_zip_archive(ctx, docs, result)
+    return _assemble_zip_archive(ctx, docs, itertools.chain([first_dataset], datasets))
 
 
 # noinspection PyTypeChecker
 def download_store_files_by_id(ctx: WsContext,
                                dataset_ids: List[str] = None,
                                docs: bool = False) -> zipfile.ZipFile:
-    result_list = []
-    for dsId in dataset_ids:
-        dataset_ref = DatasetRef(dsId, "fake_path")
-        result_list.append(dataset_ref)
-
-    result = DatasetQueryResult(locations={}, total_count=len(result_list), datasets=result_list, query=DatasetQuery())
-
-    if result.total_count < 1:
+    if not dataset_ids:
         # @todo 2 tb/tb is this correct? Or raise exception? 2018-12-13
         return None
 
-    return _assemble_zip_archive(ctx, docs, result)
+    return _assemble_zip_archive(ctx, docs, _get_datasets_by_id(ctx, dataset_ids))
+
+
+def _get_datasets_by_id(ctx: WsContext, dataset_ids: List[str]) -> Iterator[Dict[str, Any]]:
+    """Get the existing datasets with the given IDs in the form of DbDriver.iter_datasets(), without records."""
+    for dataset_id in dataset_ids:
+        with trace_phase('db'):
+            dataset = ctx.db_driver.instance().get_dataset(dataset_id, with_records=False)
+        if dataset is not None:
+            yield dict(id=dataset_id, path=dataset.path, metadata=dataset.metadata)
 
 
 # noinspection PyTypeChecker
@@ -465,28 +509,28 @@ def _assemble_submission_file_zip_archive(ctx, submission_file: SubmissionFile,
     return zip_file
 
 
-def _assemble_zip_archive(ctx, docs, result):
+def _assemble_zip_archive(ctx, docs, datasets: Iterable[Dict[str, Any]]):
+    """Write the files of *datasets*, given by their "path" and "metadata", into a new ZIP file."""
     tmp_dir = tempfile.gettempdir()
     zip_name = create_zip_file_name()
     zip_file_path = os.path.join(tmp_dir, zip_name)
     with zipfile.ZipFile(zip_file_path, "w") as zip_file:
-        for dataset_ref in result.datasets:
-            dataset = get_dataset_by_id(ctx, dataset_ref.id)
-            if dataset is None:
-                continue
-
-            full_file_path = os.path.join(ctx.store_path, dataset.path)
-            zip_file.write(full_file_path, dataset.path)
+        for dataset in datasets:
+            dataset_path = dataset["path"]
+            full_file_path = os.path.join(ctx.store_path, dataset_path)
+            with trace_phase('zip'):
+                zip_file.write(full_file_path, dataset_path)
 
             if not docs:
                 continue
 
-            if "documents" in dataset.metadata:
-                doc_root_path = get_document_root_path(dataset.path)
+            metadata = dataset.get("metadata") or {}
+            if "documents" in metadata:
+                doc_root_path = get_document_root_path(dataset_path)
                 doc_archive_path = ctx.get_doc_files_store_path(doc_root_path)
                 zip_store_path = os.path.join(doc_root_path, "documents")
 
-                documents_string = dataset.metadata["documents"]
+                documents_string = metadata["documents"]
                 document_names = documents_string.split(",")
                 for document_name in document_names:
                     document_path = os.path.join(doc_archive_path, document_name)
@@ -578,5 +622,6 @@ def _publish_submission(ctx: WsContext, submission: DbSubmission, status) -> boo
 
     for dataset in datasets:
         ctx.db_driver.add_dataset(dataset)
+    ctx.invalidate_tiles()
 
     return True
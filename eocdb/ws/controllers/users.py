@@ -53,6 +53,7 @@ def create_user(ctx: WsContext,
         raise WsBadRequestError(f"User exists:  {user.name}")
 
     user_id = ctx.db_driver.instance().add_user(user)
+    ctx.invalidate_user(user.name)
     if not user_id:
         raise WsBadRequestError(f"Could not add user {user.name}")
 
@@ -85,6 +86,8 @@ def update_user(ctx: WsContext,
                 data: User):
     assert_not_none(user_name, name='user_name')
     updated = ctx.db_driver.instance().update_user(data)
+    ctx.invalidate_user(user_name)
+    ctx.invalidate_user(data.name)
 
     if not updated:
         raise WsBadRequestError(f"Could not update user {data.name}")
@@ -97,6 +100,7 @@ def delete_user(ctx: WsContext,
                 user_name: str):
     assert_not_none(user_name, name='user_name')
     deleted = ctx.db_driver.instance().delete_user(user_name)
+    ctx.invalidate_user(user_name)
 
     if not deleted:
         raise WsBadRequestError(f"Could not delete user {user_name}")
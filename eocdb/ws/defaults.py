@@ -32,4 +32,27 @@ DEFAULT_LOG_PREFIX = os.path.abspath(DEFAULT_SERVER_NAME + '.log')
 
 DEFAULT_MAX_THREAD_COUNT = None
 
+# Time in seconds a database driver may take to answer a search spanning multiple databases
+DEFAULT_SEARCH_TIMEOUT = 30.
+
+# Time in seconds users and their roles are cached, a value <= 0 disables the cache
+DEFAULT_USER_CACHE_TTL = 10.
+
+# Time in seconds map tiles of clustered dataset locations are cached, a value <= 0 disables the cache
+DEFAULT_TILE_CACHE_TTL = 300.
+
+# Maximum number of cached map tiles
+DEFAULT_TILE_CACHE_SIZE = 4096
+
+# Minimum size in bytes of responses that are gzip-compressed, if the client accepts it
+DEFAULT_COMPRESS_MIN_LENGTH = 1024
+
+# Whether requests are traced, can be overridden by the "trace_perf" setting
 TRACE_PERF = False
+
+# Time in seconds after which a traced request is logged as slow
+DEFAULT_SLOW_REQUEST_THRESHOLD = 1.
+
+# Name of the directory within the log directory that receives request profiles,
+# can be overridden by the "profile_dir" setting
+DEFAULT_PROFILE_DIR_NAME = 'profiles'
@@ -67,6 +67,15 @@ class WsResourceNotFoundError(WsError):
         super().__init__(reason, status_code=404, log_message=log_message)
 
 
+class WsConflictError(WsError):
+    """
+    409 - Conflict.
+    """
+
+    def __init__(self, reason: str, log_message: str = None):
+        super().__init__(reason, status_code=409, log_message=log_message)
+
+
 class WsNotImplementedError(WsError):
     """
     501 - Not Implemented.
@@ -18,7 +18,11 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+import csv
+import io
+import json
 from time import strptime
+from typing import Any, Iterator, List
 
 import tornado.escape
 import tornado.httputil
@@ -27,18 +31,25 @@ from eocdb.core.db.db_user import DbUser
 from eocdb.ws.controllers.links import get_links, update_links
 from ..controllers.datasets import *
 from ..controllers.docfiles import *
+from ..controllers.export import *
 from ..controllers.service import *
 from ..controllers.store import *
 from ..controllers.users import *
 from ..webservice import WsRequestHandler
 from ...core.models.dataset_ids import DatasetIds
 from ...core.models.user import User
+from ...core.metrics import Counter
+from ...core.tracing import trace_phase
+
+_ZIP_BYTES_STREAMED = Counter('ocdb_zip_bytes_streamed_total', 'Number of bytes of zip archives sent to clients.')
 
 MTYPE_DEFAULT = 'all'
 WLMODE_DEFAULT = 'all'
 SHALLOW_DEFAULT = 'no'
 PMODE_DEFAULT = 'contains'
 
+RECORDS_CONTENT_TYPES = {'jsonl': 'application/x-ndjson', 'csv': 'text/csv'}
+
 
 # noinspection PyAbstractClass
 class ServiceInfo(WsRequestHandler):
@@ -50,11 +61,22 @@ class ServiceInfo(WsRequestHandler):
         self.finish(tornado.escape.json_encode(result))
 
 
+# noinspection PyAbstractClass
+class Metrics(WsRequestHandler):
+
+    def get(self):
+        """Provide the service's metrics in the Prometheus text exposition format."""
+        result = get_metrics(self.ws_context)
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.finish(result)
+
+
 # noinspection PyAbstractClass
 class StoreInfo(WsRequestHandler):
 
     def get(self):
         """Provide API operation getStoreInfo()."""
+        # the store info is static, so it is validated by the ETag tornado derives from the body
         result = get_store_info(self.ws_context)
         self.set_header('Content-Type', 'application/json')
         self.finish(tornado.escape.json_encode(result))
@@ -78,7 +100,7 @@ class StoreUploadSubmission(WsRequestHandler):
                                               arguments,
                                               files)
 
-        user = self.ws_context.get_user(user_name)
+        user = self.get_user(user_name)
 
         if user is not None:
             user_id = user.id
@@ -173,7 +195,7 @@ class StoreUploadSubmission(WsRequestHandler):
             self.set_status(status_code=403, reason='Not enough access rights to perform operation.')
             return
 
-        user = self.ws_context.get_user(user_name)
+        user = self.get_user(user_name)
 
         if user is not None:
             user_id = user.id
@@ -242,6 +264,7 @@ class StoreDownloadSubmissionFile(WsRequestHandler):
                 if not data:
                     break
                 self.write(data)
+                _ZIP_BYTES_STREAMED.inc(len(data))
 
 
 # noinspection PyAbstractClass,PyShadowingBuiltins
@@ -295,12 +318,20 @@ class StoreUploadUser(WsRequestHandler):
                 self.set_status(status_code=403, reason='Not enough access rights to perform operation.')
                 return
 
-        user = self.ws_context.get_user(user_name)
+        user = self.get_user(user_name)
         if user is None:
             self.set_status(status_code=403, reason='Not enough access rights to perform operation.')
             return
 
-        result = get_submissions(ctx=self.ws_context, user=user)
+        user_id = self.query.get_param('user', default=None)
+        status = self.query.get_param('status', default=None)
+        sort_by = self.query.get_param('sort', default='date')
+        order = self.query.get_param('order', default='asc')
+        offset = self.query.get_param_int('offset', default=0)
+        count = self.query.get_param_int('count', default=None)
+
+        total_count, result = find_submissions(ctx=self.ws_context, user=user, user_id=user_id, status=status,
+                                               sort_by=sort_by, order=order, offset=offset, count=count)
 
         result_list = []
         for submission in result:
@@ -310,6 +341,7 @@ class StoreUploadUser(WsRequestHandler):
                 sub_dict["publication_date"] = sub_dict["publication_date"]
             result_list.append(sub_dict)
 
+        self.set_header('X-Total-Count', str(total_count))
         self.set_header('Content-Type', 'application/json')
         self.finish(tornado.escape.json_encode(result_list))
 
@@ -398,6 +430,37 @@ class StoreUploadSubmissionFile(WsRequestHandler):
             self.set_status(400, reason="Database error")
 
 
+# noinspection PyAbstractClass
+class StoreSubmissionFileIssues(WsRequestHandler):
+
+    def get(self, submission_id: str, index: str):
+        """Provide API operation getSubmissionFileIssues()."""
+        is_admin = self.has_admin_rights()
+        user_name = self.get_current_user()
+        user = self.get_user(user_name) if user_name else None
+        if not (is_admin or user is not None):
+            self.set_status(status_code=403, reason='Not enough access rights to perform operation.')
+            return
+
+        submission = get_submission(ctx=self.ws_context, submission_id=submission_id)
+        if submission is None:
+            self.set_status(404, reason="Submission not found")
+            return
+
+        if not (is_admin or submission.user_id == user.id):
+            self.set_status(status_code=403, reason='Not enough access rights to perform operation.')
+            return
+
+        index = int(index)
+        offset = self.query.get_param_int('offset', default=0)
+        count = self.query.get_param_int('count', default=ISSUES_PAGE_SIZE)
+
+        result = get_submission_file_issues(self.ws_context, submission_id=submission_id, index=index,
+                                            offset=offset, count=count)
+        self.set_header('Content-Type', 'application/json')
+        self.finish(tornado.escape.json_encode(result))
+
+
 # noinspection PyAbstractClass
 class StoreUpdateSubmissionFile(WsRequestHandler):
 
@@ -430,17 +493,18 @@ class StoreDownload(WsRequestHandler):
     def get(self):
         """Provide API operation downloadStoreFiles()."""
         # noinspection PyBroadException,PyUnusedLocal
-        expr = self.query.get_param('expr', default=None)
-        region = self.query.get_param_float_list('region', default=None)
-        s_time = self.query.get_param_list('time', default=None)
-        wdepth = self.query.get_param_float_list('wdepth', default=None)
-        mtype = self.query.get_param('mtype', default=MTYPE_DEFAULT)
-        wlmode = self.query.get_param('wlmode', default=WLMODE_DEFAULT)
-        shallow = self.query.get_param('shallow', default=SHALLOW_DEFAULT)
-        pmode = self.query.get_param('pmode', default=PMODE_DEFAULT)
-        pgroup = self.query.get_param_list('pgroup', default=None)
-        pname = self.query.get_param_list('pname', default=None)
-        docs = self.query.get_param_bool('docs', default=None)
+        with trace_phase('parse'):
+            expr = self.query.get_param('expr', default=None)
+            region = self.query.get_param_float_list('region', default=None)
+            s_time = self.query.get_param_list('time', default=None)
+            wdepth = self.query.get_param_float_list('wdepth', default=None)
+            mtype = self.query.get_param('mtype', default=MTYPE_DEFAULT)
+            wlmode = self.query.get_param('wlmode', default=WLMODE_DEFAULT)
+            shallow = self.query.get_param('shallow', default=SHALLOW_DEFAULT)
+            pmode = self.query.get_param('pmode', default=PMODE_DEFAULT)
+            pgroup = self.query.get_param_list('pgroup', default=None)
+            pname = self.query.get_param_list('pname', default=None)
+            docs = self.query.get_param_bool('docs', default=None)
 
         result = download_store_files(self.ws_context, expr=expr, region=region, s_time=s_time, wdepth=wdepth,
                                       mtype=mtype, wlmode=wlmode, shallow=shallow, pmode=pmode, pgroup=pgroup,
@@ -474,6 +538,44 @@ class StoreDownload(WsRequestHandler):
                 if not data:
                     break
                 self.write(data)
+                _ZIP_BYTES_STREAMED.inc(len(data))
+
+
+# noinspection PyAbstractClass
+class StoreExport(WsRequestHandler):
+
+    async def get(self):
+        """Provide API operation exportStoreRecords()."""
+        with trace_phase('parse'):
+            expr = self.query.get_param('expr', default=None)
+            region = self.query.get_param_float_list('region', default=None)
+            s_time = self.query.get_param_list('time', default=None)
+            wdepth = self.query.get_param_float_list('wdepth', default=None)
+            mtype = self.query.get_param('mtype', default=MTYPE_DEFAULT)
+            wlmode = self.query.get_param('wlmode', default=WLMODE_DEFAULT)
+            shallow = self.query.get_param('shallow', default=SHALLOW_DEFAULT)
+            pmode = self.query.get_param('pmode', default=PMODE_DEFAULT)
+            pgroup = self.query.get_param_list('pgroup', default=None)
+            pname = self.query.get_param_list('pname', default=None)
+            fmt = self.query.get_param('format', default='csv')
+            status = None
+            user_id = None
+
+        if not self.has_admin_rights():
+            if self.has_submit_rights():
+                user = self.get_user(self.get_current_user())
+                user_id = user.id
+            status = 'PUBLISHED'
+
+        chunks = await self.run_in_thread_pool(export_store_records, self.ws_context, expr=expr, region=region,
+                                               s_time=s_time, wdepth=wdepth, mtype=mtype, wlmode=wlmode,
+                                               shallow=shallow, pmode=pmode, pgroup=pgroup, pname=pname,
+                                               status=status, user_id=user_id, fmt=fmt)
+
+        self.set_header('Content-Type', EXPORT_FORMATS[fmt])
+        self.set_header('Content-Disposition', f'attachment; filename=ocdb-export.{fmt}')
+        await self.write_chunks(chunks)
+        self.finish()
 
 
 # noinspection PyAbstractClass
@@ -500,28 +602,32 @@ class Datasets(WsRequestHandler):
     def get(self):
         """Provide API operation findDatasets()."""
         # noinspection PyBroadException,PyUnusedLocal
-        expr = self.query.get_param('expr', default=None)
-        region = self.query.get_param_float_list('region', default=None)
-        tim = self.extract_time()
-        wdepth = self.query.get_param_float_list('wdepth', default=None)
-        submission_id = self.query.get_param('submission_id', default=None)
-        status = self.query.get_param('status', default=None)
-        mtype = self.query.get_param('mtype', default=MTYPE_DEFAULT)
-        wlmode = self.query.get_param('wlmode', default=WLMODE_DEFAULT)
-        shallow = self.query.get_param('shallow', default=SHALLOW_DEFAULT)
-        pmode = self.query.get_param('pmode', default=PMODE_DEFAULT)
-        pgroup = self.query.get_param_list('pgroup', default=None)
-        pname = self.query.get_param_list('pname', default=None)
-        geojson = self.query.get_param_bool('geojson', default=False)
-        offset = self.query.get_param_int('offset', default=None)
-        count = self.query.get_param_int('count', default=None)
-        user_id = self.query.get_param_int('user_id', default=None)
+        with trace_phase('parse'):
+            expr = self.query.get_param('expr', default=None)
+            region = self.query.get_param_float_list('region', default=None)
+            tim = self.extract_time()
+            wdepth = self.query.get_param_float_list('wdepth', default=None)
+            submission_id = self.query.get_param('submission_id', default=None)
+            status = self.query.get_param('status', default=None)
+            mtype = self.query.get_param('mtype', default=MTYPE_DEFAULT)
+            wlmode = self.query.get_param('wlmode', default=WLMODE_DEFAULT)
+            shallow = self.query.get_param('shallow', default=SHALLOW_DEFAULT)
+            pmode = self.query.get_param('pmode', default=PMODE_DEFAULT)
+            pgroup = self.query.get_param_list('pgroup', default=None)
+            pname = self.query.get_param_list('pname', default=None)
+            geojson = self.query.get_param_bool('geojson', default=False)
+            locformat = self.query.get_param('locformat', default=None)
+            maxpoints = self.query.get_param_int('maxpoints', default=None)
+            offset = self.query.get_param_int('offset', default=None)
+            count = self.query.get_param_int('count', default=None)
+            user_id = self.query.get_param_int('user_id', default=None)
+            sort = self.query.get_param('sort', default='path')
 
         if self.has_admin_rights():
             status = status
         elif self.has_submit_rights():
             if status != 'PUBLISHED':
-                user = self.ws_context.get_user(self.get_current_user())
+                user = self.get_user(self.get_current_user())
                 user_id = user.id
 
             status = 'PUBLISHED'
@@ -529,17 +635,21 @@ class Datasets(WsRequestHandler):
             status = 'PUBLISHED'
 
         try:
-            result = find_datasets(self.ws_context, expr=expr, region=region, time=tim, wdepth=wdepth, mtype=mtype,
-                                   wlmode=wlmode, shallow=shallow, pmode=pmode, pgroup=pgroup, pname=pname,
-                                   submission_id=submission_id, status=status,
-                                   offset=offset, count=count, geojson=geojson, user_id=user_id)
+            with trace_phase('db'):
+                result = find_datasets(self.ws_context, expr=expr, region=region, time=tim, wdepth=wdepth,
+                                       mtype=mtype, wlmode=wlmode, shallow=shallow, pmode=pmode, pgroup=pgroup,
+                                       pname=pname, submission_id=submission_id, status=status,
+                                       offset=offset, count=count, geojson=geojson, locformat=locformat,
+                                       maxpoints=maxpoints, user_id=user_id, sort=sort)
         except Exception as e:
             self.set_status(status_code=403, reason=str(e))
             return
 
         # transform result of type DatasetQueryResult into response with mime-type application/json
         self.set_header('Content-Type', 'application/json')
-        self.finish(tornado.escape.json_encode(result.to_dict()))
+        with trace_phase('serialize'):
+            response = tornado.escape.json_encode(result.to_dict())
+        self.finish(response)
 
     def extract_time(self):
         start_time = self.query.get_param('start_time', default=None)
@@ -551,13 +661,57 @@ class Datasets(WsRequestHandler):
         return t
 
 
+# noinspection PyAbstractClass
+class DatasetsTile(Datasets):
+
+    def get(self, z: str, x: str, y: str):
+        """Provide API operation getDatasetsTile()."""
+        with trace_phase('parse'):
+            z, x, y = _to_int_path_args(z=z, x=x, y=y)
+            expr = self.query.get_param('expr', default=None)
+            region = self.query.get_param_float_list('region', default=None)
+            tim = self.extract_time()
+            wdepth = self.query.get_param_float_list('wdepth', default=None)
+            submission_id = self.query.get_param('submission_id', default=None)
+            status = self.query.get_param('status', default=None)
+            mtype = self.query.get_param('mtype', default=MTYPE_DEFAULT)
+            wlmode = self.query.get_param('wlmode', default=WLMODE_DEFAULT)
+            shallow = self.query.get_param('shallow', default=SHALLOW_DEFAULT)
+            pmode = self.query.get_param('pmode', default=PMODE_DEFAULT)
+            pgroup = self.query.get_param_list('pgroup', default=None)
+            pname = self.query.get_param_list('pname', default=None)
+            user_id = self.query.get_param_int('user_id', default=None)
+
+        if not self.has_admin_rights():
+            if self.has_submit_rights() and status != 'PUBLISHED':
+                user = self.get_user(self.get_current_user())
+                user_id = user.id
+            status = 'PUBLISHED'
+
+        with trace_phase('db'):
+            result = get_dataset_tile(self.ws_context, z, x, y, expr=expr, region=region, time=tim, wdepth=wdepth,
+                                      mtype=mtype, wlmode=wlmode, shallow=shallow, pmode=pmode, pgroup=pgroup,
+                                      pname=pname, submission_id=submission_id, status=status, user_id=user_id)
+
+        self.set_header('Content-Type', 'application/json')
+        with trace_phase('serialize'):
+            response = tornado.escape.json_encode(result)
+        self.finish(response)
+
+
 # noinspection PyAbstractClass,PyShadowingBuiltins
 class DatasetsId(WsRequestHandler):
 
     def get(self, id: str):
         """Provide API operation getDatasetById()."""
         dataset_id = id
+        # only published datasets get an ETag, so only they can be answered as not modified
+        if self.finish_if_not_modified('dataset', dataset_id):
+            return
         result = get_dataset_by_id_strict(self.ws_context, dataset_id=dataset_id)
+        if result.status != 'PUBLISHED':
+            self.clear_header('Etag')
+            self.clear_header('Cache-Control')
         # transform result of type Dataset into response with mime-type application/json
         self.set_header('Content-Type', 'application/json')
         self.finish(tornado.escape.json_encode(result.to_dict()))
@@ -584,9 +738,8 @@ class DatasetsSubmissionId(WsRequestHandler):
 
     def delete(self, submissionid: str):
         """Provide API operation deleteDatasets by submission ID()."""
-        result = find_datasets(self.ws_context, submission_id=submissionid)
-        for ds in result.datasets:
-            delete_dataset(ctx=self.ws_context, dataset_id=ds.id)
+        for ds in iter_datasets(self.ws_context, submission_id=submissionid):
+            delete_dataset(ctx=self.ws_context, dataset_id=ds["id"])
 
         self.finish(tornado.escape.json_encode({'message': f'Datasets for {submissionid} deleted'}))
 
@@ -613,6 +766,52 @@ class DatasetsAffilProjectCruiseName(WsRequestHandler):
         self.finish(result)
 
 
+# noinspection PyAbstractClass,PyShadowingBuiltins
+class DatasetsIdRecords(WsRequestHandler):
+
+    async def get(self, id: str):
+        """Provide API operation getDatasetRecords()."""
+        with trace_phase('parse'):
+            columns = self.query.get_param_list('columns', default=None)
+            offset = self.query.get_param_int('offset', default=0)
+            count = self.query.get_param_int('count', default=None)
+            start_time = self.query.get_param('start_time', default=None)
+            end_time = self.query.get_param('end_time', default=None)
+            tim = [start_time, end_time] if start_time is not None or end_time is not None else None
+            fmt = self.query.get_param('format', default='jsonl')
+            if fmt not in RECORDS_CONTENT_TYPES:
+                raise WsBadRequestError(f"Format must be one of {', '.join(RECORDS_CONTENT_TYPES)}")
+
+        column_names, batches = await self.run_in_thread_pool(get_dataset_records, self.ws_context, dataset_id=id,
+                                                              columns=columns, offset=offset, count=count,
+                                                              time=tim)
+
+        self.set_header('Content-Type', RECORDS_CONTENT_TYPES[fmt])
+        if fmt == 'csv':
+            self.set_header('Content-Disposition', f'attachment; filename={id}.csv')
+            await self.write_chunks(_records_to_csv(column_names, batches))
+        else:
+            await self.write_chunks(_records_to_json_lines(column_names, batches))
+        self.finish()
+
+
+def _records_to_csv(column_names: List[str], batches: Iterator[List[List[Any]]]) -> Iterator[str]:
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator='\n')
+    writer.writerow(column_names)
+    for records in batches:
+        writer.writerows(records)
+        yield text.getvalue()
+        text.seek(0)
+        text.truncate()
+    yield text.getvalue()
+
+
+def _records_to_json_lines(column_names: List[str], batches: Iterator[List[List[Any]]]) -> Iterator[str]:
+    for records in batches:
+        yield ''.join(json.dumps(dict(zip(column_names, record))) + '\n' for record in records)
+
+
 # noinspection PyAbstractClass,PyShadowingBuiltins
 class DatasetsIdQcinfo(WsRequestHandler):
 
@@ -884,6 +1083,13 @@ def _ensure_string_argument(arg_value, arg_name: str):
     return arg_value
 
 
+def _to_int_path_args(**path_args):
+    try:
+        return [int(arg_value) for arg_value in path_args.values()]
+    except ValueError:
+        raise WsBadRequestError(f"Invalid tile: {'/'.join(path_args.values())}")
+
+
 def _ensure_int_argument(arg_value, arg_name: str):
     if isinstance(arg_value, list):
         if len(arg_value) != 1:
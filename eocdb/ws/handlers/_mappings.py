@@ -39,13 +39,18 @@ MAPPINGS = [
     (url_pattern(API_URL_PREFIX + '/store/upload/submissionfile/{submission_id}/{index}'), StoreUploadSubmissionFile),
     (url_pattern(API_URL_PREFIX + '/store/download/submissionfile/{submission_id}/{index}'),
      StoreDownloadSubmissionFile),
+    (url_pattern(API_URL_PREFIX + '/store/issues/submissionfile/{submission_id}/{index}'),
+     StoreSubmissionFileIssues),
     (url_pattern(API_URL_PREFIX + '/store/status/submissionfile/{submission_id}/{index}/{status}'),
      StoreUpdateSubmissionFile),
     (url_pattern(API_URL_PREFIX + '/store/download'), StoreDownload),
+    (url_pattern(API_URL_PREFIX + '/store/export'), StoreExport),
     (url_pattern(API_URL_PREFIX + '/datasets'), Datasets),
+    (url_pattern(API_URL_PREFIX + '/datasets/tiles/{z}/{x}/{y}'), DatasetsTile),
     (url_pattern(API_URL_PREFIX + '/datasets/{id}'), DatasetsId),
     (url_pattern(API_URL_PREFIX + '/datasets/submission/{submissionid}'), DatasetsSubmissionId),
     (url_pattern(API_URL_PREFIX + '/datasets/{id}/qcinfo'), DatasetsIdQcinfo),
+    (url_pattern(API_URL_PREFIX + '/datasets/{id}/records'), DatasetsIdRecords),
     (url_pattern(API_URL_PREFIX + '/datasets/{affil}/{project}/{cruise}'), DatasetsAffilProjectCruise),
     (url_pattern(API_URL_PREFIX + '/datasets/{affil}/{project}/{cruise}/{name}'), DatasetsAffilProjectCruiseName),
     (url_pattern(API_URL_PREFIX + '/docfiles'), Docfiles),
@@ -57,5 +62,6 @@ MAPPINGS = [
     (url_pattern(API_URL_PREFIX + '/users/{user_name}'), UsersId),
     (url_pattern(API_URL_PREFIX + '/links'), Links),
     (url_pattern(API_URL_PREFIX + '/matchupfiles'), MatchupFiles),
+    (url_pattern('/metrics'), Metrics),
     (r'/(.*)', web.StaticFileHandler, {"path": 'static/webui', 'default_filename': 'index.html'}),
 ]
@@ -20,6 +20,9 @@
 # SOFTWARE.
 
 import asyncio
+import contextvars
+import functools
+import hashlib
 import json
 import logging
 import os
@@ -27,8 +30,9 @@ import signal
 import sys
 import time
 import traceback
+import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Callable, Any, Iterator, Union
 
 import tornado.options
 import yaml
@@ -36,15 +40,39 @@ from tornado.ioloop import IOLoop
 from tornado.log import enable_pretty_logging
 from tornado.web import RequestHandler, Application
 
+from eocdb.core.db.db_user import DbUser
 from eocdb.core.roles import Roles
 from .context import WsContext
 from .defaults import DEFAULT_ADDRESS, DEFAULT_PORT, DEFAULT_CONFIG_FILE, DEFAULT_UPDATE_PERIOD, DEFAULT_LOG_PREFIX, \
-    DEFAULT_SSL
+    DEFAULT_SSL, TRACE_PERF, DEFAULT_SLOW_REQUEST_THRESHOLD, DEFAULT_PROFILE_DIR_NAME
 from .reqparams import RequestParams
 from ..core import UNDEFINED
+from ..core.metrics import Histogram, Gauge, Counter
+from ..core.profiling import Profiler
+from ..core.tracing import Trace, trace_phase
 
 _LOG = logging.getLogger('eocdb')
 
+_END_OF_CHUNKS = object()
+
+TRACE_PERF_CONFIG_NAME = 'trace_perf'
+SLOW_REQUEST_THRESHOLD_CONFIG_NAME = 'slow_request_threshold'
+REQUEST_ID_HEADER = 'X-Request-ID'
+PROFILE_HANDLERS_CONFIG_NAME = 'profile_handlers'
+PROFILE_DIR_CONFIG_NAME = 'profile_dir'
+PROFILE_HEADER = 'X-Profile'
+PROFILE_FILE_HEADER = 'X-Profile-File'
+
+_REQUEST_DURATION = Histogram('ocdb_http_request_duration_seconds',
+                              'Duration of HTTP requests in seconds.',
+                              label_names=('handler', 'method'))
+_REQUESTS = Counter('ocdb_http_requests_total',
+                    'Number of finished HTTP requests.',
+                    label_names=('handler', 'method', 'status'))
+_REQUESTS_IN_FLIGHT = Gauge('ocdb_http_requests_in_flight',
+                            'Number of HTTP requests currently in progress.',
+                            label_names=('handler',))
+
 
 class WebService:
     """
@@ -100,7 +128,7 @@ class WebService:
         self.ws_context = WsContext(base_dir=os.path.dirname(self.config_file or os.path.abspath('')))
 
         application.ws_context = self.ws_context
-        application.time_of_last_activity = time.clock()
+        application.time_of_last_activity = time.perf_counter()
         self.application = application
 
         from tornado.httpserver import HTTPServer
@@ -210,6 +238,11 @@ class WsRequestHandler(RequestHandler):
         self._header = WsRequestHeader(self)
         self._query = WsRequestQuery(self)
         self._cookie = WsRequestCookie(self)
+        self._users = dict()
+        self._trace = None
+        self._bytes_written = 0
+        self._in_flight = False
+        self._profiler = None
 
     @property
     def ws_context(self) -> WsContext:
@@ -231,16 +264,90 @@ class WsRequestHandler(RequestHandler):
     def cookie(self) -> RequestParams:
         return self._cookie
 
+    @property
+    def trace(self) -> Optional[Trace]:
+        """The performance trace of this request, or None if tracing is disabled."""
+        return self._trace
+
+    def prepare(self):
+        _REQUESTS_IN_FLIGHT.inc(handler=type(self).__name__)
+        self._in_flight = True
+        if self.ws_context.config.get(TRACE_PERF_CONFIG_NAME, TRACE_PERF):
+            request_id = self.request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+            self._trace = Trace(request_id, type(self).__name__)
+            self._trace.activate()
+            self.set_header(REQUEST_ID_HEADER, request_id)
+        self._maybe_start_profiler()
+
+    def flush(self, include_footers: bool = False):
+        if self._trace is None:
+            return super().flush(include_footers=include_footers)
+        # noinspection PyUnresolvedReferences
+        self._bytes_written += sum(len(chunk) for chunk in self._write_buffer)
+        if not self._headers_written:
+            self.set_header('Server-Timing', self._trace.to_server_timing())
+        with self._trace.phase('write'):
+            return super().flush(include_footers=include_footers)
+
+    async def run_in_thread_pool(self, function: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run *function* with the given arguments on the context's thread pool, so that blocking work,
+        e.g. database access, does not block the IOLoop. The function runs within the request's trace.
+        """
+        context = contextvars.copy_context()
+        return await IOLoop.current().run_in_executor(self.ws_context.thread_pool,
+                                                      functools.partial(context.run, function, *args, **kwargs))
+
+    async def write_chunks(self, chunks: Iterator[Union[bytes, str]]):
+        """
+        Stream the response body given by *chunks*. Each chunk is generated on the thread pool and
+        flushed to the client before the next one is generated, so at most one chunk is held in memory.
+        """
+        try:
+            while True:
+                chunk = await self.run_in_thread_pool(next, chunks, _END_OF_CHUNKS)
+                if chunk is _END_OF_CHUNKS:
+                    break
+                if chunk:
+                    self.write(chunk)
+                    await self.flush()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
     def get_current_user(self):
         if 'mode' in self.ws_context.config and self.ws_context.config['mode'] == 'dev':
             return 'chef'
 
-        cookie = self.get_secure_cookie("user")
+        with trace_phase('auth'):
+            cookie = self.get_secure_cookie("user")
         if cookie is not None:
             return cookie.decode("utf-8")
         else:
             return None
 
+    def get_user(self, user_name: str) -> Optional[DbUser]:
+        """Get the user named *user_name*, looked up at most once per request."""
+        if user_name not in self._users:
+            with trace_phase('auth'):
+                self._users[user_name] = self.ws_context.get_user(user_name)
+        return self._users[user_name]
+
+    def finish_if_not_modified(self, *key) -> bool:
+        """
+        Set a strong ETag for the resource identified by *key* in the current data generation.
+        If the client already has this version, finish with status 304 and return True.
+        """
+        tag = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+        self.set_header('Etag', f'"{self.ws_context.data_generation}-{tag}"')
+        self.set_header('Cache-Control', 'no-cache')
+        if not self.check_etag_header():
+            return False
+        self.set_status(304)
+        self.finish()
+        return True
+
     def set_default_headers(self):
         self.set_header("Access-Control-Allow-Origin", "*")
         self.set_header("Access-Control-Allow-Credentials", "true")
@@ -253,9 +360,73 @@ class WsRequestHandler(RequestHandler):
 
     def on_finish(self):
         """
-        Store time of last activity so we can measure time of inactivity and then optionally auto-exit.
+        Log the performance trace, if any, and store time of last activity so we can measure time of inactivity
+        and then optionally auto-exit.
         """
-        self.application.time_of_last_activity = time.clock()
+        if self._profiler is not None:
+            self._stop_profiler()
+        if self._trace is not None:
+            self._log_trace()
+        self._record_metrics()
+        self.application.time_of_last_activity = time.perf_counter()
+
+    def _maybe_start_profiler(self):
+        """
+        Profile this request, if its handler is listed in the "profile_handlers" setting or
+        if an administrator asks for it by sending the "X-Profile" header.
+        """
+        config = self.ws_context.config
+        handler = type(self).__name__
+        profile_handlers = config.get(PROFILE_HANDLERS_CONFIG_NAME) or []
+        if handler not in profile_handlers:
+            profile_header = self.request.headers.get(PROFILE_HEADER, '').lower()
+            if profile_header not in ('1', 'true', 'yes') or not self.has_admin_rights():
+                return
+
+        profile_dir = config.get(PROFILE_DIR_CONFIG_NAME)
+        if not profile_dir:
+            log_dir = os.path.dirname(tornado.options.options.log_file_prefix or DEFAULT_LOG_PREFIX)
+            profile_dir = os.path.join(log_dir, DEFAULT_PROFILE_DIR_NAME)
+        request_id = self._trace.trace_id if self._trace is not None else uuid.uuid4().hex
+        profiler = Profiler(f'{handler}-{self.request.method}-{request_id}', profile_dir)
+        if profiler.start():
+            self._profiler = profiler
+            self.set_header(PROFILE_FILE_HEADER, os.path.basename(profiler.path))
+        else:
+            _LOG.warning(f'{handler}: not profiling request, another request is being profiled')
+
+    def _stop_profiler(self):
+        profiler = self._profiler
+        self._profiler = None
+        try:
+            path = profiler.stop()
+        except OSError as e:
+            _LOG.error(f'{profiler.name}: failed to write profile: {e}')
+            return
+        _LOG.info(f'{profiler.name}: profile written to {path}')
+
+    def _record_metrics(self):
+        handler = type(self).__name__
+        if self._in_flight:
+            self._in_flight = False
+            _REQUESTS_IN_FLIGHT.dec(handler=handler)
+        _REQUEST_DURATION.observe(self.request.request_time(), handler=handler, method=self.request.method)
+        _REQUESTS.inc(handler=handler, method=self.request.method, status=self.get_status())
+
+    def _log_trace(self):
+        trace = self._trace
+        self._trace = None
+        trace.deactivate()
+
+        threshold = self.ws_context.config.get(SLOW_REQUEST_THRESHOLD_CONFIG_NAME, DEFAULT_SLOW_REQUEST_THRESHOLD)
+        record = trace.to_dict()
+        record.update(method=self.request.method,
+                      path=self.request.path,
+                      status=self.get_status(),
+                      bytes_in=len(self.request.body or b''),
+                      bytes_out=self._bytes_written,
+                      slow=trace.elapsed >= threshold)
+        _LOG.log(logging.WARNING if record['slow'] else logging.INFO, 'request trace: ' + json.dumps(record))
 
     @classmethod
     def to_json(cls, obj) -> str:
@@ -288,7 +459,7 @@ class WsRequestHandler(RequestHandler):
         if not user_name:
             return False
 
-        user = self.ws_context.get_user(user_name)
+        user = self.get_user(user_name)
         if not Roles.is_admin(user.roles):
             return False
 
@@ -299,7 +470,7 @@ class WsRequestHandler(RequestHandler):
         if not user_name:
             return False
 
-        user = self.ws_context.get_user(user_name)
+        user = self.get_user(user_name)
         if not Roles.is_submit(user.roles):
             return False
 
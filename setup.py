@@ -35,7 +35,7 @@ requirements = [
     'mongomock', 'ftptool'
 ]
 
-packages = find_packages(exclude=["tests", "tests.*"])
+packages = find_packages(exclude=["tests", "tests.*", "benchmarks", "benchmarks.*"])
 
 VERSION = None
 DESCRIPTION = None
@@ -0,0 +1,41 @@
+import unittest
+
+from benchmarks.loadtest import encode_multipart, parse_mix, percentile, summarize
+
+
+class LoadTestTest(unittest.TestCase):
+
+    def test_parse_mix(self):
+        self.assertEqual(dict(search=80., fetch=20.), parse_mix("search=80, fetch=20"))
+
+        with self.assertRaises(ValueError):
+            parse_mix("browse=10")
+        with self.assertRaises(ValueError):
+            parse_mix("search=0")
+
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(50., percentile(values, 50))
+        self.assertEqual(99., percentile(values, 99))
+        self.assertEqual(100., percentile(values, 100))
+        self.assertEqual(7., percentile([7.], 95))
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize(self):
+        samples = [("search", 0.1, 200, 10), ("search", 0.3, 200, 10), ("fetch", 0.2, 404, 5)]
+        report = summarize(samples, 2.)
+        self.assertEqual(3, report["total"]["requests"])
+        self.assertEqual(1, report["total"]["errors"])
+        self.assertEqual(1.5, report["total"]["throughput_per_s"])
+        self.assertEqual(25, report["total"]["bytes"])
+        self.assertAlmostEqual(300., report["total"]["max_ms"])
+        self.assertEqual(["fetch", "search"], list(report["kinds"].keys()))
+        self.assertAlmostEqual(100., report["kinds"]["search"]["p50_ms"])
+
+    def test_encode_multipart(self):
+        content_type, body = encode_multipart(dict(submissionid="sub-1"), dict(datasetfiles=("a.txt", "x,y\n")))
+        boundary = content_type.split("boundary=")[1]
+        self.assertTrue(content_type.startswith("multipart/form-data; boundary="))
+        self.assertIn(b'name="submissionid"\r\n\r\nsub-1\r\n', body)
+        self.assertIn(b'name="datasetfiles"; filename="a.txt"', body)
+        self.assertTrue(body.endswith(f"--{boundary}--\r\n".encode()))
@@ -0,0 +1,56 @@
+import io
+import unittest
+
+from benchmarks.suite import compare_results, new_benchmarks, run_benchmarks
+from benchmarks.synthetic import new_seabass_text, HYPERSPECTRAL_WAVELENGTHS
+from eocdb.core.seabass.sb_file_reader import SbFileReader
+from eocdb.core.val.validator import Validator
+
+
+class SyntheticTest(unittest.TestCase):
+
+    def test_new_seabass_text_is_valid(self):
+        for spectral_mode in ("multispectral", "hyperspectral"):
+            dataset = SbFileReader().read(io.StringIO(new_seabass_text(20, spectral_mode)))
+            self.assertEqual(20, dataset.record_count)
+            self.assertEqual("OK", Validator().validate_dataset(dataset).status)
+
+        dataset = SbFileReader().read(io.StringIO(new_seabass_text(3, "hyperspectral")))
+        self.assertEqual(6 + 2 * len(HYPERSPECTRAL_WAVELENGTHS), dataset.attribute_count)
+
+    def test_new_seabass_text_is_reproducible(self):
+        self.assertEqual(new_seabass_text(5, seed=3), new_seabass_text(5, seed=3))
+        self.assertNotEqual(new_seabass_text(5, seed=3), new_seabass_text(5, seed=4))
+
+    def test_new_seabass_text_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            new_seabass_text(5, "panchromatic")
+
+
+class SuiteTest(unittest.TestCase):
+
+    def test_run_benchmarks(self):
+        benchmarks = new_benchmarks(sizes=[10], num_datasets=4, name_filter="multispectral/10")
+        self.assertEqual(["read/multispectral/10", "validate/multispectral/10",
+                          "to_dict/multispectral/10", "from_dict/multispectral/10"],
+                         [name for name, _, _ in benchmarks])
+
+        results = run_benchmarks(benchmarks, repeat=1)
+        self.assertIn("python", results["meta"])
+        self.assertEqual(4, len(results["results"]))
+        self.assertEqual(10, results["results"][0]["items"])
+
+    def test_find_datasets_benchmarks(self):
+        benchmarks = new_benchmarks(sizes=[], num_datasets=4, name_filter="find_datasets")
+        self.assertEqual(["find_datasets/4/all", "find_datasets/4/expr",
+                          "find_datasets/4/region", "find_datasets/4/page"],
+                         [name for name, _, _ in benchmarks])
+        self.assertEqual(4, benchmarks[0][1]().total_count)
+
+    def test_compare_results(self):
+        baseline = dict(results=[dict(name="a", median_s=1.0), dict(name="b", median_s=1.0)])
+        results = dict(results=[dict(name="a", median_s=1.1), dict(name="b", median_s=1.5),
+                                dict(name="c", median_s=1.0)])
+        comparisons = compare_results(results, baseline, tolerance=0.2)
+        self.assertEqual(["a", "b"], [comparison["name"] for comparison in comparisons])
+        self.assertEqual([False, True], [comparison["regressed"] for comparison in comparisons])
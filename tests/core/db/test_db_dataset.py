@@ -38,7 +38,10 @@ class DbDatsetTest(TestCase):
                           'user_id': 1,
                           'submission_id': 'abc',
                           'status': 'PUBLISHED', # comes from test-dataset
-                          'times': []}, self.dataset.to_dict())
+                          'times': [],
+                          'min_depth': None,
+                          'max_depth': None,
+                          'wlmode': None}, self.dataset.to_dict())
 
     def test_to_dict(self):
         record_1 = [-39.4, 110.8, 0.267612499]
@@ -65,7 +68,10 @@ class DbDatsetTest(TestCase):
                           'user_id': 1,
                           'submission_id': 'abc',
                           'status': 'PUBLISHED',
-                          'times': ['2008-10-04T15:22:51']},
+                          'times': ['2008-10-04T15:22:51'],
+                          'min_depth': None,
+                          'max_depth': None,
+                          'wlmode': None},
                            self.dataset.to_dict())
 
     def test_add_attributes_and_get(self):
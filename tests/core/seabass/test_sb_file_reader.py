@@ -219,6 +219,59 @@ class SbFileReaderTest(unittest.TestCase):
         self.assertEqual("agp440", dataset.attributes[4])
         self.assertEqual("cgp488", dataset.attributes[14])
 
+    def test_parse_depth_range_and_wlmode(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=comma\n',
+                   '/missing=-999\n',
+                   '/north_latitude=26.957[DEG]\n',
+                   '/east_longitude=125.198[DEG]\n',
+                   '/start_date=20010723\n',
+                   '/start_time=00:08:00[GMT]\n',
+                   '/fields=depth,wt,ed412,ed443,lu412,lu443\n',
+                   '/end_header\n',
+                   '-999,20.1,1.2,1.3,0.1,0.2\n',
+                   '2.5,20.1,1.2,1.3,0.1,0.2\n',
+                   '10,19.7,1.1,1.2,0.1,0.1\n']
+
+        dataset = self.reader._parse(sb_file)
+        self.assertEqual(2.5, dataset.min_depth)
+        self.assertEqual(10.0, dataset.max_depth)
+        self.assertEqual("multispectral", dataset.wlmode)
+
+    def test_parse_depth_range_and_wlmode_hyperspectral(self):
+        fields = ",".join(f"rrs{350 + 2 * i}" for i in range(40))
+        sb_file = ['/begin_header\n',
+                   '/delimiter=comma\n',
+                   '/north_latitude=26.957[DEG]\n',
+                   '/east_longitude=125.198[DEG]\n',
+                   '/start_date=20010723\n',
+                   '/start_time=00:08:00[GMT]\n',
+                   '/measurement_depth=0.5[m]\n',
+                   f'/fields={fields}\n',
+                   '/end_header\n',
+                   ",".join(["0.001"] * 40) + '\n']
+
+        dataset = self.reader._parse(sb_file)
+        self.assertEqual(0.5, dataset.min_depth)
+        self.assertEqual(0.5, dataset.max_depth)
+        self.assertEqual("hyperspectral", dataset.wlmode)
+
+    def test_parse_depth_range_and_wlmode_not_present(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=space\n',
+                   '/north_latitude=26.957[DEG]\n',
+                   '/east_longitude=125.198[DEG]\n',
+                   '/start_date=20010723\n',
+                   '/start_time=00:08:00[GMT]\n',
+                   '/fields=sal,CHL\n',
+                   '/end_header\n',
+                   '32.1 0.158000\n']
+
+        dataset = self.reader._parse(sb_file)
+        self.assertIsNone(dataset.min_depth)
+        self.assertIsNone(dataset.max_depth)
+        self.assertIsNone(dataset.wlmode)
+
     def test_extract_delimiter_regex(self):
         metadata = {'delimiter': 'comma'}
 
@@ -0,0 +1,73 @@
+import base64
+import json
+import unittest
+
+from eocdb.core.locations import thin_points, to_geojson, to_geojson_text, encode_points, decode_points, to_tile, \
+    tile_to_quadkey, quadkey_to_tile, count_tiles, cluster_tiles
+
+
+class LocationsTest(unittest.TestCase):
+
+    def test_thin_points(self):
+        points = [(float(i), -float(i)) for i in range(10)]
+        self.assertIs(points, thin_points(points, None))
+        self.assertIs(points, thin_points(points, 10))
+        self.assertEqual([(0.0, -0.0)], thin_points(points, 1))
+        self.assertEqual([(0.0, -0.0), (9.0, -9.0)], thin_points(points, 2))
+        self.assertEqual([(0.0, -0.0), (2.0, -2.0), (4.0, -4.0), (7.0, -7.0), (9.0, -9.0)], thin_points(points, 5))
+
+    def test_to_geojson(self):
+        self.assertEqual({'type': 'MultiPoint', 'coordinates': [[164.2, 34.55], [164.82, 34.67]]},
+                         to_geojson([(164.2, 34.55), (164.82, 34.67)]))
+
+    def test_to_geojson_text(self):
+        self.assertIsNone(to_geojson_text([]))
+        text = to_geojson_text([(164.2, 34.55)])
+        self.assertEqual({'type': 'FeatureCollection',
+                          'features': [{'type': 'Feature',
+                                        'geometry': {'type': 'Point', 'coordinates': [164.2, 34.55]}}]},
+                         json.loads(text))
+
+    def test_encode_decode_points(self):
+        points = [(-69.815, 42.725), (-69.8167, 42.7158), (179.999999, -89.5), (-180.0, 0.000001)]
+        text = encode_points(points)
+        self.assertIsInstance(text, str)
+        self.assertEqual(4 * 2 * 4, len(base64.b64decode(text)))
+        self.assertEqual(points, decode_points(text))
+
+    def test_encode_decode_no_points(self):
+        self.assertEqual('', encode_points([]))
+        self.assertEqual([], decode_points(''))
+
+    def test_to_tile(self):
+        self.assertEqual((0, 0), to_tile(0.0, 0.0, 0))
+        self.assertEqual((1, 1), to_tile(0.0, 0.0, 1))
+        self.assertEqual((0, 0), to_tile(-180.0, 89.9, 1))
+        self.assertEqual((1, 1), to_tile(180.0, -89.9, 1))
+        self.assertEqual((1206, 1540), to_tile(-74.0, 40.7, 12))
+
+    def test_quadkeys(self):
+        self.assertEqual('', tile_to_quadkey(0, 0, 0))
+        self.assertEqual('213', tile_to_quadkey(3, 3, 5))
+        self.assertEqual((3, 3, 5), quadkey_to_tile('213'))
+        self.assertEqual((12, 1205, 1540), quadkey_to_tile(tile_to_quadkey(12, 1205, 1540)))
+
+    def test_count_tiles(self):
+        self.assertEqual({}, count_tiles([]))
+        self.assertEqual({'0': 2, '3': 1}, count_tiles([(-10.0, 10.0), (10.0, -10.0), (-20.0, 20.0)], zoom=1))
+
+    def test_cluster_tiles(self):
+        tile_counts = [{'00': 2, '03': 1, '30': 4},
+                       {'03': 3, '12': 1}]
+        clusters = cluster_tiles(tile_counts, '0', 2)
+        self.assertEqual(['2/0/0', '2/1/1'], [cluster['tile'] for cluster in clusters])
+        self.assertEqual([2, 4], [cluster['count'] for cluster in clusters])
+        self.assertEqual([1, 2], [cluster['datasets'] for cluster in clusters])
+        self.assertAlmostEqual(-135.0, clusters[0]['lon'])
+        self.assertAlmostEqual(-45.0, clusters[1]['lon'])
+
+        clusters = cluster_tiles(tile_counts, '', 1)
+        self.assertEqual([dict(tile='1/0/0', count=6, datasets=2),
+                          dict(tile='1/1/0', count=1, datasets=1),
+                          dict(tile='1/1/1', count=4, datasets=1)],
+                         [dict(tile=c['tile'], count=c['count'], datasets=c['datasets']) for c in clusters])
@@ -0,0 +1,66 @@
+import unittest
+
+from eocdb.core.metrics import MetricsRegistry, Counter, Gauge, Histogram
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        counter = Counter('requests_total', 'Number of requests.', label_names=('method',), registry=self.registry)
+        counter.inc(method='GET')
+        counter.inc(2, method='GET')
+        counter.inc(method='POST')
+        self.assertEqual(3., counter.get(method='GET'))
+
+        with self.assertRaises(ValueError):
+            counter.inc(-1, method='GET')
+        with self.assertRaises(ValueError):
+            counter.inc(status='200')
+
+        self.assertEqual('# HELP requests_total Number of requests.\n'
+                         '# TYPE requests_total counter\n'
+                         'requests_total{method="GET"} 3.0\n'
+                         'requests_total{method="POST"} 1.0\n',
+                         self.registry.to_text())
+
+    def test_gauge(self):
+        gauge = Gauge('in_flight', 'Requests in progress.', registry=self.registry)
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        self.assertEqual(1., gauge.get())
+        gauge.set(7)
+        self.assertEqual('# HELP in_flight Requests in progress.\n'
+                         '# TYPE in_flight gauge\n'
+                         'in_flight 7\n',
+                         self.registry.to_text())
+
+    def test_histogram(self):
+        histogram = Histogram('latency_seconds', 'Latency.', label_names=('handler',), buckets=(0.1, 1.),
+                              registry=self.registry)
+        histogram.observe(0.05, handler='Datasets')
+        histogram.observe(0.5, handler='Datasets')
+        histogram.observe(5, handler='Datasets')
+        self.assertEqual(3, histogram.get_count(handler='Datasets'))
+        self.assertAlmostEqual(5.55, histogram.get_sum(handler='Datasets'))
+        self.assertEqual('# HELP latency_seconds Latency.\n'
+                         '# TYPE latency_seconds histogram\n'
+                         'latency_seconds_bucket{handler="Datasets",le="0.1"} 1\n'
+                         'latency_seconds_bucket{handler="Datasets",le="1.0"} 2\n'
+                         'latency_seconds_bucket{handler="Datasets",le="+Inf"} 3\n'
+                         'latency_seconds_sum{handler="Datasets"} 5.55\n'
+                         'latency_seconds_count{handler="Datasets"} 3\n',
+                         self.registry.to_text())
+
+    def test_label_values_are_escaped(self):
+        counter = Counter('paths_total', 'Paths.', label_names=('path',), registry=self.registry)
+        counter.inc(path='a"b\\c')
+        self.assertIn('paths_total{path="a\\"b\\\\c"} 1.0\n', self.registry.to_text())
+
+    def test_register_twice(self):
+        Counter('requests_total', 'Number of requests.', registry=self.registry)
+        with self.assertRaises(ValueError):
+            Counter('requests_total', 'Number of requests.', registry=self.registry)
@@ -0,0 +1,45 @@
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+from eocdb.core.profiling import Profiler
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def test_start_stop(self):
+        profiler = Profiler("Datasets-GET-r/4711", os.path.join(self.profile_dir, "profiles"))
+        self.assertTrue(profiler.path.endswith("-Datasets-GET-r_4711.pstats"))
+        self.assertFalse(profiler.is_running)
+
+        self.assertTrue(profiler.start())
+        self.assertTrue(profiler.is_running)
+        sorted(range(1000), key=lambda i: -i)
+        path = profiler.stop()
+
+        self.assertFalse(profiler.is_running)
+        self.assertEqual(profiler.path, path)
+        self.assertTrue(os.path.isfile(path))
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+    def test_only_one_profiler_at_a_time(self):
+        profiler_1 = Profiler("p1", self.profile_dir)
+        profiler_2 = Profiler("p2", self.profile_dir)
+
+        self.assertTrue(profiler_1.start())
+        try:
+            self.assertFalse(profiler_2.start())
+            self.assertIsNone(profiler_2.stop())
+        finally:
+            profiler_1.stop()
+
+        self.assertTrue(profiler_2.start())
+        self.assertIsNotNone(profiler_2.stop())
@@ -0,0 +1,54 @@
+import time
+import unittest
+
+from eocdb.core.tracing import Trace, current_trace, trace_phase
+
+
+class TraceTest(unittest.TestCase):
+
+    def tearDown(self):
+        Trace.deactivate()
+
+    def test_phases(self):
+        trace = Trace("4711", "Datasets")
+        with trace.phase("db"):
+            time.sleep(0.01)
+        with trace.phase("db"):
+            time.sleep(0.01)
+        trace.add("write", 0.002)
+
+        durations = trace.durations
+        self.assertEqual(["db", "write"], list(durations.keys()))
+        self.assertGreaterEqual(durations["db"], 0.02)
+        self.assertEqual(0.002, durations["write"])
+        self.assertGreaterEqual(trace.elapsed, 0.02)
+
+    def test_to_server_timing(self):
+        trace = Trace("4711", "Datasets")
+        trace.add("parse", 0.0012)
+        trace.add("db", 0.1)
+        self.assertRegex(trace.to_server_timing(), r"^parse;dur=1\.2, db;dur=100\.0, total;dur=\d+\.\d$")
+
+    def test_to_dict(self):
+        trace = Trace("4711", "Datasets")
+        trace.add("auth", 0.0005)
+        d = trace.to_dict()
+        self.assertEqual(["trace_id", "name", "total_ms", "auth_ms"], list(d.keys()))
+        self.assertEqual("4711", d["trace_id"])
+        self.assertEqual("Datasets", d["name"])
+        self.assertEqual(0.5, d["auth_ms"])
+
+    def test_trace_phase(self):
+        with trace_phase("db"):
+            pass
+        self.assertIsNone(current_trace())
+
+        trace = Trace("4711", "Datasets")
+        trace.activate()
+        self.assertIs(trace, current_trace())
+        with trace_phase("db"):
+            pass
+        self.assertIn("db", trace.durations)
+
+        Trace.deactivate()
+        self.assertIsNone(current_trace())
@@ -0,0 +1,96 @@
+import unittest
+
+from eocdb.core.models import ISSUE_TYPE_ERROR, ISSUE_TYPE_WARNING
+from eocdb.core.val._gap_aware_dict import GapAwareDict
+from eocdb.core.val._issue_aggregator import IssueAggregator
+from eocdb.core.val._message_library import MessageLibrary
+
+
+class FormatLibrary(MessageLibrary):
+
+    def resolve_warning(self, template: str, tokens: GapAwareDict) -> str:
+        return template.format_map(tokens)
+
+    def resolve_error(self, template: str, tokens: GapAwareDict) -> str:
+        return template.format_map(tokens)
+
+
+MESSAGE = "Line {line}: {field_name} has value {value}"
+
+
+class IssueAggregatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self._lib = FormatLibrary()
+
+    def test_no_issues(self):
+        aggregator = IssueAggregator(self._lib, {"field_name": "chl"})
+        self.assertIsNone(aggregator.get_issues())
+
+    def test_single_occurrence(self):
+        aggregator = IssueAggregator(self._lib, {"field_name": "chl"})
+        aggregator.add(ISSUE_TYPE_ERROR, MESSAGE, 7, -1.5)
+
+        issues = aggregator.get_issues()
+        self.assertEqual(1, len(issues))
+        self.assertEqual(ISSUE_TYPE_ERROR, issues[0].type)
+        self.assertEqual("Line 7: chl has value -1.5", issues[0].description)
+
+    def test_runs_and_number_range(self):
+        aggregator = IssueAggregator(self._lib, {"field_name": "chl"})
+        for line, value in [(12, -1.0), (13, -3.5), (14, 120), (15, -2.0), (20, 101.5)]:
+            aggregator.add(ISSUE_TYPE_ERROR, MESSAGE, line, value)
+
+        issues = aggregator.get_issues()
+        self.assertEqual(1, len(issues))
+        self.assertEqual("Line 12-15, 20 (5 occurrences): chl has value min -3.5, max 120",
+                         issues[0].description)
+
+    def test_same_number(self):
+        aggregator = IssueAggregator(self._lib, {"field_name": "chl"})
+        aggregator.add(ISSUE_TYPE_ERROR, MESSAGE, 1, -1.0)
+        aggregator.add(ISSUE_TYPE_ERROR, MESSAGE, 2, -1.0)
+
+        issues = aggregator.get_issues()
+        self.assertEqual("Line 1-2 (2 occurrences): chl has value -1.0", issues[0].description)
+
+    def test_text_values(self):
+        aggregator = IssueAggregator(self._lib, {"field_name": "time"})
+        aggregator.add(ISSUE_TYPE_ERROR, MESSAGE, 3, "25:00:00")
+        aggregator.add(ISSUE_TYPE_ERROR, MESSAGE, 5, "12:61:00")
+
+        issues = aggregator.get_issues()
+        self.assertEqual("Line 3, 5 (2 occurrences): time has value 25:00:00, ...", issues[0].description)
+
+    def test_max_line_runs(self):
+        aggregator = IssueAggregator(self._lib, {"field_name": "chl"})
+        for line in range(1, 20, 2):
+            aggregator.add(ISSUE_TYPE_ERROR, MESSAGE, line, 1.0)
+
+        issues = aggregator.get_issues()
+        self.assertEqual("Line 1, 3, 5, 7, 9, ... (10 occurrences): chl has value 1.0", issues[0].description)
+
+    def test_groups_by_type_and_message(self):
+        aggregator = IssueAggregator(self._lib, {"field_name": "chl"})
+        aggregator.add(ISSUE_TYPE_ERROR, MESSAGE, 1, 1.0)
+        aggregator.add(ISSUE_TYPE_WARNING, MESSAGE, 2, 1.0)
+        aggregator.add(ISSUE_TYPE_ERROR, "Line {line}: bad", 3, 1.0)
+        aggregator.add(ISSUE_TYPE_ERROR, MESSAGE, 4, 2.0)
+
+        issues = aggregator.get_issues()
+        self.assertEqual(3, len(issues))
+        self.assertEqual(ISSUE_TYPE_ERROR, issues[0].type)
+        self.assertEqual("Line 1, 4 (2 occurrences): chl has value min 1.0, max 2.0", issues[0].description)
+        self.assertEqual(ISSUE_TYPE_WARNING, issues[1].type)
+        self.assertEqual("Line 2: chl has value 1.0", issues[1].description)
+        self.assertEqual("Line 3: bad", issues[2].description)
+
+    def test_detail(self):
+        aggregator = IssueAggregator(self._lib, {"field_name": "chl"}, detail=True)
+        aggregator.add(ISSUE_TYPE_ERROR, MESSAGE, 1, -1.0)
+        aggregator.add(ISSUE_TYPE_ERROR, MESSAGE, 2, -2.0)
+
+        issues = aggregator.get_issues()
+        self.assertEqual(2, len(issues))
+        self.assertEqual("Line 1: chl has value -1.0", issues[0].description)
+        self.assertEqual("Line 2: chl has value -2.0", issues[1].description)
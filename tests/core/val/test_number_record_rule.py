@@ -81,7 +81,7 @@ class NumberRecordRuleTest(unittest.TestCase):
         rule = NumberRecordRule("a", "1/m", "@field_has_wrong_unit", "@field_out_of_bounds", lower_bound=24.5,
                                 upper_bound=30.0)
 
-        issues = rule.eval("1/m", [23.4, 25.9, 29.1, 33.7], self._lib)
+        issues = rule.eval("1/m", [23.4, 25.9, 29.1, 33.7], self._lib, detail=True)
         self.assertIsNotNone(issues)
         self.assertEqual(2, len(issues))
         self.assertEqual(ISSUE_TYPE_ERROR, issues[0].type)
@@ -89,6 +89,16 @@ class NumberRecordRuleTest(unittest.TestCase):
         self.assertEqual(ISSUE_TYPE_ERROR, issues[1].type)
         self.assertEqual("@field_out_of_bounds", issues[1].description)
 
+    def test_fail_value_out_of_both_bounds_aggregated(self):
+        rule = NumberRecordRule("a", "1/m", "@field_has_wrong_unit", "@field_out_of_bounds", lower_bound=24.5,
+                                upper_bound=30.0)
+
+        issues = rule.eval("1/m", [23.4, 25.9, 29.1, 33.7, 35.0], self._lib)
+        self.assertIsNotNone(issues)
+        self.assertEqual(1, len(issues))
+        self.assertEqual(ISSUE_TYPE_ERROR, issues[0].type)
+        self.assertEqual("@field_out_of_bounds", issues[0].description)
+
     def test_from_dict(self):
         rule_dict = {"name": "Kalle", "unit": "%vol", "lower_bound": "17", "upper_bound": "189.45",
                      "value_error": "plain_wrong", "unit_error": "wtf"}
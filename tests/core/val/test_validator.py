@@ -178,6 +178,31 @@ class ValidatorTest(TestCase):
                                          'expected range [0.0 - inf].',
                           'type': 'ERROR'}, result.issues[0].to_dict())
 
+    def test_validate_dataset_values_below_lower_bound_aggregated(self):
+        dataset = self._create_valid_dataset()
+
+        dataset.metadata["fields"] = "abs_blank_ag,abs*,abs_ad"
+        dataset.metadata["units"] = "none,m^2/mg,none"
+        dataset.records = [[5.0, -2.0, 7.2],
+                           [6.1, -3.0, 8.3],
+                           [6.2, -1.0, 8.4],
+                           [6.3, 1.0, 8.5],
+                           [6.4, -1.5, 8.6]]
+
+        result = self._validator.validate_dataset(dataset)
+        self.assertEqual("ERROR", result.status)
+        self.assertEqual(1, len(result.issues))
+        self.assertEqual({'description': "Measurement #1-3, 5 (4 occurrences): The 'abs*' field has value "
+                                         "(min -3.0, max -1.0) outside expected range [0.0 - inf].",
+                          'type': 'ERROR'}, result.issues[0].to_dict())
+
+        result = self._validator.validate_dataset(dataset, detail=True)
+        self.assertEqual("ERROR", result.status)
+        self.assertEqual(4, len(result.issues))
+        self.assertEqual({'description': "Measurement #5: The 'abs*' field has value (-1.5) outside "
+                                         'expected range [0.0 - inf].',
+                          'type': 'ERROR'}, result.issues[3].to_dict())
+
     def test_validate_dataset_float_and_string_error_empty_string(self):
         dataset = self._create_valid_dataset()
 
@@ -0,0 +1,134 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+
+import pymongo
+import pymongo.monitoring
+
+from eocdb.core.models.dataset_query import DatasetQuery
+from eocdb.db.mongo_db_driver import MongoDbDriver
+from tests import helpers
+
+REPLICA_SET_NAME = "eocdb_test_rs"
+PRIMARY_PORT = 27217
+SECONDARY_PORT = 27218
+STARTUP_TIMEOUT = 60.0
+
+
+class _CommandRecorder(pymongo.monitoring.CommandListener):
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        self.commands.append((event.command_name, event.connection_id))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def addresses(self, *command_names):
+        return {address for name, address in self.commands if name in command_names}
+
+
+@unittest.skipIf(shutil.which("mongod") is None, "mongod executable not found")
+class DbTestMongoReplicaSet(unittest.TestCase):
+    """
+    Starts a local replica set with one primary and one secondary and verifies that
+    read-only operations are routed to the secondary while writes go to the primary.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._db_dir = tempfile.mkdtemp(prefix="eocdb_rs_")
+        cls._processes = []
+        for port in (PRIMARY_PORT, SECONDARY_PORT):
+            db_path = os.path.join(cls._db_dir, str(port))
+            os.makedirs(db_path)
+            cls._processes.append(subprocess.Popen(["mongod",
+                                                    "--replSet", REPLICA_SET_NAME,
+                                                    "--port", str(port),
+                                                    "--bind_ip", "localhost",
+                                                    "--dbpath", db_path],
+                                                   stdout=subprocess.DEVNULL,
+                                                   stderr=subprocess.DEVNULL))
+
+        client = pymongo.MongoClient(f"mongodb://localhost:{PRIMARY_PORT}/?directConnection=true",
+                                     serverSelectionTimeoutMS=int(STARTUP_TIMEOUT * 1000))
+        try:
+            client.admin.command("replSetInitiate", {
+                "_id": REPLICA_SET_NAME,
+                "members": [
+                    {"_id": 0, "host": f"localhost:{PRIMARY_PORT}", "priority": 1},
+                    {"_id": 1, "host": f"localhost:{SECONDARY_PORT}", "priority": 0},
+                ]
+            })
+            cls._wait_for_replica_set(client)
+        finally:
+            client.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        for process in cls._processes:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(cls._db_dir, ignore_errors=True)
+
+    @classmethod
+    def _wait_for_replica_set(cls, client):
+        deadline = time.time() + STARTUP_TIMEOUT
+        while time.time() < deadline:
+            status = client.admin.command("replSetGetStatus")
+            states = sorted(member["stateStr"] for member in status["members"])
+            if states == ["PRIMARY", "SECONDARY"]:
+                return
+            time.sleep(0.5)
+        raise RuntimeError("replica set did not become ready")
+
+    def setUp(self):
+        self._recorder = _CommandRecorder()
+        self._driver = MongoDbDriver()
+        self._driver.init(url=f"mongodb://localhost:{PRIMARY_PORT},localhost:{SECONDARY_PORT}/"
+                              f"?replicaSet={REPLICA_SET_NAME}",
+                          search_read_preference="secondary",
+                          search_max_staleness_seconds=90,
+                          event_listeners=[self._recorder])
+
+    def tearDown(self):
+        self._driver.clear()
+        self._driver.close()
+
+    def test_writes_go_to_primary(self):
+        self._driver.add_dataset(helpers.new_test_dataset(1))
+
+        self.assertEqual({("localhost", PRIMARY_PORT)}, self._recorder.addresses("insert"))
+
+    def test_searches_go_to_secondary(self):
+        dataset_id = self._driver.add_dataset(helpers.new_test_dataset(2))
+        self._wait_until_replicated(dataset_id)
+        self._recorder.commands.clear()
+
+        result = self._driver.find_datasets(DatasetQuery())
+        self.assertEqual(1, result.total_count)
+        self.assertIsNotNone(self._driver.get_dataset(dataset_id))
+        self._driver.get_submissions()
+
+        self.assertEqual({("localhost", SECONDARY_PORT)}, self._recorder.addresses("find", "aggregate"))
+
+    def test_lookups_before_writes_go_to_primary(self):
+        self._driver.get_submission("not_there")
+        self._driver.delete_submission("not_there")
+
+        self.assertEqual({("localhost", PRIMARY_PORT)}, self._recorder.addresses("find"))
+
+    def _wait_until_replicated(self, dataset_id: str):
+        deadline = time.time() + STARTUP_TIMEOUT
+        while self._driver.get_dataset(dataset_id) is None:
+            if time.time() > deadline:
+                self.fail("dataset was not replicated to the secondary")
+            time.sleep(0.2)
@@ -1,15 +1,26 @@
 import unittest
+import unittest.mock
 from datetime import datetime
 
+import bson.objectid
+import pymongo
+from pymongo.monitoring import ConnectionCreatedEvent, ConnectionCheckedOutEvent, ConnectionCheckedInEvent, \
+    ConnectionCheckOutFailedEvent, ConnectionClosedEvent
+from pymongo.read_preferences import SecondaryPreferred, Secondary, Primary
+
 from eocdb.core.db.db_submission import DbSubmission
 from eocdb.core.db.db_user import DbUser
 from eocdb.core.db.errors import OperationalError
+from eocdb.core.locations import decode_points
 from eocdb.core.models.dataset_query import DatasetQuery
+from eocdb.core.models.dataset_validation_result import DatasetValidationResult
+from eocdb.core.models.issue import Issue
 from eocdb.core.models.qc_info import QC_STATUS_VALIDATED, \
-    QC_STATUS_SUBMITTED, QC_STATUS_PUBLISHED, QC_STATUS_APPROVED
+    QC_STATUS_SUBMITTED, QC_STATUS_PUBLISHED, QC_STATUS_APPROVED, QcInfo
 from eocdb.core.models.submission_file import SubmissionFile
 from eocdb.core.roles import Roles
-from eocdb.db.mongo_db_driver import MongoDbDriver
+from eocdb.db.mongo_db_driver import MongoDbDriver, _ConnectionPoolMetrics, INLINE_ISSUES_COUNT, TEXT_INDEX_NAME, \
+    TEXT_INDEX_WEIGHTS, DATASET_CHUNK_INDEX_NAME, DATASET_CHUNK_INDEX_KEY
 from tests import helpers
 
 
@@ -30,6 +41,79 @@ class TestMongoDbDriver(unittest.TestCase):
         except OperationalError:
             pass
 
+    def test_close_and_connect_again(self):
+        self._driver.close()
+        self._driver.connect()
+        self.assertIsNotNone(self._driver.pool_metrics)
+
+    def test_update_swaps_client(self):
+        old_client = self._driver._client
+
+        self._driver.update(mock=True, search_read_preference="secondaryPreferred")
+
+        self.assertIsNotNone(self._driver._client)
+        self.assertIsNot(old_client, self._driver._client)
+        self.assertEqual(SecondaryPreferred(), self._driver._search_collection.read_preference)
+
+    def test_update_invalid_read_preference(self):
+        with self.assertRaises(ValueError):
+            self._driver.update(mock=True, search_read_preference="anywhere")
+
+    def test_read_only_collections_use_search_read_preference(self):
+        self._driver.update(mock=True, read_preference="nearest", search_read_preference="secondary",
+                            search_max_staleness_seconds=120)
+
+        self.assertEqual(Secondary(max_staleness=120), self._driver._search_collection.read_preference)
+        self.assertEqual(Secondary(max_staleness=120), self._driver._submit_search_collection.read_preference)
+        self.assertEqual(Primary(), self._driver._collection.read_preference)
+        self.assertEqual(Primary(), self._driver._submit_collection.read_preference)
+        self.assertEqual(Primary(), self._driver._user_collection.read_preference)
+
+    def test_max_staleness_requires_secondary_read_preference(self):
+        with self.assertRaises(ValueError):
+            self._driver.update(mock=True, search_max_staleness_seconds=120)
+
+        with self.assertRaises(ValueError):
+            self._driver.update(mock=True, search_read_preference="primary", search_max_staleness_seconds=120)
+
+    def test_get_client_params(self):
+        self._driver._set_config(dict(url="mongodb://localhost:27017/eocdb",
+                                      max_pool_size=50,
+                                      wait_queue_timeout_ms=2000,
+                                      read_preference="primaryPreferred",
+                                      compressors="zstd, snappy",
+                                      search_read_preference="secondary",
+                                      client_close_delay=5.0,
+                                      connect=False))
+
+        self.assertEqual({"host": "mongodb://localhost:27017/eocdb",
+                          "maxPoolSize": 50,
+                          "waitQueueTimeoutMS": 2000,
+                          "readPreference": "primaryPreferred",
+                          "compressors": ["zstd", "snappy"],
+                          "connect": False}, self._driver._get_client_params())
+
+    def test_pool_metrics(self):
+        metrics = _ConnectionPoolMetrics()
+        address = ("localhost", 27017)
+        metrics.connection_created(ConnectionCreatedEvent(address, 1))
+        metrics.connection_created(ConnectionCreatedEvent(address, 2))
+        metrics.connection_checked_out(ConnectionCheckedOutEvent(address, 1, 0.0))
+        metrics.connection_checked_out(ConnectionCheckedOutEvent(address, 2, 0.0))
+        metrics.connection_checked_in(ConnectionCheckedInEvent(address, 1))
+        metrics.connection_check_out_failed(ConnectionCheckOutFailedEvent(address, "timeout", 0.0))
+        metrics.connection_closed(ConnectionClosedEvent(address, 1, "idle"))
+
+        self.assertEqual({"connections_created": 2,
+                          "connections_closed": 1,
+                          "connections_checked_out": 2,
+                          "connections_checked_in": 1,
+                          "check_out_failures": 1,
+                          "check_out_timeouts": 1,
+                          "pools_cleared": 0,
+                          "connections_open": 1,
+                          "connections_in_use": 1}, metrics.to_dict())
+
     def test_insert_one_and_get(self):
         dataset = helpers.new_test_db_dataset(1)
         dataset.metadata["affiliations"] = "UCSB"
@@ -49,6 +133,180 @@ class TestMongoDbDriver(unittest.TestCase):
         self.assertAlmostEqual(109.8, result.records[0][0], 8)
         self.assertAlmostEqual(-38.3, result.records[1][1], 8)
 
+    def test_insert_and_get_packed_records(self):
+        records = [[109.8, -38.4, 998, "20:13:00", 36],
+                   [109.9, -38.3, 999, "20:14:00", 35.5]]
+        dataset = helpers.new_test_db_dataset(1)
+        dataset.records = records
+        arrays_id = self._driver.add_dataset(dataset)
+
+        self._driver.close()
+        self._driver = MongoDbDriver()
+        self._driver.init(mock=True, records_format="packed", records_compression="zlib")
+        self._driver._collection.insert_one(dict(_id=bson.objectid.ObjectId(arrays_id),
+                                                 **helpers.new_test_db_dataset(1).to_dict()))
+        packed_id = self._driver.add_dataset(dataset)
+
+        chunk_dict = self._driver._chunk_collection.find_one({"dataset_id": bson.objectid.ObjectId(packed_id)})
+        self.assertNotIn("records", chunk_dict)
+        self.assertEqual(2, chunk_dict["packed_records"]["num_rows"])
+        self.assertEqual(["<f8", "<f8", "<i8", None, "<f8"],
+                         [column.get("dtype") for column in chunk_dict["packed_records"]["columns"]])
+
+        result = self._driver.get_dataset(packed_id)
+        self.assertEqual([[109.8, -38.4, 998, "20:13:00", 36.0],
+                          [109.9, -38.3, 999, "20:14:00", 35.5]], result.records)
+        self.assertIsInstance(result.records[0][2], int)
+
+        # documents in the former format are still read
+        result = self._driver.get_dataset(arrays_id)
+        self.assertEqual(helpers.new_test_db_dataset(1).records, result.records)
+
+        result.records = [[1.5, "a"], [2.5]]
+        self._driver.update_dataset(result)
+        self.assertEqual([[1.5, "a"], [2.5]], self._driver.get_dataset(arrays_id).records)
+
+    def test_insert_and_get_chunked_records(self):
+        self._driver.close()
+        self._driver = MongoDbDriver()
+        self._driver.init(mock=True, records_chunk_size=3)
+
+        dataset = helpers.new_test_db_dataset(1)
+        dataset.records = [[i, float(i)] for i in range(8)]
+        ds_id = self._driver.add_dataset(dataset)
+        obj_id = bson.objectid.ObjectId(ds_id)
+
+        dataset_dict = self._driver._collection.find_one({"_id": obj_id})
+        self.assertNotIn("records", dataset_dict)
+        chunk_set = dataset_dict["chunked_records"]["chunk_set"]
+        self.assertEqual(dict(num_rows=8, chunk_size=3, num_chunks=3, chunk_set=chunk_set),
+                         dataset_dict["chunked_records"])
+        self.assertEqual([(chunk_set, 0), (chunk_set, 1), (chunk_set, 2)],
+                         [(chunk["chunk_set"], chunk["chunk_no"]) for chunk in
+                          self._driver._chunk_collection.find({"dataset_id": obj_id})])
+
+        self.assertEqual(dataset.records, self._driver.get_dataset(ds_id).records)
+        self.assertEqual(dataset.records, self._driver.get_dataset_records(ds_id))
+        self.assertEqual([[2, 2.0], [3, 3.0], [4, 4.0], [5, 5.0]], self._driver.get_dataset_records(ds_id, 2, 4))
+        self.assertEqual([[6, 6.0], [7, 7.0]], self._driver.get_dataset_records(ds_id, 6, 10))
+        self.assertEqual([], self._driver.get_dataset_records(ds_id, 8, 10))
+        self.assertEqual([], self._driver.get_dataset_records(ds_id, 0, 0))
+        self.assertIsNone(self._driver.get_dataset_records("rippelschnatz"))
+
+        dataset = self._driver.get_dataset(ds_id)
+        dataset.records = [[0, 0.5]]
+        self._driver.update_dataset(dataset)
+        self.assertEqual([[0, 0.5]], self._driver.get_dataset(ds_id).records)
+        self.assertEqual(1, self._driver._chunk_collection.count_documents({"dataset_id": obj_id}))
+
+        self._driver.delete_dataset(ds_id)
+        self.assertEqual(0, self._driver._chunk_collection.count_documents({"dataset_id": obj_id}))
+
+    def test_update_chunked_records_concurrently(self):
+        self._driver.close()
+        self._driver = MongoDbDriver()
+        self._driver.init(mock=True, records_chunk_size=2)
+
+        dataset = helpers.new_test_db_dataset(1)
+        dataset.records = [[i, float(i)] for i in range(5)]
+        ds_id = self._driver.add_dataset(dataset)
+        old_records = dataset.records
+
+        chunk_collection = self._driver._chunk_collection
+        insert_many = chunk_collection.insert_many
+        seen_records = []
+
+        def insert_chunks_and_interfere(chunks):
+            result = insert_many(chunks)
+            if not seen_records:
+                # the dataset is read and updated again while its first update is in progress
+                seen_records.append(self._driver.get_dataset(ds_id).records)
+                seen_records.append(self._driver.get_dataset_records(ds_id, 1, 3))
+                other_dataset = self._driver.get_dataset(ds_id)
+                other_dataset.records = [[9, 9.0]]
+                self.assertTrue(self._driver.update_dataset(other_dataset))
+            return result
+
+        dataset = self._driver.get_dataset(ds_id)
+        dataset.records = [[i, i + 0.5] for i in range(3)]
+        with unittest.mock.patch.object(chunk_collection, "insert_many", side_effect=insert_chunks_and_interfere):
+            self.assertTrue(self._driver.update_dataset(dataset))
+
+        self.assertEqual([old_records, old_records[1:4]], seen_records)
+        self.assertEqual(dataset.records, self._driver.get_dataset(ds_id).records)
+        # only the chunks of the last written records are left
+        obj_id = bson.objectid.ObjectId(ds_id)
+        chunk_set = self._driver._collection.find_one({"_id": obj_id})["chunked_records"]["chunk_set"]
+        self.assertEqual([chunk_set, chunk_set], [chunk["chunk_set"] for chunk in
+                                                  chunk_collection.find({"dataset_id": obj_id})])
+
+    def test_get_chunked_records_of_former_version(self):
+        self._driver.close()
+        self._driver = MongoDbDriver()
+        self._driver.init(mock=True, records_chunk_size=2)
+
+        dataset = helpers.new_test_db_dataset(1)
+        dataset.records = [[i, float(i)] for i in range(3)]
+        ds_id = self._driver.add_dataset(dataset)
+        obj_id = bson.objectid.ObjectId(ds_id)
+        # chunks written before chunk sets were introduced
+        self._driver._collection.update_one({"_id": obj_id}, {"$unset": {"chunked_records.chunk_set": True}})
+        self._driver._chunk_collection.update_many({"dataset_id": obj_id}, {"$unset": {"chunk_set": True}})
+
+        self.assertEqual(dataset.records, self._driver.get_dataset(ds_id).records)
+        dataset.id = ds_id
+        dataset.records = [[7, 7.0]]
+        self.assertTrue(self._driver.update_dataset(dataset))
+        self.assertEqual([[7, 7.0]], self._driver.get_dataset_records(ds_id))
+        self.assertEqual(1, self._driver._chunk_collection.count_documents({"dataset_id": obj_id}))
+
+    def test_get_dataset_records_not_chunked(self):
+        self._driver.close()
+        self._driver = MongoDbDriver()
+        self._driver.init(mock=True, records_chunk_size=0)
+
+        dataset = helpers.new_test_db_dataset(1)
+        dataset.records = [[i, float(i)] for i in range(8)]
+        ds_id = self._driver.add_dataset(dataset)
+
+        self.assertEqual(8, len(self._driver._collection.find_one({"_id": bson.objectid.ObjectId(ds_id)})["records"]))
+        self.assertEqual(0, self._driver._chunk_collection.count_documents({}))
+        self.assertEqual(dataset.records, self._driver.get_dataset(ds_id).records)
+        self.assertEqual([[2, 2.0], [3, 3.0]], self._driver.get_dataset_records(ds_id, 2, 2))
+
+    def test_get_dataset_records_columns(self):
+        records = [[i, float(i), str(i)] for i in range(8)]
+        for config in (dict(records_chunk_size=3),
+                       dict(records_chunk_size=3, records_format="packed"),
+                       dict(records_chunk_size=0, records_format="packed"),
+                       dict(records_chunk_size=0)):
+            self._driver.close()
+            self._driver = MongoDbDriver()
+            self._driver.init(mock=True, **config)
+
+            dataset = helpers.new_test_db_dataset(1)
+            dataset.records = records
+            ds_id = self._driver.add_dataset(dataset)
+
+            self.assertEqual([["2", 2], ["3", 3], ["4", 4]],
+                             self._driver.get_dataset_records(ds_id, 2, 3, columns=[2, 0]), msg=f"{config}")
+            self.assertEqual([[7.0]], self._driver.get_dataset_records(ds_id, 7, columns=[1]), msg=f"{config}")
+
+            dataset = self._driver.get_dataset(ds_id, with_records=False)
+            self.assertEqual([], dataset.records)
+            self.assertEqual("archive/dataset-1.txt", dataset.path)
+            self._driver.clear()
+
+    def test_invalid_records_format(self):
+        with self.assertRaises(ValueError):
+            self._driver.update(mock=True, records_format="columns")
+        with self.assertRaises(ValueError):
+            self._driver.update(mock=True, records_format="packed", records_float_dtype="float16")
+        with self.assertRaises(ValueError):
+            self._driver.update(mock=True, records_format="packed", records_compression="zip")
+        with self.assertRaises(ValueError):
+            self._driver.update(mock=True, records_chunk_size=-1)
+
     def test_get_invalid_id(self):
         dataset = helpers.new_test_dataset(2)
 
@@ -371,14 +629,14 @@ class TestMongoDbDriver(unittest.TestCase):
 
         self.assertEqual(1, len(result.locations))
         ds_id = result.datasets[0].id
-        self.assertEqual("{'type':'FeatureCollection','features':["
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[-69.815,42.725]}},"
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[-69.8167,42.7158]}},"
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[-69.7675,43.1685]}},"
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[-70.203,43.14]}},"
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[-70.2053,42.5045]}},"
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[-69.5458,42.779]}},"
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[-69.1059,42.5036]}}]}",
+        self.assertEqual('{"type":"FeatureCollection","features":['
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[-69.815,42.725]}},'
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[-69.8167,42.7158]}},'
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[-69.7675,43.1685]}},'
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[-70.203,43.14]}},'
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[-70.2053,42.5045]}},'
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[-69.5458,42.779]}},'
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[-69.1059,42.5036]}}]}',
                          result.locations[ds_id])
 
     def test_insert_two_and_get_by_location_many_records_with_geojson_two_results(self):
@@ -410,19 +668,106 @@ class TestMongoDbDriver(unittest.TestCase):
 
         self.assertEqual(2, len(result.locations))
         ds_id = result.datasets[0].id
-        self.assertEqual("{'type':'FeatureCollection','features':["
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[-69.815,42.725]}},"
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[-69.8167,42.7158]}},"
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[-69.7675,43.1685]}}]}",
+        self.assertEqual('{"type":"FeatureCollection","features":['
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[-69.815,42.725]}},'
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[-69.8167,42.7158]}},'
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[-69.7675,43.1685]}}]}',
                          result.locations[ds_id])
 
         ds_id = result.datasets[1].id
-        self.assertEqual("{'type':'FeatureCollection','features':["
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[-70.2,43.11]}},"
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[-70.24,43.22]}},"
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[-70.31,43.18]}}]}",
+        self.assertEqual('{"type":"FeatureCollection","features":['
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[-70.2,43.11]}},'
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[-70.24,43.22]}},'
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[-70.31,43.18]}}]}',
                          result.locations[ds_id])
 
+    def test_get_by_location_with_location_formats(self):
+        dataset = helpers.new_test_db_dataset(17)
+        for lon in [-69.8, -69.7, -69.6, -69.5, -69.4]:
+            dataset.add_geo_location(lon=lon, lat=42.7)
+        self._driver.add_dataset(dataset)
+
+        query = DatasetQuery(locformat="geojson", maxpoints=3)
+        result = self._driver.find_datasets(query)
+        self.assertEqual({result.datasets[0].id: {'type': 'MultiPoint',
+                                                  'coordinates': [[-69.8, 42.7], [-69.6, 42.7], [-69.4, 42.7]]}},
+                         result.locations)
+
+        query = DatasetQuery(locformat="binary")
+        result = self._driver.find_datasets(query)
+        points = decode_points(result.locations[result.datasets[0].id])
+        self.assertEqual(5, len(points))
+        self.assertAlmostEqual(-69.4, points[4][0], places=6)
+
+    def test_iter_datasets(self):
+        dataset_ids = []
+        for i in range(5):
+            dataset = helpers.new_test_db_dataset(i)
+            dataset.metadata["cruise"] = f"cruise-{i}"
+            if i == 4:
+                dataset.status = "VALIDATED"
+            dataset_ids.append(self._driver.add_dataset(dataset))
+
+        query = DatasetQuery(status="PUBLISHED", count=2)
+        datasets = list(self._driver.iter_datasets(query, batch_size=3))
+        self.assertEqual([dict(id=dataset_ids[i], path=f"archive/dataset-{i}.txt") for i in range(4)], datasets)
+
+        datasets = list(self._driver.iter_datasets(DatasetQuery(), projection=["metadata.cruise", "status"]))
+        self.assertEqual(5, len(datasets))
+        self.assertEqual(dict(id=dataset_ids[4], metadata=dict(cruise="cruise-4"), status="VALIDATED"), datasets[4])
+
+        self.assertEqual([], list(self._driver.iter_datasets(DatasetQuery(submission_id="xyz"))))
+        self.assertEqual(5, len(list(self._driver.iter_datasets(DatasetQuery(), search=True))))
+
+    def test_find_tile_counts(self):
+        dataset = helpers.new_test_db_dataset(18)
+        dataset.add_geo_location(lon=-10.0, lat=10.0)
+        dataset.add_geo_location(lon=-10.0, lat=10.0)
+        dataset.add_geo_location(lon=10.0, lat=-10.0)
+        self._driver.add_dataset(dataset)
+
+        dataset = helpers.new_test_db_dataset(19)
+        dataset.add_geo_location(lon=10.0, lat=-10.0)
+        dataset.status = "VALIDATED"
+        self._driver.add_dataset(dataset)
+
+        tile_counts = list(self._driver.find_tile_counts(DatasetQuery(), ""))
+        self.assertEqual(2, len(tile_counts))
+        self.assertEqual([1, 3], sorted(sum(counts.values()) for counts in tile_counts))
+        for counts in tile_counts:
+            for quadkey in counts.keys():
+                self.assertEqual(12, len(quadkey))
+
+        tile_counts = list(self._driver.find_tile_counts(DatasetQuery(), "3"))
+        self.assertEqual(2, len(tile_counts))
+        tile_counts = list(self._driver.find_tile_counts(DatasetQuery(), "0"))
+        self.assertEqual(1, len(tile_counts))
+        self.assertEqual([2], list(tile_counts[0].values())[:1])
+        tile_counts = list(self._driver.find_tile_counts(DatasetQuery(status="VALIDATED"), "0"))
+        self.assertEqual([], tile_counts)
+        tile_counts = list(self._driver.find_tile_counts(DatasetQuery(status="VALIDATED"), "3"))
+        self.assertEqual(1, len(tile_counts))
+
+        # the tile index is not part of the dataset
+        dataset = self._driver.get_dataset(self._driver.find_datasets(DatasetQuery()).datasets[0].id)
+        self.assertIsNotNone(dataset)
+
+    def test_ensure_tile_index(self):
+        dataset = helpers.new_test_db_dataset(18)
+        dataset.add_geo_location(lon=-10.0, lat=10.0)
+        dataset.add_geo_location(lon=10.0, lat=-10.0)
+        dataset_ids = [self._driver.add_dataset(dataset) for _ in range(3)]
+        # datasets stored before the tile index was introduced
+        self._driver._collection.update_many({}, {"$unset": {"tiles": True, "tile_counts": True}})
+        self.assertEqual([{}, {}, {}], list(self._driver.find_tile_counts(DatasetQuery(), "")))
+
+        self._driver._ensure_tile_index()
+
+        tile_counts = list(self._driver.find_tile_counts(DatasetQuery(), ""))
+        self.assertEqual(3, len(tile_counts))
+        self.assertEqual([2, 2, 2], [sum(counts.values()) for counts in tile_counts])
+        self.assertEqual(2, len(self._driver.get_dataset(dataset_ids[0]).longitudes))
+
     def test_insert_two_and_get_by_location_and_metadata(self):
         dataset = helpers.new_test_db_dataset(15)
         dataset.metadata["data_status"] = "final"
@@ -617,6 +962,52 @@ class TestMongoDbDriver(unittest.TestCase):
         result = self._driver.find_datasets(query)
         self.assertEqual(2, result.total_count)
 
+    def test_get_by_product_group_same_cruise(self):
+        for i, (cruise, groups) in enumerate([("c1", ["Chl_a"]), ("c1", ["b"]), ("c2", ["b"])]):
+            dataset = helpers.new_test_db_dataset(30 + i)
+            dataset.metadata["cruise"] = cruise
+            dataset.groups = groups
+            self._driver.add_dataset(dataset)
+
+        result = self._driver.find_datasets(DatasetQuery(pgroup=["Chl_a"], pmode="contains"))
+        self.assertEqual(["archive/dataset-30.txt"], [ref.path for ref in result.datasets])
+
+        result = self._driver.find_datasets(DatasetQuery(pgroup=["Chl_a"], pmode="same_cruise"))
+        self.assertEqual(["archive/dataset-30.txt", "archive/dataset-31.txt"], [ref.path for ref in result.datasets])
+
+        result = self._driver.find_datasets(DatasetQuery(expr="cruise:c2", pgroup=["Chl_a"], pmode="same_cruise"))
+        self.assertEqual(0, result.total_count)
+
+        result = self._driver.find_datasets(DatasetQuery(pgroup=["Chl_a"], pmode="dont_apply"))
+        self.assertEqual(3, result.total_count)
+
+    def test_get_by_water_depth_and_wlmode(self):
+        for i, (min_depth, max_depth, wlmode) in enumerate([(0.0, 5.0, "multispectral"),
+                                                            (10.0, 50.0, "hyperspectral"),
+                                                            (None, None, None)]):
+            dataset = helpers.new_test_db_dataset(40 + i)
+            dataset.min_depth = min_depth
+            dataset.max_depth = max_depth
+            dataset.wlmode = wlmode
+            self._driver.add_dataset(dataset)
+
+        result = self._driver.find_datasets(DatasetQuery(wdepth=[4.0, 12.0]))
+        self.assertEqual(["archive/dataset-40.txt", "archive/dataset-41.txt"], [ref.path for ref in result.datasets])
+
+        result = self._driver.find_datasets(DatasetQuery(wdepth=[6.0, 9.0]))
+        self.assertEqual(0, result.total_count)
+
+        result = self._driver.find_datasets(DatasetQuery(wdepth=[20.0, None], wlmode="hyperspectral"))
+        self.assertEqual(["archive/dataset-41.txt"], [ref.path for ref in result.datasets])
+
+        result = self._driver.find_datasets(DatasetQuery(wlmode="multispectral"))
+        self.assertEqual(["archive/dataset-40.txt"], [ref.path for ref in result.datasets])
+
+        dataset = self._driver.get_dataset(result.datasets[0].id)
+        self.assertEqual(0.0, dataset.min_depth)
+        self.assertEqual(5.0, dataset.max_depth)
+        self.assertEqual("multispectral", dataset.wlmode)
+
     def test_insert_two_and_get_by_product_name_non_matching(self):
         dataset = helpers.new_test_db_dataset(18)
         dataset.attributes = ["a", "b"]
@@ -821,15 +1212,116 @@ class TestMongoDbDriver(unittest.TestCase):
         locations = [(164.2, 34.55)]
         geojson = MongoDbDriver._to_geojson(locations)
         self.assertEqual(
-            "{'type':'FeatureCollection','features':[{'type':'Feature','geometry':{'type':'Point','coordinates':[164.2,34.55]}}]}",
+            '{"type":"FeatureCollection","features":[{"type":"Feature","geometry":{"type":"Point","coordinates":[164.2,34.55]}}]}',
             geojson)
 
     def test_to_geojson_two_points(self):
         locations = [(164.2, 34.55), (164.82, 34.67)]
         geojson = MongoDbDriver._to_geojson(locations)
         self.assertEqual(
-            "{'type':'FeatureCollection','features':[{'type':'Feature','geometry':{'type':'Point','coordinates':[164.2,34.55]}},"
-            "{'type':'Feature','geometry':{'type':'Point','coordinates':[164.82,34.67]}}]}", geojson)
+            '{"type":"FeatureCollection","features":[{"type":"Feature","geometry":{"type":"Point","coordinates":[164.2,34.55]}},'
+            '{"type":"Feature","geometry":{"type":"Point","coordinates":[164.82,34.67]}}]}', geojson)
+
+    def test_find_submissions(self):
+        result_dict = {"status": "ERROR", "issues": [{"type": "ERROR", "description": "bad"}]}
+        for submission_id, user_id, status, date in [("s1", "u1", QC_STATUS_SUBMITTED, datetime(2018, 4, 23)),
+                                                     ("s2", "u2", QC_STATUS_VALIDATED, datetime(2017, 4, 23)),
+                                                     ("s3", "u1", QC_STATUS_PUBLISHED, datetime(2011, 1, 22)),
+                                                     ("s4", "u1", QC_STATUS_SUBMITTED, datetime(2019, 2, 1))]:
+            sf = SubmissionFile(index=0, submission_id=submission_id, filename="f.txt", filetype="MEASUREMENT",
+                                status=QC_STATUS_SUBMITTED, result=DatasetValidationResult.from_dict(result_dict))
+            self._driver.add_submission(DbSubmission(submission_id=submission_id, date=date, user_id=user_id,
+                                                     status=status, qc_status="OK", path="a/b/c", files=[sf],
+                                                     store_sub_path="Tom_Helge"))
+
+        total_count, result = self._driver.find_submissions()
+        self.assertEqual(4, total_count)
+        self.assertEqual(["s3", "s2", "s1", "s4"], [subm.submission_id for subm in result])
+        self.assertEqual("f.txt", result[0].files[0].filename)
+        self.assertNotIn("result", result[0].files[0].to_dict())
+
+        total_count, result = self._driver.find_submissions(user_id="u1", descending=True, offset=1, count=1)
+        self.assertEqual(3, total_count)
+        self.assertEqual(["s1"], [subm.submission_id for subm in result])
+
+        total_count, result = self._driver.find_submissions(status=QC_STATUS_SUBMITTED)
+        self.assertEqual(2, total_count)
+        self.assertEqual(["s1", "s4"], [subm.submission_id for subm in result])
+
+        total_count, result = self._driver.find_submissions(sort_by="status")
+        self.assertEqual(4, total_count)
+        self.assertEqual(sorted([QC_STATUS_SUBMITTED, QC_STATUS_SUBMITTED, QC_STATUS_VALIDATED, QC_STATUS_PUBLISHED]),
+                         [subm.status for subm in result])
+
+        self.assertEqual((4, []), self._driver.find_submissions(count=0))
+
+        with self.assertRaises(ValueError):
+            self._driver.find_submissions(sort_by="path")
+
+    def test_ensure_text_index(self):
+        collection = self._driver._collection
+        self.assertIn(TEXT_INDEX_NAME, collection.index_information())
+
+        collection.drop_index(TEXT_INDEX_NAME)
+        collection.create_index([("metadata.cruise", pymongo.TEXT)], name="legacy_text")
+        self._driver._ensure_indices()
+
+        index_information = collection.index_information()
+        self.assertNotIn("legacy_text", index_information)
+        self.assertIn(TEXT_INDEX_NAME, index_information)
+        self.assertEqual([(field, pymongo.TEXT) for field in TEXT_INDEX_WEIGHTS],
+                         index_information[TEXT_INDEX_NAME]["key"])
+
+    def test_ensure_dataset_chunk_index(self):
+        collection = self._driver._chunk_collection
+        collection.drop_index(DATASET_CHUNK_INDEX_NAME)
+        collection.create_index([("dataset_id", pymongo.ASCENDING), ("chunk_no", pymongo.ASCENDING)],
+                                name=DATASET_CHUNK_INDEX_NAME, unique=True)
+        self._driver._ensure_indices()
+
+        self.assertEqual(DATASET_CHUNK_INDEX_KEY, collection.index_information()[DATASET_CHUNK_INDEX_NAME]["key"])
+
+    def test_find_datasets_by_relevance_without_text_terms(self):
+        self._driver.add_dataset(helpers.new_test_dataset(2))
+        self._driver.add_dataset(helpers.new_test_dataset(1))
+
+        result = self._driver.find_datasets(DatasetQuery(sort="relevance"))
+        self.assertEqual(["archive/dataset-1.txt", "archive/dataset-2.txt"],
+                         [dataset_ref.path for dataset_ref in result.datasets])
+        self.assertIsNone(result.datasets[0].score)
+
+    def test_has_text_filter(self):
+        self.assertFalse(MongoDbDriver._has_text_filter({}))
+        self.assertFalse(MongoDbDriver._has_text_filter({"metadata.cruise": "ABC"}))
+        self.assertTrue(MongoDbDriver._has_text_filter({"$text": {"$search": "ABC"}}))
+        self.assertTrue(MongoDbDriver._has_text_filter({"$and": [{"status": "PUBLISHED"},
+                                                                 {"$text": {"$search": "ABC"}}]}))
+
+    def test_data_generation(self):
+        # reading the generation of an unchanged database writes nothing
+        generation = self._driver.get_data_generation()
+        self.assertEqual(generation, self._driver.get_data_generation())
+        self.assertEqual(0, self._driver._generation_collection.count_documents({}))
+
+        dataset_id = self._driver.add_dataset(helpers.new_test_dataset(0))
+        self.assertNotEqual(generation, self._driver.get_data_generation())
+
+        # a driver of another service process using the same database
+        other_driver = MongoDbDriver()
+        other_driver._use_shared_client(self._driver._shared_client)
+        generation = self._driver.get_data_generation()
+        self.assertEqual(generation, other_driver.get_data_generation())
+        other_driver.update_dataset_qc_info(dataset_id, QcInfo(QC_STATUS_VALIDATED))
+        self.assertNotEqual(generation, self._driver.get_data_generation())
+        generation = self._driver.get_data_generation()
+        other_driver.delete_dataset(dataset_id)
+        self.assertNotEqual(generation, self._driver.get_data_generation())
+
+        # a recreated database starts a new epoch
+        generation = self._driver.get_data_generation()
+        self._driver.clear()
+        self._driver.add_dataset(helpers.new_test_dataset(0))
+        self.assertNotEqual(generation.split("-")[0], self._driver.get_data_generation().split("-")[0])
 
     def test_get_submissions_no_results(self):
         result = self._driver.get_submissions_for_user('887620')
@@ -1028,6 +1520,139 @@ class TestMongoDbDriver(unittest.TestCase):
         self.assertEqual(QC_STATUS_APPROVED, submission.status)
         self.assertEqual(QC_STATUS_VALIDATED, submission.qc_status)
 
+    def test_update_submission_fields(self):
+        files = [SubmissionFile(index=i, submission_id="dunno_", filename=f"file-{i}", filetype="measurement",
+                                status="OK", result=None) for i in range(2)]
+        submission = DbSubmission(submission_id="dunno_", date=datetime(2019, 2, 22, 11, 14, 33), user_id='5876123',
+                                  status=QC_STATUS_SUBMITTED, qc_status="OK", path="/root", files=files,
+                                  store_sub_path='Tom_Helge')
+        self._driver.add_submission(submission)
+
+        submission_1 = self._driver.get_submission("dunno_")
+        submission_2 = self._driver.get_submission("dunno_")
+        self.assertEqual(0, submission_1.version)
+
+        submission_1.files[1].status = "ERROR"
+        submission_1.status = QC_STATUS_APPROVED
+        self.assertTrue(self._driver.update_submission_fields(submission_1, ["files.1.status"], check_version=True))
+        self.assertEqual(1, submission_1.version)
+
+        # only the named fields are written, submission_2 is outdated
+        submission_2.files[0].status = "WARNING"
+        self.assertFalse(self._driver.update_submission_fields(submission_2, ["files.0.status"], check_version=True))
+        self.assertTrue(self._driver.update_submission_fields(submission_2, ["files.0.status"]))
+        self.assertEqual(1, submission_2.version)
+
+        submission = self._driver.get_submission("dunno_")
+        self.assertEqual(2, submission.version)
+        self.assertEqual(QC_STATUS_SUBMITTED, submission.status)
+        self.assertEqual(["WARNING", "ERROR"], [file.status for file in submission.files])
+
+        self.assertTrue(self._driver.update_submission(submission))
+        self.assertEqual(3, self._driver.get_submission("dunno_").version)
+
+        # the whole submission is only replaced if it has not changed since it was read
+        self.assertFalse(self._driver.update_submission(submission_1))
+        self.assertEqual(["WARNING", "ERROR"], [file.status for file in self._driver.get_submission("dunno_").files])
+
+    def test_update_dataset_qc_info(self):
+        dataset_id = self._driver.add_dataset(helpers.new_test_db_dataset(7))
+
+        qc_info = QcInfo(QC_STATUS_VALIDATED, dict(by="Illaria"))
+        self.assertTrue(self._driver.update_dataset_qc_info(dataset_id, qc_info))
+        dataset = self._driver.get_dataset(dataset_id)
+        self.assertEqual(qc_info.to_dict(), dataset.metadata["qc_info"])
+        self.assertEqual([[8.2, 9.3, 10.4], [11.5, 12.6, 13.7]], dataset.records)
+
+        self.assertFalse(self._driver.update_dataset_qc_info("5c5d9e6d3f46b07a4d1f5c2e", qc_info))
+
+    def test_submission_file_issues(self):
+        issues = [Issue("ERROR" if i % 3 else "WARNING", f"Issue {i}") for i in range(25)]
+        files = [SubmissionFile(index=0, submission_id="dunno_", filename="file-0", filetype="measurement",
+                                status="ERROR", result=DatasetValidationResult("ERROR", issues)),
+                 SubmissionFile(index=1, submission_id="dunno_", filename="file-1", filetype="measurement",
+                                status="ERROR", result=DatasetValidationResult("ERROR", issues[:2]))]
+        submission = DbSubmission(submission_id="dunno_", date=datetime(2019, 2, 22, 11, 14, 33), user_id='5876123',
+                                  status=QC_STATUS_SUBMITTED, qc_status="OK", path="/root", files=files,
+                                  store_sub_path='Tom_Helge')
+        self._driver.add_submission(submission)
+
+        submission = self._driver.get_submission("dunno_")
+        issue_dicts = [issue.to_dict() for issue in issues]
+        issues_id = submission.files[0].result.get("issues_id")
+        self.assertIsNotNone(issues_id)
+        self.assertEqual(dict(status="ERROR", issues=issue_dicts[:INLINE_ISSUES_COUNT],
+                              issue_counts={"ERROR": 16, "WARNING": 9}, issues_id=issues_id),
+                         submission.files[0].result)
+        self.assertEqual(dict(status="ERROR", issues=issue_dicts[:2]), submission.files[1].result)
+
+        self.assertEqual((25, issues[20:]), self._driver.get_submission_file_issues("dunno_", 0, offset=20))
+        self.assertEqual((25, issues[5:8]), self._driver.get_submission_file_issues("dunno_", 0, offset=5, count=3))
+        self.assertEqual((2, issues[1:2]), self._driver.get_submission_file_issues("dunno_", 1, offset=1))
+        self.assertIsNone(self._driver.get_submission_file_issues("dunno_", 2))
+        self.assertIsNone(self._driver.get_submission_file_issues("nope", 0))
+
+        # the stored issues survive updates of the submission as read
+        submission.submission_id = "dunno_2"
+        self.assertTrue(self._driver.update_submission(submission))
+        self.assertEqual((25, issues[:3]), self._driver.get_submission_file_issues("dunno_2", 0, count=3))
+
+        submission.files[0].result = DatasetValidationResult("OK", [])
+        self.assertTrue(self._driver.update_submission_fields(submission, ["files.0"]))
+        self.assertEqual((0, []), self._driver.get_submission_file_issues("dunno_2", 0))
+
+        self._driver.delete_submission("dunno_2")
+        self.assertIsNone(self._driver.get_submission_file_issues("dunno_2", 0))
+        self.assertEqual(0, self._driver._issues_collection.count_documents({}))
+
+    def test_submission_file_issues_of_failed_update(self):
+        issues = [Issue("ERROR", f"Issue {i}") for i in range(15)]
+        new_issues = [Issue("WARNING", f"New issue {i}") for i in range(12)]
+        files = [SubmissionFile(index=0, submission_id="dunno_", filename="file-0", filetype="measurement",
+                                status="ERROR", result=DatasetValidationResult("ERROR", issues))]
+        submission = DbSubmission(submission_id="dunno_", date=datetime(2019, 2, 22, 11, 14, 33), user_id='5876123',
+                                  status=QC_STATUS_SUBMITTED, qc_status="OK", path="/root", files=files,
+                                  store_sub_path='Tom_Helge')
+        self._driver.add_submission(submission)
+
+        submission_1 = self._driver.get_submission("dunno_")
+        submission_2 = self._driver.get_submission("dunno_")
+        self.assertTrue(self._driver.update_submission_fields(submission_1, ["status"], check_version=True))
+
+        # submission_2 is outdated, so neither its result nor its issues are written
+        submission_2.files[0].result = DatasetValidationResult("WARNING", new_issues)
+        self.assertFalse(self._driver.update_submission_fields(submission_2, ["files.0"], check_version=True))
+        self.assertFalse(self._driver.update_submission(submission_2))
+        self.assertEqual((15, issues), self._driver.get_submission_file_issues("dunno_", 0))
+        self.assertEqual(15, self._driver._issues_collection.count_documents({}))
+
+        # the issues of the replaced result are deleted
+        submission_1.files[0].result = DatasetValidationResult("WARNING", new_issues)
+        self.assertTrue(self._driver.update_submission_fields(submission_1, ["files.0"], check_version=True))
+        self.assertEqual((12, new_issues), self._driver.get_submission_file_issues("dunno_", 0))
+        self.assertEqual(12, self._driver._issues_collection.count_documents({}))
+
+    def test_submission_file_issues_of_former_version(self):
+        issues = [Issue("ERROR", f"Issue {i}") for i in range(15)]
+        files = [SubmissionFile(index=0, submission_id="dunno_", filename="file-0", filetype="measurement",
+                                status="ERROR", result=DatasetValidationResult("ERROR", issues))]
+        self._driver.add_submission(DbSubmission(submission_id="dunno_", date=datetime(2019, 2, 22, 11, 14, 33),
+                                                 user_id='5876123', status=QC_STATUS_SUBMITTED, qc_status="OK",
+                                                 path="/root", files=files, store_sub_path='Tom_Helge'))
+        # issues stored before issues IDs were introduced
+        self._driver._submit_collection.update_one({}, {"$unset": {"files.0.result.issues_id": True}})
+        self._driver._issues_collection.update_many({}, {"$unset": {"issues_id": True}})
+        self.assertEqual((15, issues[10:]), self._driver.get_submission_file_issues("dunno_", 0, offset=10))
+
+        submission = self._driver.get_submission("dunno_")
+        submission.submission_id = "dunno_2"
+        self.assertTrue(self._driver.update_submission(submission))
+        self.assertEqual((15, issues[:2]), self._driver.get_submission_file_issues("dunno_2", 0, count=2))
+
+        submission.files[0].result = DatasetValidationResult("OK", [])
+        self.assertTrue(self._driver.update_submission(submission))
+        self.assertEqual(0, self._driver._issues_collection.count_documents({}))
+
     def test_insert_submission_and_delete(self):
         # insert
         submission_id = "dunno_"
@@ -101,3 +101,38 @@ class TestMongoQueryConverter(unittest.TestCase):
 
         mongo_dict = self.converter.to_dict(query)
         self.assertEqual({'metadata.data_type': 'brdf'}, mongo_dict)
+
+    def test_to_dict_wdepth(self):
+        query = DatasetQuery(wdepth=[5.0, 20.0])
+
+        mongo_dict = self.converter.to_dict(query)
+        self.assertEqual({'max_depth': {'$gte': 5.0}, 'min_depth': {'$lte': 20.0}}, mongo_dict)
+
+    def test_to_dict_wdepth_open_ended(self):
+        mongo_dict = self.converter.to_dict(DatasetQuery(wdepth=[None, 20.0]))
+        self.assertEqual({'min_depth': {'$lte': 20.0}}, mongo_dict)
+
+        mongo_dict = self.converter.to_dict(DatasetQuery(wdepth=[5.0, None]))
+        self.assertEqual({'max_depth': {'$gte': 5.0}}, mongo_dict)
+
+        with self.assertRaises(ValueError):
+            self.converter.to_dict(DatasetQuery(wdepth=[None, None]))
+
+    def test_to_dict_wlmode(self):
+        mongo_dict = self.converter.to_dict(DatasetQuery(wlmode='all'))
+        self.assertEqual({}, mongo_dict)
+
+        mongo_dict = self.converter.to_dict(DatasetQuery(wlmode='hyperspectral'))
+        self.assertEqual({'wlmode': 'hyperspectral'}, mongo_dict)
+
+    def test_to_dict_pgroup_dont_apply(self):
+        query = DatasetQuery(pgroup=["sal"], pmode='dont_apply')
+
+        mongo_dict = self.converter.to_dict(query)
+        self.assertEqual({}, mongo_dict)
+
+    def test_to_dict_pgroup_same_cruise_without_collection(self):
+        query = DatasetQuery(pgroup=["sal"], pmode='same_cruise')
+
+        mongo_dict = self.converter.to_dict(query)
+        self.assertEqual({'groups': {'$in': ['sal']}}, mongo_dict)
@@ -0,0 +1,65 @@
+import unittest
+
+import numpy as np
+
+from eocdb.db.packed_records import pack_records, unpack_records, unpack_columns
+
+
+class PackedRecordsTest(unittest.TestCase):
+
+    def test_pack_unpack(self):
+        records = [[109.8, 998, "a", 1, None],
+                   [109.9, 999, "b", 1.5, None]]
+        packed = pack_records(records)
+        self.assertEqual(2, packed["num_rows"])
+        columns = packed["columns"]
+        self.assertEqual(dict(dtype="<f8", compression=None, data=np.array([109.8, 109.9]).tobytes()), columns[0])
+        self.assertEqual("<i8", columns[1]["dtype"])
+        self.assertEqual(dict(values=["a", "b"]), columns[2])
+        self.assertEqual("<f8", columns[3]["dtype"])
+        self.assertEqual(dict(values=[None, None]), columns[4])
+
+        self.assertEqual([[109.8, 998, "a", 1.0, None],
+                          [109.9, 999, "b", 1.5, None]], unpack_records(packed))
+
+    def test_unpack_columns(self):
+        columns = unpack_columns(pack_records([[1.5, 2], [2.5, 3]], compression="zlib"))
+        self.assertIsInstance(columns[0], np.ndarray)
+        self.assertEqual(np.float64, columns[0].dtype)
+        np.testing.assert_equal(np.array([1.5, 2.5]), columns[0])
+        self.assertEqual(np.int64, columns[1].dtype)
+        np.testing.assert_equal(np.array([2, 3]), columns[1])
+
+    def test_unpack_selected_columns(self):
+        packed = pack_records([[1.5, "a", 2], [2.5, "b", 3]])
+        self.assertEqual([[2, 1.5], [3, 2.5]], unpack_records(packed, columns=[2, 0]))
+        self.assertEqual([["a"], ["b"]], unpack_records(packed, columns=[1]))
+        self.assertEqual(1, len(unpack_columns(packed, columns=[0])))
+
+    def test_float32(self):
+        packed = pack_records([[0.1], [0.2]], float_dtype="float32")
+        self.assertEqual(8, len(packed["columns"][0]["data"]))
+        records = unpack_records(packed)
+        self.assertAlmostEqual(0.1, records[0][0], places=6)
+        self.assertAlmostEqual(0.2, records[1][0], places=6)
+
+    def test_zlib(self):
+        records = [[float(i % 3)] for i in range(1000)]
+        packed = pack_records(records, compression="zlib")
+        self.assertLess(len(packed["columns"][0]["data"]), 8 * 1000)
+        self.assertEqual(records, unpack_records(packed))
+
+    def test_cannot_pack(self):
+        self.assertIsNone(pack_records([[1.5, 2], [2.5]]))
+        self.assertEqual(dict(values=[2 ** 70, 1]), pack_records([[2 ** 70], [1]])["columns"][0])
+
+    def test_no_records(self):
+        packed = pack_records([])
+        self.assertEqual(dict(num_rows=0, columns=[]), packed)
+        self.assertEqual([], unpack_records(packed))
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            pack_records([[1.5]], float_dtype="float16")
+        with self.assertRaises(ValueError):
+            pack_records([[1.5]], compression="lz4")
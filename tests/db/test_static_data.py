@@ -23,7 +23,8 @@ class StaticDataTest(unittest.TestCase):
 
     def test_get_products(self):
         fields = get_products()
-        self.assertIsInstance(fields, list)
+        self.assertIs(fields, get_products())
+        self.assertIsInstance(fields, tuple)
         self.assertTrue(len(fields) > 300)
         for field in fields:
             self.assert_valid_field(field)
@@ -35,7 +36,7 @@ class StaticDataTest(unittest.TestCase):
     def test_get_fields(self):
         fields = get_fields()
         self.assertIs(fields, get_fields())
-        self.assertIsInstance(fields, list)
+        self.assertIsInstance(fields, tuple)
         self.assertTrue(len(fields) > 300)
         for field in fields:
             self.assert_valid_field(field)
@@ -54,6 +55,15 @@ class StaticDataTest(unittest.TestCase):
     def test_get_group_for_product_numbers_stripped(self):
         self.assertEqual(["a"], get_groups_for_product("abs_ag676"))
 
+    def test_get_group_for_product_wildcards(self):
+        self.assertEqual(["Chl"], get_groups_for_product("Chl_extra"))
+        self.assertEqual(["a"], get_groups_for_product("stdev_abs_ap412"))
+        self.assertEqual([], get_groups_for_product("xabs_ag676"))
+
+    def test_get_group_for_product_is_memoized(self):
+        groups = get_groups_for_product("abs_ag443")
+        self.assertIs(groups, get_groups_for_product("abs_ag443"))
+
     def assert_valid_field(self, field):
         self.assertIsInstance(field, dict)
         self.assertEqual(4, len(field))
@@ -20,10 +20,17 @@
 # SOFTWARE.
 
 
+import concurrent.futures
+import datetime
+import time
 import unittest
+import unittest.mock
 
+from eocdb.core.db.errors import OperationalError
 from eocdb.core.models.qc_info import QC_STATUS_VALIDATED, QC_STATUS_PUBLISHED
 from eocdb.ws.controllers.datasets import *
+from eocdb.db.mongo_db_driver import MongoDbDriver
+from eocdb.ws.context import WsContext, SEARCH_TIMEOUT_CONFIG_NAME
 from tests.helpers import new_test_service_context, new_test_dataset
 
 
@@ -185,6 +192,125 @@ class DatasetsTest(unittest.TestCase):
         self.assertIsInstance(result, DatasetQueryResult)
         self.assertEqual(1, result.total_count)
 
+    def test_get_dataset_tile(self):
+        dataset = new_test_dataset(1)
+        dataset.longitudes = [104, 105]
+        dataset.latitudes = [22, 23]
+        add_dataset(self.ctx, dataset=dataset)
+
+        dataset = new_test_dataset(2)
+        dataset.longitudes = [-114]
+        dataset.latitudes = [32]
+        add_dataset(self.ctx, dataset=dataset)
+
+        result = get_dataset_tile(self.ctx, 0, 0, 0)
+        self.assertEqual(dict(z=0, x=0, y=0, total_count=2), {k: v for k, v in result.items() if k != 'clusters'})
+        self.assertEqual(2, len(result['clusters']))
+        self.assertEqual([1, 2], sorted(cluster['count'] for cluster in result['clusters']))
+        for cluster in result['clusters']:
+            self.assertTrue(cluster['tile'].startswith('3/'))
+
+        result = get_dataset_tile(self.ctx, 1, 1, 0)
+        self.assertEqual(1, result['total_count'])
+        self.assertEqual(2, result['clusters'][0]['count'])
+        self.assertEqual(1, result['clusters'][0]['datasets'])
+
+        result = get_dataset_tile(self.ctx, 1, 1, 1)
+        self.assertEqual(dict(z=1, x=1, y=1, total_count=0, clusters=[]), result)
+
+    def test_get_dataset_tile_cached(self):
+        dataset = new_test_dataset(1)
+        dataset.longitudes = [104]
+        dataset.latitudes = [22]
+        add_dataset(self.ctx, dataset=dataset)
+
+        result = get_dataset_tile(self.ctx, 0, 0, 0)
+        self.assertEqual(1, result['total_count'])
+        self.assertIs(result, get_dataset_tile(self.ctx, 0, 0, 0))
+
+        dataset = new_test_dataset(2)
+        dataset.longitudes = [105]
+        dataset.latitudes = [23]
+        add_dataset(self.ctx, dataset=dataset)
+
+        result = get_dataset_tile(self.ctx, 0, 0, 0)
+        self.assertEqual(2, result['total_count'])
+
+    def test_get_dataset_tile_invalid(self):
+        with self.assertRaises(WsBadRequestError) as cm:
+            get_dataset_tile(self.ctx, 13, 0, 0)
+        self.assertEqual('HTTP 400: Zoom level must be in the range 0 to 12', f"{cm.exception}")
+        with self.assertRaises(WsBadRequestError) as cm:
+            get_dataset_tile(self.ctx, 1, 2, 0)
+        self.assertEqual('HTTP 400: Tile 1/2/0 does not exist', f"{cm.exception}")
+
+    def test_iter_datasets(self):
+        dataset_ids = [add_dataset(self.ctx, dataset=new_test_dataset(i)).id for i in range(3)]
+        dataset = new_test_dataset(3)
+        dataset.submission_id = "xyz"
+        add_dataset(self.ctx, dataset=dataset)
+
+        datasets = list(iter_datasets(self.ctx, submission_id="abc"))
+        self.assertEqual([dict(id=dataset_ids[i], path=f"archive/dataset-{i}.txt") for i in range(3)], datasets)
+
+        datasets = list(iter_datasets(self.ctx, submission_id="xyz", projection=["submission_id"]))
+        self.assertEqual(["xyz"], [dataset["submission_id"] for dataset in datasets])
+
+    def test_get_dataset_records(self):
+        dataset = new_test_dataset(1)
+        dataset.attributes = ["i", "x", "s"]
+        dataset.records = [[i, i + 0.5, f"s{i}"] for i in range(5)]
+        dataset_id = add_dataset(self.ctx, dataset=dataset).id
+
+        column_names, batches = get_dataset_records(self.ctx, dataset_id)
+        self.assertEqual(["i", "x", "s"], column_names)
+        self.assertEqual([dataset.records], list(batches))
+
+        column_names, batches = get_dataset_records(self.ctx, dataset_id, columns=["s", "i"], offset=1, count=2)
+        self.assertEqual(["s", "i"], column_names)
+        self.assertEqual([[["s1", 1], ["s2", 2]]], list(batches))
+
+        with unittest.mock.patch("eocdb.ws.controllers.datasets.RECORDS_BATCH_SIZE", 2):
+            _, batches = get_dataset_records(self.ctx, dataset_id, columns=["i"], offset=1)
+            self.assertEqual([[[1], [2]], [[3], [4]]], list(batches))
+
+        with self.assertRaises(WsBadRequestError) as cm:
+            get_dataset_records(self.ctx, dataset_id, columns=["i", "y"])
+        self.assertEqual("HTTP 400: Dataset has no column(s) y", f"{cm.exception}")
+        with self.assertRaises(WsBadRequestError):
+            get_dataset_records(self.ctx, dataset_id, offset=-1)
+        with self.assertRaises(WsResourceNotFoundError):
+            get_dataset_records(self.ctx, "5c5d9e6d3f46b07a4d1f5c2e")
+
+    def test_get_dataset_records_in_time_window(self):
+        dataset = new_test_dataset(1)
+        dataset.attributes = ["i"]
+        dataset.records = [[i] for i in range(5)]
+        dataset.times = [datetime.datetime(2016, 5, 1, hour) for hour in (10, 14, 11, 12, 13)]
+        dataset_id = add_dataset(self.ctx, dataset=dataset).id
+
+        _, batches = get_dataset_records(self.ctx, dataset_id, time=["2016-05-01T11:00:00", "2016-05-01T12:30:00"])
+        self.assertEqual([[[2], [3]]], list(batches))
+
+        _, batches = get_dataset_records(self.ctx, dataset_id, time=["2016-05-01T12:00:00", None], offset=1)
+        self.assertEqual([[[3], [4]]], list(batches))
+
+        _, batches = get_dataset_records(self.ctx, dataset_id, time=[None, "2016-05-01T09:00:00"])
+        self.assertEqual([], list(batches))
+
+        with self.assertRaises(WsBadRequestError):
+            get_dataset_records(self.ctx, dataset_id, time=["yesterday", None])
+
+        dataset = new_test_dataset(2)
+        dataset.attributes = ["a", "b", "c"]
+        dataset.times = [datetime.datetime(2016, 5, 1, 10)]
+        dataset_id = add_dataset(self.ctx, dataset=dataset).id
+
+        _, batches = get_dataset_records(self.ctx, dataset_id, time=["2016-05-01T00:00:00", "2016-05-02T00:00:00"])
+        self.assertEqual([dataset.records], list(batches))
+        _, batches = get_dataset_records(self.ctx, dataset_id, time=["2016-05-02T00:00:00", None])
+        self.assertEqual([], list(batches))
+
     def test_find_datasets_with_geolocations(self):
         dataset = new_test_dataset(1)
         dataset.longitudes = [104, 105]
@@ -235,9 +361,9 @@ class DatasetsTest(unittest.TestCase):
         self.assertEqual(1, result.total_count)
         self.assertEqual(1, len(result.locations))
         ds_id = result.datasets[0].id
-        self.assertEqual("{'type':'FeatureCollection','features':["
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[114,32]}},"
-                         "{'type':'Feature','geometry':{'type':'Point','coordinates':[115,33]}}]}",
+        self.assertEqual('{"type":"FeatureCollection","features":['
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[114,32]}},'
+                         '{"type":"Feature","geometry":{"type":"Point","coordinates":[115,33]}}]}',
                          result.locations[ds_id])
 
     def test_get_dataset_by_id(self):
@@ -326,3 +452,114 @@ class DatasetsTest(unittest.TestCase):
         set_dataset_qc_info(self.ctx, dataset_id, expected_qc_info)
         qc_info = get_dataset_qc_info(self.ctx, dataset_id)
         self.assertEqual(expected_qc_info, qc_info)
+
+        with self.assertRaises(WsResourceNotFoundError):
+            set_dataset_qc_info(self.ctx, "5c5d9e6d3f46b07a4d1f5c2e", expected_qc_info)
+
+
+class SlowMongoDbDriver(MongoDbDriver):
+
+    def find_datasets(self, query: DatasetQuery, timeout: float = None) -> DatasetQueryResult:
+        # like MongoDB with maxTimeMS, give up once the time limit is exceeded
+        if timeout is not None and timeout < 0.5:
+            time.sleep(timeout)
+            raise OperationalError("operation exceeded time limit")
+        time.sleep(0.5)
+        return super().find_datasets(query, timeout=timeout)
+
+
+class FederatedDatasetsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ctx = WsContext()
+        self.ctx.configure(dict(databases=dict(db_1=dict(type="eocdb.db.mongo_db_driver.MongoDbDriver",
+                                                         primary=True,
+                                                         search_timeout=5.,
+                                                         parameters=dict(mock=True)),
+                                               db_2=dict(type=f"{__name__}.SlowMongoDbDriver",
+                                                         parameters=dict(mock=True)))))
+        db_driver_1 = self.ctx._db_drivers.get_service("db_1")
+        db_driver_2 = self.ctx._db_drivers.get_service("db_2")
+        for n in (1, 3, 5):
+            db_driver_1.add_dataset(new_test_dataset(n))
+        for n in (2, 4, 6):
+            db_driver_2.add_dataset(new_test_dataset(n))
+
+    def tearDown(self):
+        self.ctx.dispose()
+
+    def test_data_generation_of_primary_only(self):
+        generation = self.ctx.data_generation
+        self.ctx._db_drivers.get_service("db_2").add_dataset(new_test_dataset(8))
+        self.assertEqual(generation, self.ctx.data_generation)
+        self.ctx._db_drivers.get_service("db_1").add_dataset(new_test_dataset(7))
+        self.assertNotEqual(generation, self.ctx.data_generation)
+
+    def test_find_datasets_merged(self):
+        result = find_datasets(self.ctx)
+        self.assertEqual(6, result.total_count)
+        self.assertEqual([f"archive/dataset-{n}.txt" for n in range(1, 7)],
+                         [dataset_ref.path for dataset_ref in result.datasets])
+
+    def test_find_datasets_merged_page(self):
+        result = find_datasets(self.ctx, offset=2, count=3)
+        self.assertEqual(6, result.total_count)
+        self.assertEqual(["archive/dataset-2.txt", "archive/dataset-3.txt", "archive/dataset-4.txt"],
+                         [dataset_ref.path for dataset_ref in result.datasets])
+
+        result = find_datasets(self.ctx, offset=6, count=3)
+        self.assertEqual(6, result.total_count)
+        self.assertEqual(["archive/dataset-6.txt"],
+                         [dataset_ref.path for dataset_ref in result.datasets])
+
+    def test_find_datasets_merged_count_only(self):
+        result = find_datasets(self.ctx, count=0)
+        self.assertEqual(6, result.total_count)
+        self.assertEqual([], result.datasets)
+
+    def test_find_datasets_merged_with_geolocations(self):
+        result = find_datasets(self.ctx, geojson=True, offset=5, count=2)
+        self.assertEqual(2, len(result.datasets))
+        self.assertEqual({dataset_ref.id for dataset_ref in result.datasets}, set(result.locations.keys()))
+
+    def test_find_datasets_merged_by_relevance(self):
+        find_datasets_by_path = MongoDbDriver.find_datasets
+
+        def find_datasets_scored(db_driver, query, timeout=None):
+            result = find_datasets_by_path(db_driver, query, timeout=timeout)
+            for dataset_ref in result.datasets:
+                # odd datasets match better
+                dataset_ref.score = 1.0 if int(dataset_ref.path[-5]) % 2 == 0 else 2.0
+            return result
+
+        with unittest.mock.patch.object(MongoDbDriver, "find_datasets", find_datasets_scored):
+            result = find_datasets(self.ctx, sort="relevance", offset=2, count=4)
+        self.assertEqual(6, result.total_count)
+        self.assertEqual(["archive/dataset-3.txt", "archive/dataset-5.txt", "archive/dataset-2.txt",
+                          "archive/dataset-4.txt"],
+                         [dataset_ref.path for dataset_ref in result.datasets])
+        self.assertEqual({"id": result.datasets[0].id, "path": "archive/dataset-3.txt", "score": 2.0},
+                         result.datasets[0].to_dict())
+
+    def test_find_datasets_invalid_sort(self):
+        with self.assertRaises(ValueError):
+            find_datasets(self.ctx, sort="score")
+
+    def test_find_datasets_skips_slow_database(self):
+        self.ctx.configure(dict(self.ctx.config, **{SEARCH_TIMEOUT_CONFIG_NAME: 0.1}))
+
+        result = find_datasets(self.ctx)
+        self.assertEqual(3, result.total_count)
+        self.assertEqual(["archive/dataset-1.txt", "archive/dataset-3.txt", "archive/dataset-5.txt"],
+                         [dataset_ref.path for dataset_ref in result.datasets])
+
+    def test_find_datasets_does_not_starve_thread_pool(self):
+        self.ctx.configure(dict(self.ctx.config, **{SEARCH_TIMEOUT_CONFIG_NAME: 0.1}))
+        self.ctx._thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+        for _ in range(4):
+            result = find_datasets(self.ctx)
+            self.assertEqual(3, result.total_count)
+
+        # the timed out searches have released their workers
+        self.ctx.thread_pool.submit(lambda: None).result(timeout=0.2)
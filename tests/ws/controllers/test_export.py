@@ -0,0 +1,106 @@
+# The MIT License (MIT)
+# Copyright (c) 2018 by EUMETSAT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import io
+import json
+import unittest
+
+from eocdb.ws.controllers.datasets import add_dataset
+from eocdb.ws.controllers.export import *
+from eocdb.ws.controllers.export import _get_column_types
+from tests.helpers import new_test_service_context, new_test_dataset
+
+
+class ExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ctx = new_test_service_context()
+        dataset_1 = new_test_dataset(0)
+        dataset_1.attributes = ["a", "b"]
+        dataset_1.records = [[1.5, "x"], [2.5, "y"]]
+        dataset_1.metadata["cruise"] = "cruise-1"
+        dataset_1.metadata["station"] = "st1"
+        self.dataset_id_1 = add_dataset(self.ctx, dataset_1).id
+        dataset_2 = new_test_dataset(1)
+        dataset_2.attributes = ["b", "c"]
+        dataset_2.records = [["z", 3]]
+        dataset_2.metadata["cruise"] = "cruise-2"
+        self.dataset_id_2 = add_dataset(self.ctx, dataset_2).id
+
+    def test_export_csv(self):
+        data = b"".join(export_store_records(self.ctx, fmt="csv")).decode("utf-8")
+        self.assertEqual("dataset_id,cruise,station,a,b,c\n"
+                         f"{self.dataset_id_1},cruise-1,st1,1.5,x,\n"
+                         f"{self.dataset_id_1},cruise-1,st1,2.5,y,\n"
+                         f"{self.dataset_id_2},cruise-2,,,z,3\n", data)
+
+    def test_export_json_lines(self):
+        data = b"".join(export_store_records(self.ctx, fmt="jsonl")).decode("utf-8")
+        self.assertEqual([dict(dataset_id=self.dataset_id_1, cruise="cruise-1", station="st1", a=1.5, b="x"),
+                          dict(dataset_id=self.dataset_id_1, cruise="cruise-1", station="st1", a=2.5, b="y"),
+                          dict(dataset_id=self.dataset_id_2, cruise="cruise-2", station=None, b="z", c=3)],
+                         [json.loads(line) for line in data.splitlines()])
+
+    def test_export_status(self):
+        data = b"".join(export_store_records(self.ctx, status="VALIDATED", fmt="csv")).decode("utf-8")
+        self.assertEqual("dataset_id,cruise,station\n", data)
+
+    def test_export_invalid_format(self):
+        with self.assertRaises(WsBadRequestError) as cm:
+            export_store_records(self.ctx, fmt="xls")
+        self.assertEqual("HTTP 400: Format must be one of csv, jsonl, arrow, parquet", f"{cm.exception}")
+
+    def test_get_column_types(self):
+        # a non-numeric value after the first record makes a column a string column, so it is not lost
+        batches = [(None, [[1.5, 1.0, 1, None], [2, 2.0, 2, None]]),
+                   (None, [[3, "n/a", None, None], [None, 4.0, True, None]])]
+        self.assertEqual(dict(a="float", b="string", c="string", d="float"),
+                         _get_column_types(["a", "b", "c", "d"], iter(batches)))
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_export_arrow(self):
+        data = b"".join(export_store_records(self.ctx, fmt="arrow"))
+        table = pyarrow.ipc.open_stream(data).read_all()
+        self.assertEqual(PROVENANCE_COLUMNS + ["a", "b", "c"], table.column_names)
+        self.assertEqual([1.5, 2.5, None], table.column("a").to_pylist())
+        self.assertEqual([None, None, 3.0], table.column("c").to_pylist())
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_export_arrow_mixed_column(self):
+        dataset = new_test_dataset(2)
+        dataset.attributes = ["a"]
+        dataset.records = [[3.5], ["n/a"]]
+        add_dataset(self.ctx, dataset)
+        data = b"".join(export_store_records(self.ctx, fmt="arrow"))
+        table = pyarrow.ipc.open_stream(data).read_all()
+        self.assertEqual(["1.5", "2.5", None, "3.5", "n/a"], table.column("a").to_pylist())
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_export_parquet(self):
+        data = b"".join(export_store_records(self.ctx, fmt="parquet"))
+        table = pyarrow.parquet.read_table(io.BytesIO(data))
+        self.assertEqual(["x", "y", "z"], table.column("b").to_pylist())
+
+    @unittest.skipIf(pyarrow is not None, "pyarrow is installed")
+    def test_export_arrow_unavailable(self):
+        with self.assertRaises(WsBadRequestError):
+            export_store_records(self.ctx, fmt="arrow")
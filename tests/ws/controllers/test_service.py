@@ -43,3 +43,12 @@ class ServiceTest(unittest.TestCase):
         self.assertIsNotNone(result["info"].get("description"))
         self.assertEqual("RESTful API for the EUMETSAT Ocean C",
                          result["info"].get("description")[0:36])
+
+    def test_get_metrics(self):
+        result = get_metrics(self.ctx)
+        self.assertIsInstance(result, str)
+        self.assertIn("# TYPE ocdb_http_request_duration_seconds histogram\n", result)
+        self.assertIn("# TYPE ocdb_validator_rows_total counter\n", result)
+        self.assertIn("# TYPE ocdb_zip_bytes_streamed_total counter\n", result)
+        self.assertIn("\nocdb_executor_queue_depth 0\n", result)
+        self.assertIn('\nocdb_mongo_pool_connections{driver="0:MongoDbDriver",state="max_pool_size"} 100\n', result)
@@ -23,7 +23,8 @@ import unittest
 from eocdb.core.db.db_user import DbUser
 from eocdb.ws.controllers.store import *
 from eocdb.ws.controllers.store import _get_summary_validation_status
-from tests.helpers import new_test_service_context
+from eocdb.ws.controllers.datasets import add_dataset
+from tests.helpers import new_test_service_context, new_test_dataset
 
 
 class StoreTest(unittest.TestCase):
@@ -35,7 +36,7 @@ class StoreTest(unittest.TestCase):
         result = get_store_info(self.ctx)
         self.assertIsInstance(result, dict)
         self.assertIn("products", result)
-        self.assertIsInstance(result["products"], list)
+        self.assertIsInstance(result["products"], tuple)
         self.assertTrue(len(result["products"]) > 300)
         self.assertIsInstance(result["products"][0], dict)
         self.assertIn("productGroups", result)
@@ -306,6 +307,108 @@ class StoreTest(unittest.TestCase):
         finally:
             self.delete_test_file("DEL1012_Station_097_CTD_Data.txt")
 
+    def test_find_submissions(self):
+        for submission_id, user_id, status, day in [("s1", "77616", QC_STATUS_SUBMITTED, 3),
+                                                    ("s2", "77617", QC_STATUS_PUBLISHED, 1),
+                                                    ("s3", "77616", QC_STATUS_PUBLISHED, 2)]:
+            self.ctx.db_driver.add_submission(DbSubmission(submission_id=submission_id, user_id=user_id,
+                                                           date=datetime.datetime(2019, 5, day), status=status,
+                                                           qc_status="OK", path="a/b/c", files=[],
+                                                           store_sub_path="Tom_Helge"))
+        admin = DbUser(id_="1", name='admin', password='abc', first_name='', last_name='', phone='', email='',
+                       roles=['admin'])
+        user = DbUser(id_="77616", name='scott', password='abc', first_name='Scott', last_name='Tiger',
+                      phone='', email='', roles=['submit'])
+
+        total_count, result = find_submissions(ctx=self.ctx, user=admin, order="desc", count=2)
+        self.assertEqual(3, total_count)
+        self.assertEqual(["s1", "s3"], [subm.submission_id for subm in result])
+
+        total_count, result = find_submissions(ctx=self.ctx, user=admin, status=QC_STATUS_PUBLISHED, offset=1)
+        self.assertEqual(2, total_count)
+        self.assertEqual(["s3"], [subm.submission_id for subm in result])
+
+        total_count, result = find_submissions(ctx=self.ctx, user=user, sort_by="status")
+        self.assertEqual(2, total_count)
+        self.assertEqual(["s3", "s1"], [subm.submission_id for subm in result])
+
+        total_count, result = find_submissions(ctx=self.ctx, user=user, user_id="77617")
+        self.assertEqual(0, total_count)
+        self.assertEqual([], result)
+
+        with self.assertRaises(WsBadRequestError) as cm:
+            find_submissions(ctx=self.ctx, user=admin, sort_by="path")
+        self.assertEqual("HTTP 400: Sort field must be one of date, status", f"{cm.exception}")
+
+        with self.assertRaises(WsBadRequestError):
+            find_submissions(ctx=self.ctx, user=admin, order="up")
+
+    def test_delete_and_publish_submission_read_datasets_from_primary(self):
+        db_driver = self.ctx.db_driver.instance()
+
+        def add_submission_datasets(submission_id: str) -> DbSubmission:
+            for i in range(2):
+                dataset = new_test_dataset(i)
+                dataset.submission_id = submission_id
+                add_dataset(self.ctx, dataset=dataset)
+            submission = DbSubmission(submission_id=submission_id, user_id="77616",
+                                      date=datetime.datetime(2019, 5, 3), status=QC_STATUS_VALIDATED,
+                                      qc_status="OK", path="a/b/c", files=[], store_sub_path="primary_reads")
+            self.ctx.db_driver.add_submission(submission)
+            return self.ctx.db_driver.get_submission(submission_id)
+
+        submission_1 = add_submission_datasets("s1")
+        submission_2 = add_submission_datasets("s2")
+        submission_3 = add_submission_datasets("s3")
+        os.makedirs(self.ctx.get_submission_path("primary_reads"), exist_ok=True)
+
+        search_collection = db_driver._search_collection
+        db_driver._search_collection = _UnusableCollection()
+        try:
+            self.assertTrue(update_submission(self.ctx, submission_1, QC_STATUS_PUBLISHED,
+                                              datetime.datetime(2019, 6, 1)))
+            self.assertTrue(update_submission(self.ctx, submission_2, QC_STATUS_CANCELED, None))
+            self.assertTrue(delete_submission(self.ctx, "s3"))
+        finally:
+            db_driver._search_collection = search_collection
+
+        for submission in [submission_1, submission_2, submission_3]:
+            self.assertEqual([], list(iter_datasets(self.ctx, submission_id=submission.submission_id)))
+
+    def test_delete_and_update_submission_file_concurrently(self):
+        files = [SubmissionFile(submission_id="s1", index=i, filename=f"doc-{i}.txt", filetype=TYPE_DOCUMENT,
+                                status=QC_STATUS_SUBMITTED, result=None) for i in range(3)]
+        self.ctx.db_driver.add_submission(DbSubmission(submission_id="s1", user_id="77616",
+                                                       date=datetime.datetime(2019, 5, 3), status=QC_STATUS_SUBMITTED,
+                                                       qc_status="OK", path="test_files/concurrent/docs", files=files,
+                                                       store_sub_path="Tom_Helge"))
+        new_file = UploadedFile("doc-2b.txt", "text", b"new text")
+        try:
+            # the deletion of file 0 would shift file 2, which has been replaced meanwhile
+            deleting = get_submission(self.ctx, "s1")
+            updating = get_submission(self.ctx, "s1")
+            self.assertIsNone(update_submission_file(self.ctx, updating, 2, new_file, TYPE_DOCUMENT))
+            with self.assertRaises(WsConflictError):
+                delete_submission_file(self.ctx, deleting, 0)
+            self.assertEqual(["doc-0.txt", "doc-1.txt", "doc-2b.txt"],
+                             [file.filename for file in get_submission(self.ctx, "s1").files])
+
+            # the replacement of file 2 would hit the former file 3 after the deletion of file 0
+            deleting = get_submission(self.ctx, "s1")
+            updating = get_submission(self.ctx, "s1")
+            self.assertTrue(delete_submission_file(self.ctx, deleting, 0))
+            result = update_submission_file(self.ctx, updating, 1, UploadedFile("doc-1b.txt", "text", b"new text"),
+                                            TYPE_DOCUMENT)
+            self.assertEqual(DATASET_VALIDATION_RESULT_STATUS_ERROR, result.status)
+            submission = get_submission(self.ctx, "s1")
+            self.assertEqual(["doc-1.txt", "doc-2b.txt"], [file.filename for file in submission.files])
+            self.assertEqual([0, 1], [file.index for file in submission.files])
+        finally:
+            docs_path = self.ctx.get_doc_files_upload_path("test_files/concurrent/docs")
+            for filename in ["doc-1b.txt", "doc-2b.txt"]:
+                if os.path.isfile(os.path.join(docs_path, filename)):
+                    os.remove(os.path.join(docs_path, filename))
+
     def test_get_summary_vaidation_status_no_results(self):
         self.assertEqual(DATASET_VALIDATION_RESULT_STATUS_OK, _get_summary_validation_status({}))
 
@@ -337,3 +440,10 @@ class StoreTest(unittest.TestCase):
                                    filename)
         if os.path.isfile(target_file):
             os.remove(target_file)
+
+
+class _UnusableCollection:
+    """Stands in for the search collection, which must not be used."""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"search collection used: {name}")
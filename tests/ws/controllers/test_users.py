@@ -103,6 +103,20 @@ class UsersTest(unittest.TestCase):
         result = update_user(self.ctx, 'scott', data=user)
         self.assertIs(result, True)
 
+    def test_update_user_invalidates_cached_user(self):
+        user = DbUser(id_='tt', name='scott', last_name='Scott', password='tiger', email='bruce.scott@gmail.com',
+                      first_name='Bruce', roles=[Roles.SUBMIT.value], phone='+34 5678901234')
+        create_user(self.ctx, user)
+        self.assertEqual([Roles.SUBMIT.value], self.ctx.get_user('scott').roles)
+
+        user.roles = [Roles.SUBMIT.value, Roles.ADMIN.value]
+        update_user(self.ctx, 'scott', data=user)
+        self.assertNotIn('scott', self.ctx._user_cache)
+
+        self.assertIsNotNone(self.ctx.get_user('scott'))
+        delete_user(self.ctx, 'scott')
+        self.assertNotIn('scott', self.ctx._user_cache)
+
     def test_delete_user(self):
         user = User(name='scott', last_name='Scott', password='tiger', email='bruce.scott@gmail.com',
                     first_name='Bruce', roles=[Roles.SUBMIT.value, Roles.ADMIN.value], phone='+34 5678901234')
@@ -19,9 +19,14 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import datetime
+import gzip
 import io
 import os
+import shutil
+import tempfile
+import threading
 import unittest
+import unittest.mock
 import urllib.parse
 import zipfile
 from typing import Optional
@@ -37,7 +42,7 @@ from eocdb.core.models.submission import Submission, TYPE_MEASUREMENT
 from eocdb.core.models.submission_file import SubmissionFile
 from eocdb.core.roles import Roles
 from eocdb.ws.app import new_application
-from eocdb.ws.controllers.datasets import add_dataset, get_dataset_qc_info
+from eocdb.ws.controllers.datasets import add_dataset, get_dataset_qc_info, update_dataset
 from eocdb.ws.controllers.users import create_user
 from eocdb.ws.handlers import API_URL_PREFIX
 from eocdb.ws.handlers._handlers import _ensure_string_argument, WsBadRequestError, _ensure_int_argument, \
@@ -71,6 +76,22 @@ class WsTestCase(tornado.testing.AsyncHTTPTestCase):
         self.assertEqual(200, response.code)
 
 
+class MetricsTest(WsTestCase):
+
+    def test_get(self):
+        self.fetch(API_URL_PREFIX + "/service/info", method='GET')
+
+        response = self.fetch("/metrics", method='GET')
+        self.assertEqual(200, response.code)
+        self.assertEqual('text/plain; version=0.0.4; charset=utf-8', response.headers['Content-Type'])
+
+        result = response.body.decode('utf-8')
+        self.assertRegex(result, r'\nocdb_http_requests_total\{handler="ServiceInfo",method="GET",status="200"\} \d+')
+        self.assertRegex(result, r'\nocdb_http_request_duration_seconds_count'
+                                 r'\{handler="ServiceInfo",method="GET"\} \d+')
+        self.assertIn('\nocdb_http_requests_in_flight{handler="Metrics"} 1.0\n', result)
+
+
 class ServiceInfoTest(WsTestCase):
 
     def test_get(self):
@@ -101,6 +122,33 @@ class StoreInfoTest(WsTestCase):
         self.assertIn("products", result)
         self.assertIn("productGroups", result)
 
+    def test_get_compressed(self):
+        response = self.fetch(API_URL_PREFIX + "/store/info", method='GET', decompress_response=False,
+                              headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(200, response.code)
+        self.assertEqual("gzip", response.headers.get("Content-Encoding"))
+        result = tornado.escape.json_decode(gzip.decompress(response.body))
+        self.assertIn("products", result)
+
+    def test_get_not_modified(self):
+        response = self.fetch(API_URL_PREFIX + "/store/info", method='GET')
+        self.assertEqual(200, response.code)
+        etag = response.headers["Etag"]
+
+        response = self.fetch(API_URL_PREFIX + "/store/info", method='GET', headers={"If-None-Match": etag})
+        self.assertEqual(304, response.code)
+        self.assertEqual(b"", response.body)
+
+        response = self.fetch(API_URL_PREFIX + "/store/info", method='GET', headers={"If-None-Match": '"x"'})
+        self.assertEqual(200, response.code)
+        self.assertEqual(etag, response.headers["Etag"])
+
+        # the store info is static, so it does not depend on the databases
+        with unittest.mock.patch.object(type(self.ctx.db_driver.instance()), "get_data_generation",
+                                        side_effect=RuntimeError("database unreachable")):
+            response = self.fetch(API_URL_PREFIX + "/store/info", method='GET', headers={"If-None-Match": etag})
+        self.assertEqual(304, response.code)
+
 
 class StoreUploadSubmissionTest(WsTestCase):
 
@@ -641,6 +689,76 @@ class StoreUploadSubmissionFileTest(WsTestCase):
                "401  0.121268  0.018595  0.058999  0.007099"
 
 
+class StoreSubmissionFileIssuesTest(WsTestCase):
+
+    def test_get(self):
+        cookie = self.login_admin()
+        try:
+            issues = [Issue(type="ERROR", description=f"Value {i} out of range") for i in range(15)]
+            files = [SubmissionFile(submission_id="submitme",
+                                    index=0,
+                                    filename="Hans",
+                                    filetype="black",
+                                    status=QC_STATUS_SUBMITTED,
+                                    result=DatasetValidationResult(status="ERROR", issues=issues))]
+            db_subm = DbSubmission(status="Hellyeah", user_id='88763', submission_id="submitme", files=files,
+                                   qc_status="OK",
+                                   path="/root/hell/yeah", date=datetime.datetime(2001, 2, 3, 4, 5, 6),
+                                   store_sub_path='Tom_Helge')
+            self.ctx.db_driver.add_submission(db_subm)
+
+            response = self.fetch(API_URL_PREFIX + "/store/issues/submissionfile/submitme/0?offset=12",
+                                  method='GET', headers={"Cookie": cookie})
+            self.assertEqual(200, response.code)
+            self.assertEqual(dict(total_count=15, offset=12, issues=[issue.to_dict() for issue in issues[12:]]),
+                             tornado.escape.json_decode(response.body))
+
+            response = self.fetch(API_URL_PREFIX + "/store/issues/submissionfile/submitme/1",
+                                  method='GET', headers={"Cookie": cookie})
+            self.assertEqual(404, response.code)
+
+            response = self.fetch(API_URL_PREFIX + "/store/issues/submissionfile/submitme/0?count=-1",
+                                  method='GET', headers={"Cookie": cookie})
+            self.assertEqual(400, response.code)
+        finally:
+            self.logout_admin()
+
+    def test_get_not_logged_in(self):
+        response = self.fetch(API_URL_PREFIX + "/store/issues/submissionfile/submitme/0", method='GET')
+        self.assertEqual(403, response.code)
+
+    def test_get_other_users_submission(self):
+        owner = User(name='scott', last_name='Scott', password='tiger', email='bruce.scott@gmail.com',
+                     first_name='Bruce', roles=[Roles.SUBMIT.value], phone='+34 5678901234')
+        owner_id = create_user(self.ctx, owner)
+        other = User(name='tiger', last_name='Tiger', password='scott', email='tom.tiger@gmail.com',
+                     first_name='Tom', roles=[Roles.SUBMIT.value], phone='+34 5678901235')
+        create_user(self.ctx, other)
+
+        files = [SubmissionFile(submission_id="submitme", index=0, filename="Hans", filetype="black",
+                                status=QC_STATUS_SUBMITTED,
+                                result=DatasetValidationResult(status="ERROR", issues=[
+                                    Issue(type="ERROR", description="Value out of range")]))]
+        self.ctx.db_driver.add_submission(DbSubmission(status="Hellyeah", user_id=owner_id, submission_id="submitme",
+                                                       files=files, qc_status="OK", path="/root/hell/yeah",
+                                                       date=datetime.datetime(2001, 2, 3, 4, 5, 6),
+                                                       store_sub_path='Tom_Helge'))
+
+        for user_name, password, expected_code in [('tiger', 'scott', 403), ('scott', 'tiger', 200)]:
+            body = tornado.escape.json_encode(dict(username=user_name, password=password))
+            response = self.fetch(API_URL_PREFIX + "/users/login", method='POST', body=body)
+            self.assertEqual(200, response.code)
+            cookie = response.headers._dict["Set-Cookie"]
+
+            response = self.fetch(API_URL_PREFIX + "/store/issues/submissionfile/submitme/0",
+                                  method='GET', headers={"Cookie": cookie})
+            self.assertEqual(expected_code, response.code)
+
+        response = self.fetch(API_URL_PREFIX + "/store/issues/submissionfile/unknown/0",
+                              method='GET', headers={"Cookie": cookie})
+        self.assertEqual(404, response.code)
+
+
 class StoreUpdateSubmissionFileTest(WsTestCase):
 
     def test_update_invalid_submissionfile(self):
@@ -770,6 +888,29 @@ class StoreUploadUserTest(WsTestCase):
         finally:
             self.logout_admin()
 
+    def test_get_sorted_page(self):
+        cookie = self.login_admin()
+        try:
+            response = self.fetch(API_URL_PREFIX + f"/store/upload/user?sort=status&order=desc&offset=0&count=10",
+                                  method='GET', headers={"Cookie": cookie})
+
+            self.assertEqual(200, response.code)
+            self.assertEqual('0', response.headers['X-Total-Count'])
+            self.assertEqual([], tornado.escape.json_decode(response.body))
+        finally:
+            self.logout_admin()
+
+    def test_get_invalid_sort(self):
+        cookie = self.login_admin()
+        try:
+            response = self.fetch(API_URL_PREFIX + f"/store/upload/user?sort=path", method='GET',
+                                  headers={"Cookie": cookie})
+
+            self.assertEqual(400, response.code)
+            self.assertEqual('Sort field must be one of date, status', response.reason)
+        finally:
+            self.logout_admin()
+
     def test_get_not_logged_in(self):
         response = self.fetch(API_URL_PREFIX + f"/store/upload/user", method='GET')
 
@@ -884,6 +1025,48 @@ class StoreDownloadTest(WsTestCase):
                 os.rmdir(target_dir)
 
 
+class StoreExportTest(WsTestCase):
+
+    def test_get_csv(self):
+        dataset = new_test_dataset(0)
+        dataset.attributes = ["a", "b", "c"]
+        dataset_id = add_dataset(self.ctx, dataset).id
+
+        response = self.fetch(API_URL_PREFIX + "/store/export?format=csv", method='GET')
+        self.assertEqual(200, response.code)
+        self.assertEqual("text/csv", response.headers["Content-Type"])
+        self.assertEqual("dataset_id,cruise,station,a,b,c\n"
+                         f"{dataset_id},,,1.2,2.3,3.4\n"
+                         f"{dataset_id},,,4.5,5.6,6.7\n", response.body.decode("utf-8"))
+
+    def test_get_invalid_format(self):
+        response = self.fetch(API_URL_PREFIX + "/store/export?format=xls", method='GET')
+        self.assertEqual(400, response.code)
+
+    def test_get_streamed(self):
+        first_chunk_received = threading.Event()
+        sent_before_end = []
+
+        def iter_chunks():
+            yield b"dataset_id,cruise,station,a\n"
+            # the chunks are generated off the IOLoop, so it can send the first chunk meanwhile
+            sent_before_end.append(first_chunk_received.wait(timeout=2.))
+            yield b"d1,,,1.2\n"
+
+        chunks = []
+
+        def on_chunk(chunk):
+            chunks.append(chunk)
+            first_chunk_received.set()
+
+        with unittest.mock.patch("eocdb.ws.handlers._handlers.export_store_records", return_value=iter_chunks()):
+            response = self.fetch(API_URL_PREFIX + "/store/export?format=csv", method='GET',
+                                  streaming_callback=on_chunk)
+        self.assertEqual(200, response.code)
+        self.assertEqual([True], sent_before_end)
+        self.assertEqual(b"dataset_id,cruise,station,a\nd1,,,1.2\n", b"".join(chunks))
+
+
 class StoreDownloadsubmissionFileTest(WsTestCase):
     def test_get_not_exists(self):
         response = self.fetch(API_URL_PREFIX + f"/store/download/submissionfile/sd/0", method='GET')
@@ -1020,6 +1203,54 @@ class DatasetsTest(WsTestCase):
         self.assertIn("total_count", actual_response_data)
         self.assertEqual(4, actual_response_data["total_count"])
 
+    def test_get_traced(self):
+        add_dataset(self.ctx, new_test_dataset(0))
+        self.ctx.configure(dict(self.ctx.config, trace_perf=True, slow_request_threshold=0.))
+
+        with self.assertLogs('eocdb', level='WARNING') as cm:
+            response = self.fetch(API_URL_PREFIX + "/datasets?count=10", method='GET',
+                                  headers={"X-Request-ID": "r-4711"})
+        self.assertEqual(200, response.code)
+        self.assertEqual("r-4711", response.headers["X-Request-ID"])
+        metric_names = [metric.split(';')[0] for metric in response.headers["Server-Timing"].split(', ')]
+        self.assertEqual(['parse', 'auth', 'db', 'serialize', 'total'], metric_names)
+
+        self.assertEqual(1, len(cm.records))
+        record = tornado.escape.json_decode(cm.records[0].getMessage()[len('request trace: '):])
+        self.assertEqual("r-4711", record["trace_id"])
+        self.assertEqual("Datasets", record["name"])
+        self.assertEqual(200, record["status"])
+        self.assertEqual(len(response.body), record["bytes_out"])
+        self.assertIn("write_ms", record)
+        self.assertIs(True, record["slow"])
+
+    def test_get_profiled_by_config(self):
+        profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, profile_dir, ignore_errors=True)
+        self.ctx.configure(dict(self.ctx.config, profile_handlers=["Datasets"], profile_dir=profile_dir))
+
+        response = self.fetch(API_URL_PREFIX + "/datasets?count=10", method='GET')
+        self.assertEqual(200, response.code)
+        file_name = response.headers["X-Profile-File"]
+        self.assertIn("-Datasets-GET-", file_name)
+        self.assertEqual([file_name], os.listdir(profile_dir))
+
+    def test_get_profiled_by_header(self):
+        profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, profile_dir, ignore_errors=True)
+        self.ctx.configure(dict(self.ctx.config, profile_dir=profile_dir))
+
+        response = self.fetch(API_URL_PREFIX + "/datasets?count=10", method='GET', headers={"X-Profile": "true"})
+        self.assertEqual(200, response.code)
+        self.assertNotIn("X-Profile-File", response.headers)
+        self.assertEqual([], os.listdir(profile_dir))
+
+        cookie = self.login_admin()
+        response = self.fetch(API_URL_PREFIX + "/datasets?count=10", method='GET',
+                              headers={"X-Profile": "true", "Cookie": cookie})
+        self.assertEqual(200, response.code)
+        self.assertEqual([response.headers["X-Profile-File"]], os.listdir(profile_dir))
+
     def test_get_multiple_pgroups(self):
         dataset = new_test_dataset(0)
         dataset.groups = ['chl_a']
@@ -1155,6 +1386,96 @@ class DatasetsTest(WsTestCase):
         self.assertEqual(2, actual_response_data["total_count"])
 
 
+class DatasetsTileTest(WsTestCase):
+
+    def test_get(self):
+        dataset = new_test_dataset(0)
+        dataset.longitudes = [104, 105]
+        dataset.latitudes = [22, 23]
+        add_dataset(self.ctx, dataset)
+
+        response = self.fetch(API_URL_PREFIX + "/datasets/tiles/1/1/0", method='GET')
+        self.assertEqual(200, response.code)
+        actual_response_data = tornado.escape.json_decode(response.body)
+        self.assertEqual(1, actual_response_data["total_count"])
+        self.assertEqual(1, len(actual_response_data["clusters"]))
+        self.assertEqual(2, actual_response_data["clusters"][0]["count"])
+
+        response = self.fetch(API_URL_PREFIX + "/datasets/tiles/1/0/0?status=SUBMITTED", method='GET')
+        self.assertEqual(200, response.code)
+        actual_response_data = tornado.escape.json_decode(response.body)
+        self.assertEqual(0, actual_response_data["total_count"])
+
+    def test_get_invalid_tile(self):
+        response = self.fetch(API_URL_PREFIX + "/datasets/tiles/14/0/0", method='GET')
+        self.assertEqual(400, response.code)
+
+        response = self.fetch(API_URL_PREFIX + "/datasets/tiles/a/0/0", method='GET')
+        self.assertEqual(400, response.code)
+
+
+class DatasetsIdRecordsTest(WsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        dataset = new_test_dataset(0)
+        dataset.attributes = ["a", "b", "c"]
+        self.dataset_id = add_dataset(self.ctx, dataset).id
+
+    def test_get_json_lines(self):
+        response = self.fetch(API_URL_PREFIX + f"/datasets/{self.dataset_id}/records?columns=c&columns=a", method='GET')
+        self.assertEqual(200, response.code)
+        self.assertEqual("application/x-ndjson", response.headers["Content-Type"])
+        self.assertEqual('{"c": 3.4, "a": 1.2}\n'
+                         '{"c": 6.7, "a": 4.5}\n', response.body.decode("utf-8"))
+
+    def test_get_csv(self):
+        response = self.fetch(API_URL_PREFIX + f"/datasets/{self.dataset_id}/records?format=csv&offset=1",
+                              method='GET')
+        self.assertEqual(200, response.code)
+        self.assertEqual("text/csv", response.headers["Content-Type"])
+        self.assertEqual('a,b,c\n'
+                         '4.5,5.6,6.7\n', response.body.decode("utf-8"))
+
+    def test_get_invalid(self):
+        response = self.fetch(API_URL_PREFIX + f"/datasets/{self.dataset_id}/records?format=xls", method='GET')
+        self.assertEqual(400, response.code)
+
+    def test_get_not_found(self):
+        response = self.fetch(API_URL_PREFIX + "/datasets/5c5d9e6d3f46b07a4d1f5c2e/records", method='GET')
+        self.assertEqual(404, response.code)
+
+    def test_get_streamed(self):
+        first_chunk_received = threading.Event()
+        sent_before_end = []
+
+        def iter_batches():
+            yield [[1.2]]
+            # the batches are generated off the IOLoop, so it can send the first chunk meanwhile
+            sent_before_end.append(first_chunk_received.wait(timeout=2.))
+            yield [[4.5]]
+
+        chunks = []
+
+        def on_chunk(chunk):
+            chunks.append(chunk)
+            first_chunk_received.set()
+
+        with unittest.mock.patch("eocdb.ws.handlers._handlers.get_dataset_records",
+                                 return_value=(["a"], iter_batches())):
+            response = self.fetch(API_URL_PREFIX + f"/datasets/{self.dataset_id}/records", method='GET',
+                                  streaming_callback=on_chunk)
+        self.assertEqual(200, response.code)
+        self.assertEqual([True], sent_before_end)
+        self.assertEqual('{"a": 1.2}\n{"a": 4.5}\n', b"".join(chunks).decode("utf-8"))
+
+        response = self.fetch(API_URL_PREFIX + f"/datasets/{self.dataset_id}/records?columns=z", method='GET')
+        self.assertEqual(400, response.code)
+
+        response = self.fetch(API_URL_PREFIX + "/datasets/5c5d9e6d3f46b07a4d1f5c2e/records", method='GET')
+        self.assertEqual(404, response.code)
+
+
 class DatasetsIdTest(WsTestCase):
     @property
     def ctx(self):
@@ -1175,6 +1496,28 @@ class DatasetsIdTest(WsTestCase):
         self.assertEqual(404, response.code)
         self.assertEqual('Dataset with ID gnarz-foop not found', response.reason)
 
+    def test_get_not_modified(self):
+        dataset_id = add_dataset(self.ctx, new_test_dataset(0)).id
+        response = self.fetch(API_URL_PREFIX + f"/datasets/{dataset_id}", method='GET')
+        self.assertEqual(200, response.code)
+        etag = response.headers["Etag"]
+
+        response = self.fetch(API_URL_PREFIX + f"/datasets/{dataset_id}", method='GET',
+                              headers={"If-None-Match": etag})
+        self.assertEqual(304, response.code)
+
+        dataset = new_test_dataset(0)
+        dataset.id = dataset_id
+        dataset.status = 'SUBMITTED'
+        update_dataset(self.ctx, dataset)
+        response = self.fetch(API_URL_PREFIX + f"/datasets/{dataset_id}", method='GET',
+                              headers={"If-None-Match": etag})
+        self.assertEqual(200, response.code)
+        self.assertEqual('SUBMITTED', tornado.escape.json_decode(response.body)["status"])
+        # datasets that are not published may change without notice, e.g. by another service instance
+        self.assertNotIn("Cache-Control", response.headers)
+        self.assertNotEqual(etag, response.headers.get("Etag"))
+
     def test_delete_not_logged_in(self):
         dataset_ref = add_dataset(self.ctx, new_test_dataset(0))
         dataset_id = dataset_ref.id
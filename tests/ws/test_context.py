@@ -4,7 +4,7 @@ import unittest
 from eocdb.core.db.db_driver import DbDriver
 from eocdb.core.db.db_user import DbUser
 from eocdb.core.roles import Roles
-from tests.helpers import new_test_service_context
+from tests.helpers import new_test_service_context, new_test_dataset
 
 
 class WsContextTest(unittest.TestCase):
@@ -69,10 +69,50 @@ class WsContextTest(unittest.TestCase):
         ctx = new_test_service_context()
         self.assertIsInstance(ctx.db_driver, DbDriver)
 
+    def test_db_driver_is_resolved_once_per_config(self):
+        ctx = new_test_service_context()
+        db_driver = ctx.db_driver
+        resolution = ctx._db_driver_resolution
+        self.assertIs(db_driver, ctx.db_driver)
+        self.assertIs(resolution, ctx._db_driver_resolution)
+
+        ctx.configure(dict(ctx.config, search_timeout=5.))
+        self.assertIsNone(ctx._db_driver_resolution)
+        self.assertIs(db_driver, ctx.db_driver)
+        self.assertEqual([(db_driver, 5.)], ctx.db_driver_search_timeouts)
+
+        ctx.configure(dict(ctx.config, databases=dict(db_1=dict(type="eocdb.db.mongo_db_driver.MongoDbDriver",
+                                                                parameters=dict(mock=True)),
+                                                      db_2=dict(type="eocdb.db.mongo_db_driver.MongoDbDriver",
+                                                                parameters=dict(mock=True)))))
+        self.assertEqual(2, len(ctx.db_drivers))
+        with self.assertRaises(RuntimeError) as cm:
+            # noinspection PyStatementEffect
+            ctx.db_driver
+        self.assertEqual("With multiple database drivers, one must be configured to be the primary one",
+                         f"{cm.exception}")
+
     def test_get_db_drivers(self):
         ctx = new_test_service_context()
         self.assertIsInstance(ctx.db_drivers, list)
 
+    def test_data_generation(self):
+        ctx = new_test_service_context()
+        generation = ctx.data_generation
+        self.assertEqual(generation, ctx.data_generation)
+
+        ctx.configure(ctx.config)
+        self.assertEqual(generation, ctx.data_generation)
+
+        ctx.db_driver.add_dataset(new_test_dataset(0))
+        self.assertNotEqual(generation, ctx.data_generation)
+
+    def test_invalidate_tiles(self):
+        ctx = new_test_service_context()
+        ctx.get_tile('t', lambda: 1)
+        ctx.invalidate_tiles()
+        self.assertEqual(2, ctx.get_tile('t', lambda: 2))
+
     def test_get_user_none_present(self):
         ctx = new_test_service_context()
         user = ctx.get_user("walter")
@@ -106,6 +146,33 @@ class WsContextTest(unittest.TestCase):
         user = ctx.get_user("tom", "incorrect_pwd")
         self.assertIsNone(user)
 
+    def test_get_user_is_cached(self):
+        ctx = new_test_service_context()
+
+        user_stored = DbUser(id_='asodvia', name='tom', last_name='Scott', password='hh', email='email@email.int',
+                             first_name='Tom', roles=[Roles.ADMIN.value], phone='02102238958')
+        ctx.db_driver.add_user(user_stored)
+
+        user = ctx.get_user("tom")
+        ctx.db_driver.delete_user("tom")
+        self.assertIs(user, ctx.get_user("tom"))
+        self.assertIsNone(ctx.get_user("tom", "hh"))
+
+        ctx.invalidate_user("tom")
+        self.assertIsNone(ctx.get_user("tom"))
+
+    def test_get_user_cache_disabled(self):
+        ctx = new_test_service_context()
+        ctx.configure(dict(ctx.config, user_cache_ttl=0))
+
+        user_stored = DbUser(id_='asodvia', name='tom', last_name='Scott', password='hh', email='email@email.int',
+                             first_name='Tom', roles=[Roles.ADMIN.value], phone='02102238958')
+        ctx.db_driver.add_user(user_stored)
+
+        self.assertIsNotNone(ctx.get_user("tom"))
+        ctx.db_driver.delete_user("tom")
+        self.assertIsNone(ctx.get_user("tom"))
+
     def test_get_user_admin_user_empty_db(self):
         ctx = new_test_service_context()
 